@@ -0,0 +1,209 @@
+"""
+Gzip-compressed snapshot of the whole public catalog for app cold start.
+
+build_snapshot() renders workouts (as trees), workout categories, meals, meal
+categories and coaches into one canonical JSON document, names it by the
+SHA-256 of its content and writes `<hash>.json.gz` plus a `<hash>.manifest.json`
+of per-record hashes to CATALOG_SNAPSHOT_DIR. The CURRENT file points at the
+newest snapshot and records the model generations (see versioning.py) it was
+built from, so any process can tell when it is stale.
+
+Catalog saves and deletes schedule a debounced rebuild on a background
+thread; a stale snapshot keeps being served until the new one is in place.
+Manifests of older snapshots make it possible to send clients only the
+records that changed since the hash they hold.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.utils.encoders import JSONEncoder
+from .versioning import get_versions
+
+REBUILD_DELAY = 2.0  # seconds to wait for more admin edits before rebuilding
+SNAPSHOT_RETENTION = 20  # snapshots (and manifests) kept for delta requests
+
+Snapshot = namedtuple('Snapshot', ['hash', 'versions', 'content'])
+
+_lock = threading.Lock()
+_timer = None
+_memo = {}
+
+
+def _sections():
+    """(section name, models it depends on, queryset, serializer class), in document order"""
+    from accounts.models import Coach
+    from accounts.serializers import CoachSerializer
+    from nutrition.models import Meal, MealCategory
+    from nutrition.serializers import MealCategorySerializer, MealSerializer
+    from workouts.models import Exercise, Workout, WorkoutCategory, WorkoutRound
+    from workouts.serializers import WorkoutCategorySerializer, WorkoutTreeSerializer
+
+    return [
+        ('workouts', (Workout, WorkoutCategory, WorkoutRound, Exercise),
+         Workout.objects.with_tree().order_by('id'), WorkoutTreeSerializer),
+        ('workout_categories', (WorkoutCategory,), WorkoutCategory.objects.order_by('id'), WorkoutCategorySerializer),
+        ('meals', (Meal,), Meal.objects.order_by('id'), MealSerializer),
+        ('meal_categories', (MealCategory,), MealCategory.objects.order_by('id'), MealCategorySerializer),
+        ('coaches', (Coach,), Coach.objects.order_by('id'), CoachSerializer),
+    ]
+
+
+def catalog_models():
+    return list(dict.fromkeys(model for _, models, _, _ in _sections() for model in models))
+
+
+def _dumps(data):
+    return json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _directory():
+    path = Path(settings.CATALOG_SNAPSHOT_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _write_atomic(path, content):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as handle:
+        handle.write(content)
+    os.replace(tmp, path)
+
+
+def build_snapshot():
+    """Render, hash and store the catalog, and make it current. Returns the Snapshot."""
+    models = catalog_models()
+    # Read the generations first: an edit made while rendering leaves the
+    # snapshot looking stale, so it gets rebuilt again.
+    versions = list(get_versions(*models))
+    document = {}
+    manifest = {}
+    with transaction.atomic():
+        for name, _, queryset, serializer_class in _sections():
+            records = serializer_class(queryset, many=True).data
+            document[name] = records
+            manifest[name] = {
+                str(record['id']): hashlib.sha1(_dumps(record)).hexdigest()[:16] for record in records
+            }
+
+    body = _dumps(document)
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    content = gzip.compress(body, compresslevel=9, mtime=0)
+
+    directory = _directory()
+    _write_atomic(directory / f'{digest}.json.gz', content)
+    _write_atomic(directory / f'{digest}.manifest.json', _dumps(manifest))
+    _write_atomic(directory / 'CURRENT', _dumps({'hash': digest, 'versions': versions}))
+    _prune(directory)
+
+    snapshot = Snapshot(digest, versions, content)
+    _memo.clear()
+    _memo[digest] = snapshot
+    return snapshot
+
+
+def _prune(directory):
+    snapshots = sorted(directory.glob('*.json.gz'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in snapshots[SNAPSHOT_RETENTION:]:
+        digest = path.name[:-len('.json.gz')]
+        path.unlink(missing_ok=True)
+        (directory / f'{digest}.manifest.json').unlink(missing_ok=True)
+
+
+def current_snapshot():
+    """
+    The newest snapshot, building it synchronously only when none exists yet.
+    A stale one is returned as is and a background rebuild is scheduled.
+    """
+    try:
+        pointer = json.loads((_directory() / 'CURRENT').read_bytes())
+        snapshot = _memo.get(pointer['hash'])
+        if snapshot is None:
+            content = (_directory() / f"{pointer['hash']}.json.gz").read_bytes()
+            snapshot = Snapshot(pointer['hash'], pointer['versions'], content)
+            _memo.clear()
+            _memo[snapshot.hash] = snapshot
+    except (OSError, ValueError, KeyError):
+        return build_snapshot()
+
+    if list(get_versions(*catalog_models())) != snapshot.versions:
+        schedule_rebuild()
+    return snapshot
+
+
+def snapshot_delta(since):
+    """
+    Records added or changed since snapshot `since`, and ids removed, per section.
+    Returns None when that snapshot's manifest is no longer kept.
+    """
+    snapshot = current_snapshot()
+    if since == snapshot.hash:
+        return {'hash': snapshot.hash, 'changed': {}, 'deleted': {}}
+    directory = _directory()
+    try:
+        old = json.loads((directory / f'{Path(since).name}.manifest.json').read_bytes())
+    except (OSError, ValueError):
+        return None
+
+    try:
+        new = json.loads((directory / f'{snapshot.hash}.manifest.json').read_bytes())
+    except (OSError, ValueError):
+        # The current manifest was lost or pruned under us: write the snapshot again rather than fail.
+        snapshot = build_snapshot()
+        new = json.loads((directory / f'{snapshot.hash}.manifest.json').read_bytes())
+    document = json.loads(gzip.decompress(snapshot.content))
+    changed, deleted = {}, {}
+    for name, records in document.items():
+        before, after = old.get(name, {}), new.get(name, {})
+        updates = [record for record in records if before.get(str(record['id'])) != after[str(record['id'])]]
+        removed = sorted(int(pk) for pk in before.keys() - after.keys())
+        if updates:
+            changed[name] = updates
+        if removed:
+            deleted[name] = removed
+    return {'hash': snapshot.hash, 'changed': changed, 'deleted': deleted}
+
+
+def _rebuild_in_background():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        build_snapshot()
+    finally:
+        # This thread opened its own connection; don't leave it behind.
+        connection.close()
+
+
+def _start_timer():
+    global _timer
+    with _lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(REBUILD_DELAY, _rebuild_in_background)
+        _timer.daemon = True
+        _timer.start()
+
+
+def schedule_rebuild():
+    """Rebuild the snapshot shortly after the current transaction commits; repeated calls coalesce"""
+    transaction.on_commit(_start_timer)
+
+
+def _catalog_changed(sender, **kwargs):
+    schedule_rebuild()
+
+
+def watch_catalog(*models):
+    """Schedule a snapshot rebuild whenever one of these models' rows is saved or deleted"""
+    for model in models:
+        uid = f"watch-catalog:{model._meta.label_lower}"
+        post_save.connect(_catalog_changed, sender=model, dispatch_uid=uid, weak=False)
+        post_delete.connect(_catalog_changed, sender=model, dispatch_uid=uid, weak=False)
@@ -0,0 +1,79 @@
+"""
+Conditional request support (ETag / If-None-Match / If-Match) for DRF views.
+
+Views mix in ConditionalViewMixin and implement get_etag() from a cheap
+version key. The check runs after authentication and permissions but before
+the handler, so a 304 never touches a serializer.
+
+Two writes carrying the same ETag can both pass the If-Match check, so a
+handler that sees self.if_match set must make the write itself conditional
+on the version it was checked against (UPDATE ... WHERE version = ...) and
+raise PreconditionFailed when no row matches.
+"""
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = 'Not modified.'
+    default_code = 'not_modified'
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has been modified since it was fetched.'
+    default_code = 'precondition_failed'
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+class ConditionalViewMixin:
+    etag = None
+    if_match = False  # set when an If-Match header named the current ETag
+
+    def get_etag(self, request):
+        """Return the current ETag for this resource, or None to skip the checks"""
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        etag = self.get_etag(request)
+        if etag is None:
+            return
+        self.etag = quote_etag(str(etag))
+
+        if request.method in ('GET', 'HEAD'):
+            header = request.headers.get('If-None-Match')
+            if header:
+                etags = parse_etags(header)
+                if '*' in etags or self.etag in (_strip_weak(e) for e in etags):
+                    raise NotModified()
+        else:
+            header = request.headers.get('If-Match')
+            if header:
+                etags = parse_etags(header)
+                # If-Match uses strong comparison, so weak validators never match.
+                if '*' not in etags and self.etag not in etags:
+                    raise PreconditionFailed()
+                self.if_match = self.etag in etags
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': self.etag})
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag is not None and status.is_success(response.status_code):
+            if request.method not in ('GET', 'HEAD'):
+                # The write changed the version the request started with.
+                etag = self.get_etag(request)
+                self.etag = quote_etag(str(etag)) if etag is not None else None
+            if self.etag is not None:
+                response['ETag'] = self.etag
+        return response
@@ -0,0 +1,21 @@
+class EagerLoadingMixin:
+    """
+    Applies the related lookups a view's serializer declares, so list and
+    detail endpoints run a fixed number of queries instead of one per row.
+
+    Serializers declare them as class attributes:
+
+        select_related_fields = ('category',)
+        prefetch_related_fields = ('rounds',)
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        select = getattr(serializer_class, 'select_related_fields', ())
+        prefetch = getattr(serializer_class, 'prefetch_related_fields', ())
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DefaultCursorPagination(CursorPagination):
+    """
+    Keyset pagination used by every list endpoint. Pages are fetched with an
+    indexed `WHERE key < cursor LIMIT n`, so deep pages cost the same as the
+    first one. Views can set `ordering` to a unique, indexed field.
+    """
+    ordering = '-pk'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        backends = getattr(view, 'filter_backends', [])
+        if any(hasattr(backend, 'get_ordering') for backend in backends):
+            return super().get_ordering(request, queryset, view)
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
@@ -0,0 +1,49 @@
+"""
+Read-through cache for near-static reference data (coaches, categories, plans).
+
+Rendered JSON bytes are stored in the shared Django cache under a key built
+from the generation counters of the models they depend on (see versioning.py),
+with a per-process memo in front so a warm worker only pays for reading the
+counters. Any save or delete bumps a counter, which changes the key, so stale
+entries are simply never read again and expire on their own.
+"""
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from .versioning import get_versions
+
+REFDATA_TIMEOUT = 60 * 60 * 24
+
+_memo = {}
+
+
+def reference_json(name, models, build, memo=True):
+    """
+    Return the rendered JSON bytes for `name`, calling build() to produce
+    serializable data only when no process has cached the current version.
+    Pass memo=False for per-object entries that would grow the process memo
+    without bound.
+    """
+    versions = get_versions(*models)
+    key = "refdata:%s:%s" % (name, "-".join(str(v) for v in versions))
+
+    if memo:
+        entry = _memo.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+    content = cache.get(key)
+    if content is None:
+        content = JSONRenderer().render(build())
+        cache.set(key, content, timeout=REFDATA_TIMEOUT)
+    if memo:
+        _memo[name] = (key, content)
+    return content
+
+
+def reference_response(name, models, build, memo=True):
+    return HttpResponse(reference_json(name, models, build, memo=memo), content_type='application/json')
+
+
+def clear_memo():
+    _memo.clear()
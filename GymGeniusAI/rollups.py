@@ -0,0 +1,109 @@
+"""
+Per-user daily rollup tables: one row per (user, date) holding sums of the
+source rows of that day, such as UserWorkoutDailyStat over workout progress
+and UserNutritionDailyStat over planned meals.
+
+Each app describes its rollup as a mapping of the table's fields to aggregate
+expressions over its source model. The helpers here group, upsert and rebuild
+any such table, and RollupRangeMixin serves the ?start=/?end=/?period= totals
+endpoints from the rollup rows alone.
+"""
+from datetime import timedelta
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.response import Response
+
+PERIODS = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def _alias(field):
+    # Kept apart from the source's own fields, as a rollup field may share a source field's name (calories_burned).
+    return f'total_{field}'
+
+
+def daily_totals(source, aggregates, chunk_size=2000):
+    """Yield the source rows summed per (user, date) as dicts of user_id, date and each field of `aggregates`"""
+    grouped = source.order_by().values('user_id', 'date').annotate(
+        **{_alias(field): expression for field, expression in aggregates.items()}
+    )
+    for row in grouped.iterator(chunk_size=chunk_size):
+        yield {'user_id': row['user_id'], 'date': row['date'], **{field: row[_alias(field)] for field in aggregates}}
+
+
+def upsert_rollups(model, rows, fields, batch_size=1000):
+    """Insert or overwrite the rollup rows (dicts from daily_totals) on their (user, date)"""
+    return model.objects.bulk_create(
+        [model(**row) for row in rows],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=list(fields),
+    )
+
+
+def rebuild_rollups(model, source, aggregates, user_ids=None, batch_size=2000):
+    """Recreate a rollup table (or just some users' rows) from its source with one grouped scan"""
+    stats = model.objects.all()
+    if user_ids is not None:
+        source = source.filter(user_id__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+    stats.delete()
+
+    batch = []
+    created = 0
+    for row in daily_totals(source, aggregates, batch_size):
+        batch.append(model(**row))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+class RollupRangeMixin:
+    """
+    Totals of `rollup_fields` over a user's rollup rows between ?start= and
+    ?end= (default: the last `default_days` days), grouped by ?period=day|week|month.
+    """
+    rollup_fields = ()
+    default_days = 7
+    periods = PERIODS
+
+    def range_response(self, request, stats):
+        end = request.query_params.get('end')
+        start = request.query_params.get('start')
+        period = request.query_params.get('period', 'day')
+        try:
+            end = parse_date(end) if end else timezone.localdate()
+            if start:
+                start = parse_date(start)
+            elif end is not None:
+                start = end - timedelta(days=self.default_days - 1)
+        except ValueError:
+            end = start = None
+        if start is None or end is None or start > end:
+            return Response({"error": "start and end must be dates (YYYY-MM-DD) with start <= end"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if period not in self.periods:
+            return Response({"error": "period must be one of day, week, month"}, status=status.HTTP_400_BAD_REQUEST)
+
+        stats = stats.filter(date__range=(start, end))
+        trunc = self.periods[period]
+        if trunc is None:
+            buckets = [
+                {'period_start': row.pop('date'), **row}
+                for row in stats.order_by('date').values('date', *self.rollup_fields)
+            ]
+        else:
+            buckets = list(
+                stats.annotate(period_start=trunc('date')).values('period_start')
+                .annotate(**{field: Sum(field) for field in self.rollup_fields})
+                .order_by('period_start')
+            )
+
+        totals = {field: sum(b[field] for b in buckets) for field in self.rollup_fields}
+        return Response({'start': start, 'end': end, 'period': period, 'totals': totals, 'buckets': buckets})
@@ -98,10 +98,36 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file, not the default in-memory database, so threaded tests share it across connections.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# Shared across worker processes. FileBasedCache culls a random third of its
+# entries once it holds MAX_ENTRIES, so data that must not be evicted by other
+# cache users gets an alias of its own.
+CACHE_DIR = Path(os.getenv('DJANGO_CACHE_DIR', BASE_DIR / '.django_cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'default',
+        'OPTIONS': {'MAX_ENTRIES': 10_000},
+    },
+    # Per-model version counters behind every ETag and refcache key (GymGeniusAI/versioning.py).
+    # Only they live here, one entry per tracked model, so the cap is never reached and nothing is culled.
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'versions',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Compressed catalog snapshots served to the app on cold start (GymGeniusAI/catalog.py)
+CATALOG_SNAPSHOT_DIR = os.getenv('CATALOG_SNAPSHOT_DIR', BASE_DIR / '.catalog_snapshots')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -138,6 +164,15 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
+
+# Analyzer used by the process_meal_uploads worker (see nutrition/analyzers.py)
+MEAL_PHOTO_ANALYZER = os.getenv('MEAL_PHOTO_ANALYZER', 'nutrition.analyzers.StubMealAnalyzer')
+
+# Keep a per-process sorted list of leaderboard XP for rank lookups (community/leaderboard.py)
+LEADERBOARD_XP_INDEX = os.getenv('LEADERBOARD_XP_INDEX', '1') == '1'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -149,9 +184,11 @@ AUTH_USER_MODEL = 'accounts.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'GymGeniusAI.pagination.DefaultCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 # Email configuration
@@ -162,3 +199,11 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+
+# Scheduled jobs (python manage.py crontab add)
+CRONJOBS = [
+    ('0 * * * *', 'accounts.cron.delete_expired_otps'),
+    ('5 0 * * *', 'accounts.cron.expire_subscriptions'),
+    ('*/15 * * * *', 'community.cron.rerank_leaderboard'),
+    ('* * * * *', 'community.cron.compact_xp_ledger'),
+]
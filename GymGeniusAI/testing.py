@@ -0,0 +1,86 @@
+"""
+Helpers shared by the app test modules.
+
+Benchmarks live next to the tests of the feature they measure and are
+skipped unless BENCHMARK_SCALE is set. A scale of 1 runs them at the sizes
+the features were specified for; smaller scales run a fraction of that:
+
+    BENCHMARK_SCALE=1 python manage.py test accounts.tests.OutboxBenchmark
+    BENCHMARK_SCALE=0.1 python manage.py test --tag=benchmark
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings, tag
+
+BENCHMARK_SCALE = float(os.getenv('BENCHMARK_SCALE') or 0)
+
+# Fast hashing for tests that create users; PBKDF2 would dominate every timing.
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def benchmark(test):
+    """Mark a test class or method as a benchmark, skipped unless BENCHMARK_SCALE is set"""
+    return tag('benchmark')(unittest.skipUnless(BENCHMARK_SCALE, "set BENCHMARK_SCALE to run benchmarks")(test))
+
+
+def scaled(full, default):
+    """`full` times BENCHMARK_SCALE when benchmarking, otherwise `default` for the regular test run"""
+    return max(1, int(full * BENCHMARK_SCALE)) if BENCHMARK_SCALE else default
+
+
+@contextmanager
+def timed(label, count=None):
+    """
+    Time the block; the seconds end up in result['elapsed']. When benchmarking,
+    also print them (and count per second).
+    """
+    result = {}
+    started = time.perf_counter()
+    yield result
+    result['elapsed'] = elapsed = time.perf_counter() - started
+    if not BENCHMARK_SCALE:
+        return
+    rate = f", {count / elapsed:,.0f}/s" if count and elapsed else ""
+    sys.stdout.write(f"\n  {label}: {elapsed * 1000:,.1f} ms{rate}")
+    sys.stdout.flush()
+
+
+class IsolatedStorageMixin:
+    """Give the test class its own file caches (emptied before each test), snapshot directory and media root"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._storage_dir = tempfile.mkdtemp(prefix='gymgenius-test-')
+        cls._storage_settings = override_settings(
+            CACHES={alias: {**config, 'LOCATION': os.path.join(cls._storage_dir, 'cache', alias)}
+                    for alias, config in settings.CACHES.items()},
+            CATALOG_SNAPSHOT_DIR=os.path.join(cls._storage_dir, 'catalog'),
+            MEDIA_ROOT=os.path.join(cls._storage_dir, 'media'),
+        )
+        cls._storage_settings.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._storage_settings.disable()
+            raise
+
+    def setUp(self):
+        super().setUp()
+        # Database changes roll back between tests, so cached data built from them must go too.
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls._storage_settings.disable()
+            shutil.rmtree(cls._storage_dir, ignore_errors=True)
@@ -0,0 +1,157 @@
+import gzip
+import json
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from accounts.models import Coach, User
+from accounts.serializers import CustomTokenObtainPairSerializer
+from . import catalog
+from .catalog import REBUILD_DELAY, build_snapshot, current_snapshot
+from .testing import FAST_PASSWORD_HASHERS, IsolatedStorageMixin
+from .versioning import bump_version, get_versions
+from .views import _accepts_gzip
+
+
+class VersionCounterTests(IsolatedStorageMixin, TestCase):
+    def test_culling_the_default_cache_keeps_the_counters(self):
+        bump_version(Coach)
+        before = get_versions(Coach, User)
+        default = caches['default']
+        with mock.patch.object(default, '_max_entries', 20):
+            for number in range(200):
+                default.set(f'filler-{number}', number)
+
+        self.assertLess(sum(default.has_key(f'filler-{number}') for number in range(200)), 200)
+        self.assertEqual(get_versions(Coach, User), before)
+
+
+class AcceptEncodingTests(TestCase):
+    def test_gzip_needs_a_non_zero_weight(self):
+        cases = {
+            'gzip': True,
+            'gzip, deflate, br': True,
+            'br;q=1.0, GZIP;q=0.5': True,
+            'deflate, *;q=0.1': True,
+            'gzip;q=0': False,
+            'gzip;q=0.000, *': False,
+            'x-gzip': True,
+            'deflate, br': False,
+            'identity': False,
+            '*;q=0': False,
+            'gzip;q=oops': False,
+            '': False,
+        }
+        for header, expected in cases.items():
+            self.assertIs(_accepts_gzip(header), expected, header)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class CatalogSnapshotTests(IsolatedStorageMixin, TestCase):
+    client_class = APIClient
+    url = '/api/catalog/'
+
+    def setUp(self):
+        super().setUp()
+        Coach.objects.create(name='Coach')
+        user = User.objects.create_user(email='member@example.com', password='Secret-pass-1', is_verified=True)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}')
+
+    def test_each_encoding_has_its_own_etag(self):
+        zipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        plain = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(gzip.decompress(zipped.content)), json.loads(plain.content))
+        self.assertEqual(zipped['ETag'], f'"{zipped["X-Catalog-Hash"]}-gz"')
+        self.assertEqual(plain['ETag'], f'"{plain["X-Catalog-Hash"]}"')
+        for response in (zipped, plain):
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_revalidation_only_matches_the_same_encoding(self):
+        zipped_etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        plain_etag = self.client.get(self.url)['ETag']
+
+        not_modified = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=zipped_etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept-Encoding', not_modified['Vary'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=plain_etag).status_code, 304)
+
+        crossed = self.client.get(self.url, HTTP_IF_NONE_MATCH=zipped_etag)
+        self.assertEqual(crossed.status_code, 200)
+        self.assertFalse(crossed.has_header('Content-Encoding'))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class CatalogDeltaTests(IsolatedStorageMixin, TestCase):
+    client_class = APIClient
+    url = '/api/catalog/delta/'
+
+    def setUp(self):
+        super().setUp()
+        self.kept, self.renamed, self.removed = (Coach.objects.create(name=name) for name in ('Kept', 'Old', 'Gone'))
+        self.removed_id = self.removed.pk
+        user = User.objects.create_user(email='member@example.com', password='Secret-pass-1', is_verified=True)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}')
+        self.since = build_snapshot().hash
+
+    def edit_catalog(self):
+        self.renamed.name = 'New'
+        self.renamed.save()
+        self.removed.delete()
+        return Coach.objects.create(name='Added')
+
+    def test_delta_lists_changed_and_deleted_records_only(self):
+        added = self.edit_catalog()
+        current = build_snapshot().hash
+
+        response = self.client.get(self.url, {'since': self.since})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['hash'], current)
+        self.assertEqual(list(response.data['changed']), ['coaches'])
+        self.assertEqual({(coach['id'], coach['name']) for coach in response.data['changed']['coaches']},
+                         {(self.renamed.pk, 'New'), (added.pk, 'Added')})
+        self.assertEqual(response.data['deleted'], {'coaches': [self.removed_id]})
+
+    def test_current_hash_has_an_empty_delta(self):
+        response = self.client.get(self.url, {'since': self.since})
+        self.assertEqual(response.data, {'hash': self.since, 'changed': {}, 'deleted': {}})
+
+    def test_unknown_or_pruned_snapshots_are_gone(self):
+        self.assertEqual(self.client.get(self.url, {'since': '0' * 32}).status_code, 410)
+        self.assertEqual(self.client.get(self.url, {'since': 'not-a-hash'}).status_code, 400)
+
+        with mock.patch('GymGeniusAI.catalog.SNAPSHOT_RETENTION', 1):
+            self.edit_catalog()
+            build_snapshot()
+        self.assertEqual(self.client.get(self.url, {'since': self.since}).status_code, 410)
+
+    def test_a_missing_current_manifest_is_rebuilt(self):
+        self.edit_catalog()
+        current = build_snapshot().hash
+        manifest = catalog._directory() / f'{current}.manifest.json'
+        manifest.unlink()
+
+        response = self.client.get(self.url, {'since': self.since})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted'], {'coaches': [self.removed_id]})
+        self.assertTrue(manifest.exists())
+
+    def test_catalog_writes_schedule_one_debounced_rebuild(self):
+        self.addCleanup(setattr, catalog, '_timer', None)
+        with mock.patch('GymGeniusAI.catalog.threading.Timer') as timer:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.edit_catalog()
+            self.assertEqual(current_snapshot().hash, self.since)  # stale, but served until the rebuild lands
+        timer.assert_called_once_with(REBUILD_DELAY, catalog._rebuild_in_background)
+        timer.return_value.start.assert_called_once_with()
+
+        with mock.patch('GymGeniusAI.catalog.connection'):  # the timer thread closes its own connection
+            catalog._rebuild_in_background()
+        self.assertIsNone(catalog._timer)
+        self.assertNotEqual(current_snapshot().hash, self.since)
+        self.assertEqual(self.client.get(self.url, {'since': self.since}).data['deleted'],
+                         {'coaches': [self.removed_id]})
@@ -14,16 +14,23 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from .views import CatalogDeltaView, CatalogSnapshotView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls')),
     path('api/workouts/', include('workouts.urls')),
+    path('api/nutrition/', include('nutrition.urls')),
+    path('api/community/', include('community.urls')),
+    path('api/catalog/', CatalogSnapshotView.as_view(), name='catalog-snapshot'),
+    path('api/catalog/delta/', CatalogDeltaView.as_view(), name='catalog-delta'),
     path('api/ai_assistant/', include('ai_assistant.urls')),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(), name='swagger-ui'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(), name='redoc'),
-]
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,59 @@
+"""
+Per-model generation counters kept in the shared 'versions' cache.
+
+Each tracked model has a counter that is bumped by post_save/post_delete, so
+readers can build cache keys and ETags from it without touching the table.
+Counters are seeded from the clock, so an evicted counter never comes back
+with a value an old ETag or cache entry was built from. The alias holds
+nothing else, so other cache users filling up 'default' cannot cull them.
+"""
+import time
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+
+VERSION_CACHE = 'versions'
+
+
+def _key(model):
+    return f"model-version:{model._meta.label_lower}"
+
+
+def _seed():
+    return time.time_ns() // 1000
+
+
+def get_versions(*models):
+    """Return the current generation of each model, in argument order"""
+    cache = caches[VERSION_CACHE]
+    keys = [_key(model) for model in models]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _seed(), timeout=None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return tuple(versions)
+
+
+def bump_version(model):
+    cache = caches[VERSION_CACHE]
+    key = _key(model)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _seed(), timeout=None)
+        return cache.incr(key)
+
+
+def _bump_sender(sender, **kwargs):
+    bump_version(sender)
+
+
+def track_versions(*models):
+    """Bump a model's generation whenever one of its rows is saved or deleted"""
+    for model in models:
+        uid = f"track-versions:{model._meta.label_lower}"
+        post_save.connect(_bump_sender, sender=model, dispatch_uid=uid, weak=False)
+        post_delete.connect(_bump_sender, sender=model, dispatch_uid=uid, weak=False)
@@ -0,0 +1,76 @@
+import gzip
+import re
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+from accounts.permissions import IsActiveUser
+from .catalog import current_snapshot, snapshot_delta
+from .conditional import ConditionalViewMixin
+
+_SNAPSHOT_HASH = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _accepts_gzip(header):
+    """Whether an Accept-Encoding header allows gzip: listed (or covered by *) with a non-zero q"""
+    weights = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    weight = weights.get('gzip', weights.get('x-gzip', weights.get('*', 0.0)))
+    return weight > 0
+
+
+class CatalogSnapshotView(ConditionalViewMixin, GenericAPIView):
+    """
+    The whole public catalog in one gzip-compressed JSON document, tagged with
+    its content hash. Clients that do not accept gzip get the decompressed
+    bytes under their own ETag, since the two bodies differ.
+    """
+    permission_classes = [IsActiveUser]
+
+    def get_etag(self, request):
+        self.snapshot = current_snapshot()
+        self.gzipped = _accepts_gzip(request.headers.get('Accept-Encoding', ''))
+        return self.snapshot.hash + ('-gz' if self.gzipped else '')
+
+    def get(self, request):
+        if self.gzipped:
+            response = HttpResponse(self.snapshot.content, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(self.snapshot.content), content_type='application/json')
+        response['X-Catalog-Hash'] = self.snapshot.hash
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # 304s too, so caches never answer one encoding's revalidation with the other's body.
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+
+class CatalogDeltaView(GenericAPIView):
+    """Catalog records added, changed or deleted since the snapshot in ?since=<hash>"""
+    permission_classes = [IsActiveUser]
+
+    def get(self, request):
+        since = request.query_params.get('since', '')
+        if not _SNAPSHOT_HASH.match(since):
+            return Response({"error": "since must be a catalog snapshot hash"}, status=status.HTTP_400_BAD_REQUEST)
+        delta = snapshot_delta(since)
+        if delta is None:
+            return Response({"error": "Snapshot is no longer available; download the full catalog"},
+                            status=status.HTTP_410_GONE)
+        return Response(delta)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, OTP, SubscriptionPlan, UserSubscription
+from .models import User, OTP, SubscriptionPlan, UserSubscription, EmailOutbox, UserEntitlement
 from unfold.admin import ModelAdmin
 
 @admin.register(User)
@@ -54,3 +54,18 @@ class UserSubscriptionAdmin(ModelAdmin):
     list_filter = ['is_active', 'payment_status']
     search_fields = ['user__email', 'transaction_id']
     ordering = ['-start_date']
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(ModelAdmin):
+    list_display = ['to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['to_email', 'subject']
+    ordering = ['-created_at']
+
+
+@admin.register(UserEntitlement)
+class UserEntitlementAdmin(ModelAdmin):
+    list_display = ['user', 'features', 'valid_until', 'updated_at']
+    search_fields = ['user__email']
+    readonly_fields = ['user', 'features', 'valid_until', 'updated_at']
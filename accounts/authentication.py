@@ -0,0 +1,122 @@
+import uuid
+from django.utils.functional import LazyObject, empty
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+from .versions import version_cache
+
+
+def current_state(user_id):
+    """
+    Return the user's (version, is_active, is_verified), reading only those
+    columns on a cache miss, or None if there is no such user
+    """
+    state = version_cache.get(user_id)
+    if state is None:
+        state = User.objects.filter(pk=user_id).values_list('version', 'is_active', 'is_verified').first()
+        if state is not None:
+            version_cache.set(user_id, state)
+    return state
+
+
+def current_version(user_id):
+    """Return the user's version stamp, or None if there is no such user"""
+    state = current_state(user_id)
+    return state[0] if state is not None else None
+
+
+class ClaimsUser(LazyObject):
+    """
+    Request user built from token claims. id, is_active and is_verified come
+    from the token; any other attribute loads the full User row on first access.
+    """
+
+    def __init__(self, user_id, is_active, is_verified):
+        super().__init__()
+        self.__dict__['_user_id'] = user_id
+        self.__dict__['_claims'] = {'is_active': is_active, 'is_verified': is_verified}
+
+    def _setup(self):
+        self._wrapped = User.objects.get(pk=self.__dict__['_user_id'])
+
+    def _claim(self, name):
+        if self._wrapped is empty:
+            return self.__dict__['_claims'][name]
+        return getattr(self._wrapped, name)
+
+    @property
+    def pk(self):
+        return self.__dict__['_user_id']
+
+    id = pk
+
+    @property
+    def is_active(self):
+        return self._claim('is_active')
+
+    @property
+    def is_verified(self):
+        return self._claim('is_verified')
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def __bool__(self):
+        return True
+
+    def __copy__(self):
+        if self._wrapped is empty:
+            return type(self)(self.pk, **self.__dict__['_claims'])
+        return super().__copy__()
+
+    def __deepcopy__(self, memo):
+        if self._wrapped is empty:
+            result = type(self)(self.pk, **self.__dict__['_claims'])
+            memo[id(self)] = result
+            return result
+        return super().__deepcopy__(memo)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that trusts the is_active/is_verified claims while the
+    token's version stamp matches the user's current version, or the flags
+    still match the current ones, so permission checks do not load the users
+    row. Stale or pre-claims tokens fall back to the normal full row lookup.
+    """
+
+    def get_user(self, validated_token):
+        version = validated_token.get('ver')
+        if version is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        try:
+            user_id = uuid.UUID(str(user_id))
+        except ValueError:
+            return super().get_user(validated_token)
+
+        state = current_state(user_id)
+        if state is None:
+            return super().get_user(validated_token)
+        current, is_active, is_verified = state
+        claims = (validated_token.get('is_active', False), validated_token.get('is_verified', False))
+        # Profile edits bump the version too; the claims stay good while the flags they carry still hold.
+        if current != version and claims != (is_active, is_verified):
+            return super().get_user(validated_token)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        return ClaimsUser(user_id, is_active=is_active, is_verified=is_verified)
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    target_class = 'accounts.authentication.ClaimsJWTAuthentication'
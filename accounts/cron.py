@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+from .entitlements import recompute_entitlements
+from .models import OTP, UserSubscription
+
+
+def delete_expired_otps(chunk_size=2000):
+    """
+    Delete used or expired OTPs in primary key ordered chunks.
+    Each chunk is its own short DELETE so SQLite never holds the write lock for long.
+    """
+    started = time.monotonic()
+    now = timezone.now()
+    stale = OTP.objects.filter(Q(is_used=True) | Q(expires_at__lte=now)).order_by('pk')
+    last_pk = 0
+    deleted = 0
+    while True:
+        pks = list(stale.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        deleted += OTP.objects.filter(pk__in=pks).delete()[0]
+        last_pk = pks[-1]
+
+    elapsed = time.monotonic() - started
+    print(f"Deleted {deleted} expired OTPs in {elapsed:.2f}s")
+    return deleted
+
+
+def expire_subscriptions(start_lookback_days=3):
+    """
+    Deactivate every subscription past its end date in one UPDATE, then
+    recompute entitlements for just the affected users and for users whose
+    paid subscriptions started in the last `start_lookback_days` days: no
+    save happens on a start date, so nothing else grants a subscription
+    paid for in advance. The lookback catches up a missed nightly run.
+    """
+    started = time.monotonic()
+    today = timezone.localdate()
+    expired = UserSubscription.objects.filter(is_active=True, end_date__lt=today)
+    user_ids = list(expired.values_list('user_id', flat=True).distinct())
+    count = expired.update(is_active=False)
+    starting = UserSubscription.objects.filter(
+        is_active=True, payment_status='completed',
+        start_date__gt=today - timedelta(days=start_lookback_days), start_date__lte=today,
+    )
+    user_ids.extend(starting.values_list('user_id', flat=True).distinct())
+    recompute_entitlements(user_ids)
+
+    elapsed = time.monotonic() - started
+    print(f"Expired {count} subscriptions and refreshed {len(set(user_ids))} users in {elapsed:.2f}s")
+    return count
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import EmailOutbox
+
+CLAIM_TIMEOUT = 10 * 60  # seconds before a row left 'sending' by a dead worker is claimed again
+
+
+def queue_email(subject, body, to_email):
+    """Queue an email for the outbox worker. Call inside the caller's transaction."""
+    return EmailOutbox.objects.create(subject=subject, body=body, to_email=to_email)
+
+
+def claim_emails(batch_size):
+    """
+    Mark up to batch_size due outbox rows as sending and return them; safe with
+    several workers. A row left sending by a dead worker is due again after CLAIM_TIMEOUT.
+    """
+    now = timezone.now()
+    stale = now - timezone.timedelta(seconds=CLAIM_TIMEOUT)
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', claimed_at__lt=stale)
+    oldest = EmailOutbox.objects.filter(due).order_by('next_attempt_at', 'id')
+    ids = list(oldest.values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    with transaction.atomic():
+        # The UPDATE re-checks `due`, so rows another worker claimed since the read are skipped, and its write lock
+        # keeps other claims out until the read-back below has picked this worker's rows.
+        EmailOutbox.objects.filter(due, pk__in=ids).update(status='sending', claimed_at=now)
+        return list(
+            EmailOutbox.objects.filter(pk__in=ids, status='sending', claimed_at=now).order_by('next_attempt_at', 'id')
+        )
+
+
+def send_pending_emails(connection, batch_size=100, max_attempts=5, backoff_seconds=30):
+    """
+    Claim one batch of due outbox rows and send it over an already opened
+    connection, recording each row's outcome as soon as it is known, so a crash
+    re-sends at most the message in flight. Failed rows are retried with
+    exponential backoff until max_attempts is reached.
+    Returns a (sent, failed) tuple of counts.
+    """
+    sent = failed = 0
+    for item in claim_emails(batch_size):
+        message = EmailMessage(
+            item.subject,
+            item.body,
+            settings.DEFAULT_FROM_EMAIL,
+            [item.to_email],
+            connection=connection,
+        )
+        item.attempts += 1
+        try:
+            # No-op while the session is up; reconnects after a failure.
+            connection.open()
+            message.send()
+        except Exception as exc:
+            # Drop the connection so the next message reconnects instead of
+            # reusing a socket the relay may already have closed.
+            connection.close()
+            item.last_error = str(exc)
+            if item.attempts >= max_attempts:
+                item.status = 'failed'
+            else:
+                item.status = 'pending'
+                delay = backoff_seconds * 2 ** (item.attempts - 1)
+                item.next_attempt_at = timezone.now() + timezone.timedelta(seconds=delay)
+            failed += 1
+        else:
+            item.status = 'sent'
+            item.sent_at = timezone.now()
+            sent += 1
+        item.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at'])
+    return sent, failed
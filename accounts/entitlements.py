@@ -0,0 +1,70 @@
+from django.utils import timezone
+from .models import UserEntitlement, UserSubscription
+
+# Keeps `user_id IN (...)` well under SQLite's bound parameter limit.
+RECOMPUTE_CHUNK_SIZE = 500
+
+
+def plan_features(features):
+    """Flatten a SubscriptionPlan.features value into a set of enabled feature names"""
+    if isinstance(features, dict):
+        return {str(name) for name, enabled in features.items() if enabled}
+    if isinstance(features, (list, tuple)):
+        return {str(name) for name in features}
+    return set()
+
+
+def recompute_entitlements(user_ids):
+    """
+    Rebuild UserEntitlement rows for the given users from their active, paid
+    subscriptions. Runs one read and one upsert per chunk, whatever the number
+    of users.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    today = timezone.localdate()
+    for start in range(0, len(user_ids), RECOMPUTE_CHUNK_SIZE):
+        chunk = user_ids[start:start + RECOMPUTE_CHUNK_SIZE]
+        active = (
+            UserSubscription.objects
+            .filter(user_id__in=chunk, is_active=True, payment_status='completed',
+                    start_date__lte=today, end_date__gte=today)
+            .values_list('user_id', 'plan__features', 'end_date')
+        )
+        granted = {}
+        for user_id, features, end_date in active:
+            names, valid_until = granted.get(user_id, (set(), end_date))
+            granted[user_id] = (names | plan_features(features), max(valid_until, end_date))
+
+        UserEntitlement.objects.bulk_create(
+            [
+                UserEntitlement(user_id=user_id, features=sorted(names), valid_until=valid_until)
+                for user_id, (names, valid_until) in granted.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['features', 'valid_until', 'updated_at'],
+        )
+        UserEntitlement.objects.filter(user_id__in=set(chunk) - set(granted)).delete()
+
+
+def get_features(user):
+    """Return the user's current feature names, memoized on the user object"""
+    # Use __dict__ directly so a ClaimsUser does not load its full row.
+    cached = user.__dict__.get('_feature_cache')
+    if cached is not None:
+        return cached
+    row = UserEntitlement.objects.filter(user_id=user.pk).values_list('features', 'valid_until').first()
+    features = frozenset()
+    if row is not None:
+        names, valid_until = row
+        # A subscription that lapsed before the nightly job ran grants nothing.
+        if valid_until is not None and valid_until >= timezone.localdate():
+            features = frozenset(names)
+    user.__dict__['_feature_cache'] = features
+    return features
+
+
+def has_feature(user, name):
+    if not user or not user.is_authenticated:
+        return False
+    return name in get_features(user)
@@ -0,0 +1,49 @@
+import csv
+import json
+import sys
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from accounts.models import User
+
+EXPORT_FIELDS = [
+    'id', 'email', 'first_name', 'last_name', 'phone_number', 'is_verified', 'gender', 'age',
+    'date_of_birth', 'height_cm', 'weight_kg', 'goal', 'activity_level', 'preferred_workout_time',
+    'joined_at', 'is_active',
+]
+
+
+class Command(BaseCommand):
+    help = "Stream users to CSV or JSONL in constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or - for stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--with-passwords', action='store_true',
+                            help="Include password hashes so the file can be re-imported with --prehashed")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        fields = EXPORT_FIELDS + (['password'] if options['with_passwords'] else [])
+
+        out = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        count = 0
+        try:
+            rows = User.objects.order_by('pk').values(*fields).iterator(chunk_size=options['chunk_size'])
+            if fmt == 'csv':
+                writer = csv.DictWriter(out, fieldnames=fields)
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+            else:
+                for row in rows:
+                    out.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if out is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS(f"Exported {count} users to {path}"))
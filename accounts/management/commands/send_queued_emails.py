@@ -0,0 +1,42 @@
+import time
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from accounts.emails import send_pending_emails
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails in batches over a single reused connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff', type=int, default=30, help="Base retry delay in seconds")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting once drained")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep between polls with --loop")
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = send_pending_emails(
+                    connection,
+                    batch_size=options['batch_size'],
+                    max_attempts=options['max_attempts'],
+                    backoff_seconds=options['backoff'],
+                )
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    continue
+                if not options['loop']:
+                    break
+                # Nothing due: release the SMTP session while idle.
+                connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed attempts"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['user', 'purpose', 'code'], name='otp_lookup_idx'),
+        ),
+    ]
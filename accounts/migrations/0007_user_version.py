@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_otp_lookup_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Bumped on every save; stamped into JWTs to detect stale claims'),
+        ),
+    ]
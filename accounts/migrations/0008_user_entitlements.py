@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_entitlements(apps, schema_editor):
+    UserSubscription = apps.get_model('accounts', 'UserSubscription')
+    UserEntitlement = apps.get_model('accounts', 'UserEntitlement')
+    today = timezone.localdate()
+    granted = {}
+    active = UserSubscription.objects.filter(
+        is_active=True, payment_status='completed', start_date__lte=today, end_date__gte=today,
+    ).values_list('user_id', 'plan__features', 'end_date')
+    for user_id, features, end_date in active:
+        if isinstance(features, dict):
+            names = {str(name) for name, enabled in features.items() if enabled}
+        elif isinstance(features, list):
+            names = {str(name) for name in features}
+        else:
+            names = set()
+        current, valid_until = granted.get(user_id, (set(), end_date))
+        granted[user_id] = (current | names, max(valid_until, end_date))
+    UserEntitlement.objects.bulk_create([
+        UserEntitlement(user_id=user_id, features=sorted(names), valid_until=valid_until)
+        for user_id, (names, valid_until) in granted.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEntitlement',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='entitlement', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('features', models.JSONField(default=list, help_text='Sorted feature names granted by active plans')),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'User Entitlement',
+                'verbose_name_plural': 'User Entitlements',
+                'db_table': 'user_entitlements',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['is_active', 'end_date'], name='user_sub_active_end_idx'),
+        ),
+        migrations.RunPython(backfill_entitlements, migrations.RunPython.noop),
+    ]
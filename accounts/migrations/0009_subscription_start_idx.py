@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_user_entitlements'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['is_active', 'start_date'], name='user_sub_active_start_idx'),
+        ),
+    ]
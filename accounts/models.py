@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseU
 from django.db import models
 import uuid
 from django.utils import timezone
+from .versions import forget_user_versions
 
 class Coach(models.Model):
     name = models.CharField(max_length=150)
@@ -64,6 +65,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=1, editable=False,
+                                          help_text="Bumped on every save; stamped into JWTs to detect stale claims")
     
     objects = UserManager()
 
@@ -76,6 +79,37 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        # Bumped in SQL, so two writers holding the same stale instance still count twice.
+        self.version = models.F('version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            del self.version  # deferred, so the next access reloads it
+            raise
+        self.refresh_from_db(fields=['version'])
+        forget_user_versions([self.pk])
+
+
+
+class OTPManager(models.Manager):
+    def consume(self, email, code, purpose):
+        """
+        Mark a matching unused, unexpired OTP as used in a single UPDATE.
+        Returns True if one was consumed.
+        """
+        return self.filter(
+            user_id__in=User.objects.filter(email=email).values('id'),
+            purpose=purpose,
+            code=code,
+            is_used=False,
+            expires_at__gt=timezone.now(),
+        ).update(is_used=True) > 0
 
 
 class OTP(models.Model):
@@ -91,11 +125,16 @@ class OTP(models.Model):
     is_used = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
+
+    objects = OTPManager()
     
     class Meta:
         db_table = 'otps'
         verbose_name = 'OTP'
         verbose_name_plural = 'OTPs'
+        indexes = [
+            models.Index(fields=['user', 'purpose', 'code'], name='otp_lookup_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.purpose} - {self.code}"
@@ -142,6 +181,57 @@ class UserSubscription(models.Model):
         db_table = 'user_subscriptions'
         verbose_name = 'User Subscription'
         verbose_name_plural = 'User Subscriptions'
+        indexes = [
+            models.Index(fields=['is_active', 'end_date'], name='user_sub_active_end_idx'),
+            models.Index(fields=['is_active', 'start_date'], name='user_sub_active_start_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.plan.name}"
+
+
+class EmailOutbox(models.Model):
+    """Outgoing emails queued for the send_queued_emails worker"""
+    to_email = models.EmailField(max_length=255)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, default='pending',
+                              choices=[
+                                  ('pending', 'Pending'),
+                                  ('sending', 'Sending'),
+                                  ('sent', 'Sent'),
+                                  ('failed', 'Failed'),
+                              ])
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(blank=True, null=True, help_text="When a worker took the row to send it")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        verbose_name = 'Email Outbox'
+        verbose_name_plural = 'Email Outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} - {self.status}"
+
+
+class UserEntitlement(models.Model):
+    """Denormalized feature flags from a user's active subscriptions"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='entitlement')
+    features = models.JSONField(default=list, help_text="Sorted feature names granted by active plans")
+    valid_until = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'user_entitlements'
+        verbose_name = 'User Entitlement'
+        verbose_name_plural = 'User Entitlements'
+
+    def __str__(self):
+        return f"{self.user_id} - {', '.join(self.features)}"
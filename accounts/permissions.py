@@ -1,4 +1,5 @@
 from rest_framework.permissions import BasePermission
+from .entitlements import has_feature
 
 class IsActiveUser(BasePermission):
     """
@@ -8,3 +9,15 @@ class IsActiveUser(BasePermission):
 
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and request.user.is_verified
+
+
+class HasFeature(BasePermission):
+    """
+    Allows access only to users whose active subscription grants the view's
+    `required_feature`.
+    """
+    message = "Your subscription does not include this feature."
+
+    def has_permission(self, request, view):
+        feature = getattr(view, 'required_feature', None)
+        return feature is None or has_feature(request.user, feature)
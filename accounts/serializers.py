@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Coach, User
+from .models import Coach, User, SubscriptionPlan
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -46,6 +46,15 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'email', 'phone_number', 'first_name', 'last_name', 'gender', 'age', 'date_of_birth', 'height_cm', 'weight_kg', 'goal', 'activity_level', 'coach_type', 'preferred_workout_time', 'joined_at']
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # Read by ClaimsJWTAuthentication so permission checks skip the users table
+        token['is_active'] = user.is_active
+        token['is_verified'] = user.is_verified
+        token['ver'] = user.version
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         if not self.user.is_verified:
@@ -56,4 +65,9 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 class CoachSerializer(serializers.ModelSerializer):
     class Meta:
         model = Coach
-        fields = ['id', 'name', 'behavior']
\ No newline at end of file
+        fields = ['id', 'name', 'behavior']
+
+class SubscriptionPlanSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubscriptionPlan
+        fields = ['id', 'name', 'price', 'duration_days', 'features']
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from GymGeniusAI.catalog import watch_catalog
+from GymGeniusAI.versioning import track_versions
+from .entitlements import recompute_entitlements
+from .models import Coach, SubscriptionPlan, User, UserSubscription
+from .versions import forget_user_versions
+
+
+@receiver(post_delete, sender=User)
+def drop_cached_version(sender, instance, **kwargs):
+    forget_user_versions([instance.pk])
+
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def refresh_subscriber_entitlements(sender, instance, **kwargs):
+    recompute_entitlements([instance.user_id])
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+def refresh_plan_entitlements(sender, instance, created, **kwargs):
+    if not created:
+        user_ids = UserSubscription.objects.filter(plan=instance, is_active=True).values_list('user_id', flat=True)
+        recompute_entitlements(user_ids.distinct())
+
+
+track_versions(Coach, SubscriptionPlan)
+watch_catalog(Coach)
@@ -1,3 +1,788 @@
-from django.test import TestCase
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+from django.core import mail
+from django.core.mail import get_connection, send_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.functional import empty
+from GymGeniusAI.testing import FAST_PASSWORD_HASHERS, IsolatedStorageMixin, benchmark, scaled, timed
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import ClaimsJWTAuthentication, ClaimsUser
+from .cron import delete_expired_otps, expire_subscriptions
+from .emails import CLAIM_TIMEOUT, claim_emails, queue_email, send_pending_emails
+from .entitlements import get_features, recompute_entitlements
+from .models import OTP, Coach, EmailOutbox, SubscriptionPlan, User, UserEntitlement, UserSubscription
+from .permissions import HasFeature
+from .serializers import CoachSerializer, CustomTokenObtainPairSerializer, UserSerializer
+from .versions import bump_user_versions, version_cache
 
-# Create your tests here.
+
+class SessionEmailBackend(EmailBackend):
+    """locmem backend that counts the sessions (handshakes) it opens, like an SMTP connection would"""
+    sessions = 0
+    handshake_seconds = 0
+    message_seconds = 0
+
+    def open(self):
+        if getattr(self, '_open', False):
+            return False
+        type(self).sessions += 1
+        time.sleep(self.handshake_seconds)
+        self._open = True
+        return True
+
+    def close(self):
+        self._open = False
+
+    def send_messages(self, messages):
+        self.open()
+        time.sleep(self.message_seconds * len(messages))
+        return super().send_messages(messages)
+
+
+class FailingEmailBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise OSError("relay unavailable")
+
+
+class WorkerCrash(BaseException):
+    """Stands in for the worker process dying, which no except Exception in the worker catches"""
+
+
+class CrashingEmailBackend(EmailBackend):
+    """locmem backend that kills the worker on its third message"""
+    messages = 0
+
+    def send_messages(self, messages):
+        type(self).messages += 1
+        if type(self).messages == 3:
+            raise WorkerCrash
+        return super().send_messages(messages)
+
+
+class SlowEmailBackend(SessionEmailBackend):
+    """Session backend with the latency of a remote relay"""
+    handshake_seconds = 0.05
+    message_seconds = 0.002
+
+
+def _register(client, email):
+    return client.post('/api/accounts/register/', {
+        'email': email, 'password': 'Secret-pass-1', 'password2': 'Secret-pass-1',
+    })
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class OutboxTests(IsolatedStorageMixin, TestCase):
+    def test_register_queues_the_otp_email_instead_of_sending_it(self):
+        response = _register(self.client, 'new@example.com')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        queued = EmailOutbox.objects.get()
+        otp = OTP.objects.get(user__email='new@example.com', purpose='signup')
+        self.assertEqual((queued.to_email, queued.status), ('new@example.com', 'pending'))
+        self.assertIn(otp.code, queued.body)
+
+    def test_rejected_signup_queues_nothing(self):
+        response = self.client.post('/api/accounts/register/', {
+            'email': 'new@example.com', 'password': 'a', 'password2': 'b',
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.SessionEmailBackend')
+    def test_worker_drains_the_queue_over_one_connection(self):
+        for number in range(5):
+            queue_email('Subject', f'Body {number}', f'user{number}@example.com')
+        SessionEmailBackend.sessions = 0
+
+        call_command('send_queued_emails', '--batch-size=2', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(SessionEmailBackend.sessions, 1)
+        self.assertFalse(EmailOutbox.objects.exclude(status='sent').exists())
+        self.assertEqual(EmailOutbox.objects.filter(sent_at__isnull=False).count(), 5)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.FailingEmailBackend')
+    def test_failures_back_off_and_give_up_after_max_attempts(self):
+        item = queue_email('Subject', 'Body', 'user@example.com')
+
+        call_command('send_queued_emails', '--max-attempts=2', '--backoff=60', stdout=StringIO())
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts), ('pending', 1))
+        self.assertGreater(item.next_attempt_at, timezone.now() + timezone.timedelta(seconds=50))
+        self.assertIn('relay unavailable', item.last_error)
+
+        EmailOutbox.objects.filter(pk=item.pk).update(next_attempt_at=timezone.now())
+        call_command('send_queued_emails', '--max-attempts=2', stdout=StringIO())
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts), ('failed', 2))
+
+    def test_rows_claimed_by_one_worker_are_not_sent_by_another(self):
+        for number in range(4):
+            queue_email('Subject', f'Body {number}', f'user{number}@example.com')
+        claimed = {item.pk for item in claim_emails(2)}
+
+        self.assertEqual(send_pending_emails(get_connection()), (2, 0))
+        self.assertEqual(claim_emails(10), [])
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         sorted(EmailOutbox.objects.exclude(pk__in=claimed).values_list('to_email', flat=True)))
+        self.assertEqual(set(EmailOutbox.objects.filter(status='sending').values_list('pk', flat=True)), claimed)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.CrashingEmailBackend')
+    def test_a_crash_mid_batch_resends_only_unsent_rows_once_their_claim_is_stale(self):
+        for number in range(5):
+            queue_email('Subject', f'Body {number}', f'user{number}@example.com')
+        CrashingEmailBackend.messages = 0
+        with self.assertRaises(WorkerCrash):
+            send_pending_emails(get_connection())
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 2)
+        self.assertEqual(EmailOutbox.objects.filter(status='sending').count(), 3)
+
+        # Until the claim goes stale, the rows stay with the worker that took them.
+        self.assertEqual(send_pending_emails(get_connection()), (0, 0))
+        later = timezone.now() + timezone.timedelta(seconds=CLAIM_TIMEOUT + 1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(send_pending_emails(get_connection()), (3, 0))
+        recipients = [message.to[0] for message in mail.outbox]
+        self.assertEqual(sorted(recipients), [f'user{number}@example.com' for number in range(5)])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class OutboxConcurrencyTests(IsolatedStorageMixin, TransactionTestCase):
+    """Workers on their own threads and database connections (file test database)"""
+
+    def test_concurrent_workers_send_each_email_once(self):
+        EmailOutbox.objects.bulk_create(
+            EmailOutbox(subject='Subject', body='Body', to_email=f'user{number}@example.com') for number in range(60)
+        )
+        errors = []
+
+        def work():
+            try:
+                while any(send_pending_emails(get_connection(), batch_size=4)):
+                    pass
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         sorted(f'user{number}@example.com' for number in range(60)))
+        self.assertEqual(set(EmailOutbox.objects.values_list('status', 'attempts')), {('sent', 1)})
+
+
+@benchmark
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS, EMAIL_BACKEND='accounts.tests.SlowEmailBackend')
+class OutboxBenchmark(IsolatedStorageMixin, TestCase):
+    """Signup throughput with the OTP email sent inline (the old views) against queued in the outbox"""
+
+    def test_inline_against_queued_signup(self):
+        signups = scaled(500, 50)
+
+        def send_inline(subject, body, to_email):
+            send_mail(subject, body, None, [to_email])
+
+        with mock.patch('accounts.views.queue_email', side_effect=send_inline):
+            with timed(f"{signups} signups, email sent inline", signups) as inline:
+                for number in range(signups):
+                    _register(self.client, f'inline{number}@example.com')
+        with timed(f"{signups} signups, email queued", signups) as queued:
+            for number in range(signups):
+                _register(self.client, f'queued{number}@example.com')
+        with timed(f"worker draining {signups} emails", signups):
+            call_command('send_queued_emails', stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 2 * signups)
+        self.assertFalse(EmailOutbox.objects.exclude(status='sent').exists())
+        self.assertLess(queued['elapsed'], inline['elapsed'])
+
+
+def _round_trips(queries):
+    """Captured SQL minus the SAVEPOINT statements that TestCase's wrapping transaction adds"""
+    return [query['sql'] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class OTPVerificationTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='member@example.com', password='Old-pass-1')
+
+    def _otp(self, code='1234', purpose='signup', minutes=10, **extra):
+        return OTP.objects.create(user=self.user, code=code, purpose=purpose,
+                                  expires_at=timezone.now() + timezone.timedelta(minutes=minutes), **extra)
+
+    def _verify(self, code='1234'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/accounts/verify-email/', {'email': self.user.email, 'otp': code})
+        return response, _round_trips(queries.captured_queries)
+
+    def test_verify_email_loads_no_rows(self):
+        otp = self._otp()
+
+        response, queries = self._verify()
+
+        self.assertEqual(response.status_code, 200)
+        # consume, the user's id (to forget its cached stamp), then the flag and version in one UPDATE
+        self.assertEqual([sql.split()[0] for sql in queries], ['UPDATE', 'SELECT', 'UPDATE'], queries)
+        otp.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertTrue(otp.is_used)
+        self.assertTrue(self.user.is_verified)
+
+    def test_wrong_code_costs_one_more_lookup(self):
+        self._otp()
+
+        response, queries = self._verify('9999')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Invalid OTP"})
+        self.assertEqual(len(queries), 2, queries)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_verified)
+
+    def test_used_and_expired_codes_are_rejected(self):
+        self._otp(code='1111', is_used=True)
+        self._otp(code='2222', minutes=-1)
+
+        for code in ('1111', '2222'):
+            response, _ = self._verify(code)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"error": "OTP is expired or already used"})
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_verified)
+
+    def test_a_code_only_verifies_once(self):
+        self._otp()
+
+        self.assertEqual(self._verify()[0].status_code, 200)
+        self.assertEqual(self._verify()[0].status_code, 400)
+
+    def test_repeated_codes_do_not_break_verification(self):
+        self._otp()
+        self._otp()
+
+        self.assertEqual(self._verify()[0].status_code, 200)
+        self.assertFalse(OTP.objects.filter(is_used=False).exists())
+
+    def test_password_reset_confirm_loads_no_rows(self):
+        self._otp(purpose='password_reset')
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/accounts/password-reset-confirm/', {
+                'email': self.user.email, 'otp': '1234', 'new_password': 'New-pass-2',
+            })
+
+        queries = _round_trips(captured.captured_queries)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([sql.split()[0] for sql in queries], ['UPDATE', 'SELECT', 'UPDATE'], queries)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('New-pass-2'))
+
+    def test_signup_code_does_not_reset_a_password(self):
+        self._otp(purpose='signup')
+
+        response = self.client.post('/api/accounts/password-reset-confirm/', {
+            'email': self.user.email, 'otp': '1234', 'new_password': 'New-pass-2',
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Old-pass-1'))
+
+    def test_rejected_password_resets_never_hash_the_new_password(self):
+        self._otp(purpose='password_reset')
+
+        with mock.patch('accounts.views.make_password') as make_password:
+            for email, code in ((self.user.email, '9999'), ('nobody@example.com', '1234')):
+                response = self.client.post('/api/accounts/password-reset-confirm/', {
+                    'email': email, 'otp': code, 'new_password': 'New-pass-2',
+                })
+                self.assertEqual(response.status_code, 400)
+        make_password.assert_not_called()
+
+
+class ExpiredOTPSweepTests(IsolatedStorageMixin, TestCase):
+    """delete_expired_otps against a seeded table; BENCHMARK_SCALE=1 seeds the full million rows"""
+
+    def _seed(self, rows):
+        users = User.objects.bulk_create([
+            User(email=f'sweep{number}@example.com', password='!') for number in range(100)
+        ])
+        now = timezone.now()
+        kinds = [
+            {'is_used': True, 'expires_at': now + timezone.timedelta(minutes=5)},
+            {'is_used': False, 'expires_at': now - timezone.timedelta(minutes=5)},
+            {'is_used': False, 'expires_at': now + timezone.timedelta(minutes=5)},
+        ]
+        OTP.objects.bulk_create(
+            (OTP(user=users[number % len(users)], code=f'{number % 10000:04d}', purpose='signup',
+                 **kinds[number % len(kinds)]) for number in range(rows)),
+            batch_size=5000,
+        )
+        live = rows // 3
+        return rows - live, live
+
+    def test_sweep_deletes_used_and_expired_in_bounded_chunks(self):
+        rows = scaled(1_000_000, 20_000)
+        chunk_size = 2000
+        stale, live = self._seed(rows)
+
+        with timed(f"sweeping {stale} of {rows} OTPs", stale):
+            with CaptureQueriesContext(connection) as captured, redirect_stdout(StringIO()) as output:
+                deleted = delete_expired_otps(chunk_size=chunk_size)
+
+        self.assertEqual(deleted, stale)
+        self.assertEqual(OTP.objects.count(), live)
+        self.assertFalse(OTP.objects.filter(is_used=True).exists())
+        self.assertFalse(OTP.objects.filter(expires_at__lte=timezone.now()).exists())
+        deletes = [query['sql'] for query in captured.captured_queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), -(-stale // chunk_size))
+        self.assertLessEqual(max(sql.split(' IN (', 1)[1].count(',') + 1 for sql in deletes), chunk_size)
+        self.assertIn(f"Deleted {stale} expired OTPs in ", output.getvalue())
+
+    def test_sweep_of_a_clean_table_deletes_nothing(self):
+        OTP.objects.create(user=User.objects.create(email='a@example.com'), code='1234', purpose='signup',
+                           expires_at=timezone.now() + timezone.timedelta(minutes=5))
+
+        with redirect_stdout(StringIO()):
+            self.assertEqual(delete_expired_otps(), 0)
+        self.assertEqual(OTP.objects.count(), 1)
+
+
+def _access_token(user):
+    return CustomTokenObtainPairSerializer.get_token(user).access_token
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class ClaimsAuthenticationTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        version_cache.clear()
+        self.user = User.objects.create_user(email='member@example.com', password='Secret-pass-1', is_verified=True)
+        self.token = _access_token(self.user)
+
+    def _authenticate(self, token=None):
+        return ClaimsJWTAuthentication().get_user(token or self.token)
+
+    def test_current_claims_skip_the_users_row(self):
+        self._authenticate()
+
+        with self.assertNumQueries(0):
+            user = self._authenticate()
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertIs(user._wrapped, empty)
+        self.assertTrue(user.is_verified)
+
+    def test_profile_edits_keep_outstanding_tokens_on_the_claims_path(self):
+        self._authenticate()
+        self.user.first_name = 'Renamed'
+        self.user.save()
+
+        self.assertEqual(self.user.version, self.token['ver'] + 1)
+        user = self._authenticate()
+        self.assertIs(user._wrapped, empty)
+
+    def test_deactivation_through_save_rejects_the_token_at_once(self):
+        self._authenticate()
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_queryset_updates_forget_the_cached_flags(self):
+        self._authenticate()
+
+        bump_user_versions(User.objects.filter(pk=self.user.pk), is_active=False)
+
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_verification_update_moves_an_unverified_token_to_the_full_row(self):
+        User.objects.filter(pk=self.user.pk).update(is_verified=False)
+        version_cache.clear()
+        self.user.refresh_from_db()
+        token = _access_token(self.user)
+        self.assertFalse(self._authenticate(token).is_verified)
+
+        bump_user_versions(User.objects.filter(pk=self.user.pk), is_verified=True)
+
+        user = self._authenticate(token)
+        self.assertIsInstance(user, User)
+        self.assertTrue(user.is_verified)
+
+    def test_saves_from_stale_instances_both_count(self):
+        first = User.objects.get(pk=self.user.pk)
+        second = User.objects.get(pk=self.user.pk)
+
+        first.first_name = 'First'
+        first.save()
+        second.last_name = 'Second'
+        second.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.version, self.token['ver'] + 2)
+        self.assertEqual(second.version, self.user.version)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class ConditionalRequestTests(IsolatedStorageMixin, TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        version_cache.clear()
+        Coach.objects.create(name='Coach')
+        self.user = User.objects.create_user(email='member@example.com', password='Secret-pass-1', is_verified=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {_access_token(self.user)}')
+
+    def _revalidate(self, url, serializer_class):
+        etag = self.client.get(url)['ETag']
+        with mock.patch.object(serializer_class, 'to_representation') as serialize:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        serialize.assert_not_called()
+        return etag, response, _round_trips(captured.captured_queries)
+
+    def test_catalog_304_runs_no_queries_and_no_serializer(self):
+        etag, response, queries = self._revalidate('/api/accounts/coaches/', CoachSerializer)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(queries, [])
+
+    def test_profile_304_reads_only_the_version_row(self):
+        etag, response, queries = self._revalidate('/api/accounts/profile/', UserSerializer)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 1, queries)
+
+    def test_changed_resource_is_sent_again_with_a_new_etag(self):
+        etag = self.client.get('/api/accounts/coaches/')['ETag']
+        Coach.objects.create(name='Another')
+
+        response = self.client.get('/api/accounts/coaches/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_if_match_guards_profile_updates(self):
+        etag = self.client.get('/api/accounts/profile/')['ETag']
+
+        response = self.client.patch('/api/accounts/profile/update/', {'first_name': 'New'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.patch('/api/accounts/profile/update/', {'first_name': 'Lost'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'New')
+
+    def test_if_match_write_loses_to_a_concurrent_write_with_the_same_etag(self):
+        etag = self.client.get('/api/accounts/profile/')['ETag']
+        is_valid = UserSerializer.is_valid
+
+        def write_first(serializer, *args, **kwargs):
+            # A second request carrying the same ETag passed its check too, and saves first.
+            User.objects.get(pk=self.user.pk).save()
+            User.objects.filter(pk=self.user.pk).update(first_name='First')
+            return is_valid(serializer, *args, **kwargs)
+
+        with mock.patch.object(UserSerializer, 'is_valid', write_first):
+            response = self.client.patch('/api/accounts/profile/update/', {'first_name': 'Second'},
+                                         HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'First')
+
+
+class CoachingView(APIView):
+    permission_classes = [HasFeature]
+    required_feature = 'ai_coach'
+
+    def get(self, request):
+        return Response({'ok': True})
+
+
+def _backfill_entitlements():
+    """Run the 0008 data migration against the historical models"""
+    migration = import_module('accounts.migrations.0008_user_entitlements')
+    state = MigrationExecutor(connection).loader.project_state(('accounts', '0008_user_entitlements'))
+    migration.backfill_entitlements(state.apps, connection.schema_editor())
+
+
+def _entitlements():
+    rows = UserEntitlement.objects.values_list('user_id', 'features', 'valid_until')
+    return {user_id: (features, valid_until) for user_id, features, valid_until in rows}
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class EntitlementTests(IsolatedStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.user = User.objects.create_user(email='subscriber@example.com', password='x', is_verified=True)
+        self.plan = SubscriptionPlan.objects.create(name='Pro', price=10, duration_days=30,
+                                                    features={'ai_coach': True, 'meal_plans': False})
+
+    def subscribe(self, user=None, start=0, days=30, **fields):
+        fields.setdefault('payment_status', 'completed')
+        return UserSubscription.objects.create(
+            user=user or self.user, plan=self.plan, start_date=self.today + timedelta(days=start),
+            end_date=self.today + timedelta(days=start + days), **fields,
+        )
+
+    def features(self, user=None):
+        return get_features(User.objects.get(pk=(user or self.user).pk))  # a fresh object, not the memo
+
+    def status_code(self):
+        request = APIRequestFactory().get('/coaching/')
+        force_authenticate(request, user=User.objects.get(pk=self.user.pk))
+        return CoachingView.as_view()(request).status_code
+
+    def nightly(self, days_later):
+        with mock.patch('django.utils.timezone.localdate', return_value=self.today + timedelta(days=days_later)):
+            with redirect_stdout(StringIO()):
+                return expire_subscriptions()
+
+    def test_a_paid_subscription_grants_its_enabled_features(self):
+        self.subscribe()
+
+        self.assertEqual(self.status_code(), 200)
+        self.assertEqual(self.features(), {'ai_coach'})
+
+    def test_no_paid_subscription_is_denied(self):
+        self.assertEqual(self.status_code(), 403)
+        self.subscribe(payment_status='pending')
+        self.assertEqual(self.status_code(), 403)
+
+    def test_an_expired_subscription_is_denied_even_before_the_nightly_job(self):
+        self.subscribe(start=-40)
+        self.assertEqual(self.status_code(), 403)
+
+        self.subscribe(start=-20)
+        UserEntitlement.objects.filter(user=self.user).update(valid_until=self.today - timedelta(days=1))
+        self.assertEqual(self.status_code(), 403)
+
+    def test_nightly_job_expires_subscriptions_and_revokes_their_features(self):
+        subscription = self.subscribe(start=-29)
+        other = User.objects.create_user(email='other@example.com', password='x')
+        self.subscribe(user=other, start=-10)
+
+        self.assertEqual(self.nightly(days_later=2), 1)
+        subscription.refresh_from_db()
+        self.assertFalse(subscription.is_active)
+        self.assertFalse(UserEntitlement.objects.filter(user=self.user).exists())
+        self.assertEqual(self.features(other), {'ai_coach'})
+
+    def test_nightly_job_grants_a_subscription_paid_in_advance_once_it_starts(self):
+        self.subscribe(start=2)
+        self.assertEqual(self.features(), set())
+
+        self.nightly(days_later=1)
+        self.assertFalse(UserEntitlement.objects.filter(user=self.user).exists())
+        self.nightly(days_later=2)
+        with mock.patch('django.utils.timezone.localdate', return_value=self.today + timedelta(days=2)):
+            self.assertEqual(self.features(), {'ai_coach'})
+
+    def test_saving_subscriptions_and_plans_recomputes_entitlements(self):
+        subscription = self.subscribe(payment_status='pending')
+        self.assertEqual(self.features(), set())
+
+        subscription.payment_status = 'completed'
+        subscription.save()
+        self.assertEqual(self.features(), {'ai_coach'})
+
+        self.plan.features = ['ai_coach', 'meal_plans']
+        self.plan.save()
+        self.assertEqual(self.features(), {'ai_coach', 'meal_plans'})
+
+        subscription.delete()
+        self.assertEqual(self.features(), set())
+
+    def test_backfill_matches_recomputing(self):
+        users = [self.user] + [User.objects.create_user(email=f'sub{number}@example.com', password='x')
+                               for number in range(4)]
+        self.subscribe(user=users[0])
+        self.subscribe(user=users[1], start=-40)
+        self.subscribe(user=users[2], payment_status='refunded')
+        self.subscribe(user=users[3], start=3)
+        basic = SubscriptionPlan.objects.create(name='Basic', price=5, duration_days=60, features=['meal_plans'])
+        UserSubscription.objects.create(user=users[4], plan=basic, start_date=self.today,
+                                        end_date=self.today + timedelta(days=60), payment_status='completed')
+        self.subscribe(user=users[4], days=10)
+        recompute_entitlements(user.pk for user in users)
+        expected = _entitlements()
+
+        UserEntitlement.objects.all().delete()
+        _backfill_entitlements()
+
+        self.assertEqual(_entitlements(), expected)
+        self.assertEqual(expected[users[4].pk], (['ai_coach', 'meal_plans'], self.today + timedelta(days=60)))
+        self.assertEqual(set(expected), {users[0].pk, users[4].pk})
+
+
+@benchmark
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class ClaimsAuthenticationBenchmark(IsolatedStorageMixin, TestCase):
+    """Authenticated GETs with the users row loaded on every request (the old JWTAuthentication) against claims"""
+    client_class = APIClient
+
+    def test_full_row_against_claims(self):
+        requests = scaled(5000, 200)
+        Coach.objects.create(name='Coach')
+        user = User.objects.create_user(email='member@example.com', password='Secret-pass-1', is_verified=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {_access_token(user)}')
+        self.client.get('/api/accounts/coaches/')
+
+        with mock.patch.object(ClaimsJWTAuthentication, 'get_user', JWTAuthentication.get_user):
+            with CaptureQueriesContext(connection) as full_queries:
+                with timed(f"{requests} GETs, users row per request", requests):
+                    for _ in range(requests):
+                        self.client.get('/api/accounts/coaches/')
+        with CaptureQueriesContext(connection) as claims_queries:
+            with timed(f"{requests} GETs, claims", requests):
+                for _ in range(requests):
+                    self.assertEqual(self.client.get('/api/accounts/coaches/').status_code, 200)
+
+        self.assertGreaterEqual(len(full_queries), requests)
+        self.assertEqual(len(claims_queries), 0)
+
+
+def _write_users_csv(path, count, prefix='user', password='Secret-pass-1'):
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=['email', 'first_name', 'password', 'age', 'is_verified'])
+        writer.writeheader()
+        for number in range(count):
+            writer.writerow({'email': f'{prefix}{number}@example.com', 'first_name': f'User {number}',
+                             'password': password, 'age': 20 + number % 50, 'is_verified': 'true'})
+
+
+class UserImportExportTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp(prefix='gymgenius-users-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class UserImportExportTests(UserImportExportTestCase):
+    def test_import_skips_conflicts_and_invalid_rows(self):
+        User.objects.create_user(email='user1@example.com', password='Old-pass-1')
+        _write_users_csv(self.path('users.csv'), 3)
+        with open(self.path('users.csv'), 'a', encoding='utf-8') as out:
+            out.write('user2@example.com,Again,x,30,true\n,No email,x,30,true\nbad@example.com,Bad,x,old,true\n')
+
+        call_command('import_users', self.path('users.csv'), '--workers=1', '--chunk-size=2',
+                     f'--conflicts={self.path("conflicts.txt")}', stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(User.objects.count(), 3)
+        self.assertTrue(User.objects.get(email='user0@example.com').check_password('Secret-pass-1'))
+        self.assertTrue(User.objects.get(email='user1@example.com').check_password('Old-pass-1'))
+        with open(self.path('conflicts.txt'), encoding='utf-8') as conflicts:
+            self.assertEqual(sorted(conflicts.read().split()), ['user1@example.com', 'user2@example.com'])
+
+    def test_invalid_emails_and_choices_are_reported_not_stored(self):
+        with open(self.path('users.csv'), 'w', newline='', encoding='utf-8') as out:
+            writer = csv.DictWriter(out, fieldnames=['email', 'password', 'gender', 'goal', 'is_verified'])
+            writer.writeheader()
+            writer.writerow({'email': 'good@example.com', 'password': 'x', 'gender': 'female', 'goal': 'weight_loss'})
+            writer.writerow({'email': 'not-an-email', 'password': 'x'})
+            writer.writerow({'email': 'gender@example.com', 'password': 'x', 'gender': 'robot'})
+            writer.writerow({'email': 'goal@example.com', 'password': 'x', 'goal': 'get_famous'})
+        out, err = StringIO(), StringIO()
+
+        call_command('import_users', self.path('users.csv'), '--workers=1', stdout=out, stderr=err)
+
+        self.assertEqual(list(User.objects.values_list('email', 'is_verified')), [('good@example.com', False)])
+        self.assertIn("Imported 1 users (0 conflicting emails, 3 invalid rows)", out.getvalue())
+        for email in ('not-an-email', 'gender@example.com', 'goal@example.com'):
+            self.assertIn(f"Skipping {email}", err.getvalue())
+
+    def test_rows_lost_to_a_concurrent_signup_are_not_counted_as_created(self):
+        _write_users_csv(self.path('users.csv'), 3)
+        bulk_create = User.objects.bulk_create
+
+        def signup_first(users, **kwargs):
+            User.objects.create_user(email='user1@example.com', password='Their-pass-1')
+            return bulk_create(users, **kwargs)
+
+        out = StringIO()
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=signup_first):
+            call_command('import_users', self.path('users.csv'), '--workers=1', stdout=out)
+
+        self.assertIn("Imported 2 users", out.getvalue())
+        self.assertTrue(User.objects.get(email='user1@example.com').check_password('Their-pass-1'))
+
+    def test_export_with_passwords_round_trips_through_prehashed_import(self):
+        _write_users_csv(self.path('users.csv'), 5)
+        call_command('import_users', self.path('users.csv'), '--workers=1', stdout=StringIO())
+
+        call_command('export_users', self.path('users.jsonl'), '--with-passwords', stdout=StringIO())
+        User.objects.all().delete()
+        call_command('import_users', self.path('users.jsonl'), '--prehashed', stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 5)
+        self.assertTrue(User.objects.get(email='user4@example.com').check_password('Secret-pass-1'))
+
+
+@benchmark
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class UserImportExportBenchmark(UserImportExportTestCase):
+    """
+    import_users and export_users at 100k rows against creating the users one
+    at a time. Hashing is made cheap so the numbers measure the import itself;
+    PBKDF2 adds the same per-row cost to both sides, divided by --workers.
+    """
+
+    def test_bulk_import_and_export(self):
+        rows = scaled(100_000, 2000)
+        baseline = max(1, rows // 20)
+        _write_users_csv(self.path('users.csv'), rows)
+
+        with timed(f"{baseline} users created one at a time", baseline):
+            for number in range(baseline):
+                User.objects.create_user(email=f'single{number}@example.com', password='Secret-pass-1')
+        with timed(f"import_users, {rows} rows, {os.cpu_count()} hashing processes", rows):
+            call_command('import_users', self.path('users.csv'), stdout=StringIO())
+        with timed(f"export_users, {rows + baseline} rows", rows + baseline):
+            call_command('export_users', self.path('users.jsonl'), '--with-passwords', stdout=StringIO())
+        User.objects.all().delete()
+        with timed(f"import_users --prehashed, {rows + baseline} rows", rows + baseline):
+            call_command('import_users', self.path('users.jsonl'), '--prehashed', stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), rows + baseline)
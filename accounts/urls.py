@@ -15,4 +15,5 @@ urlpatterns = [
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('profile/update/', views.UpdateProfileView.as_view(), name='profile_update'),
     path('coaches/', views.CoachListView.as_view(), name='coach_list'),
+    path('subscription-plans/', views.SubscriptionPlanListView.as_view(), name='subscription_plan_list'),
 ]
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Per-user version stamps.
+
+Every write to a users row bumps its version with F('version') + 1, so
+concurrent writers never collapse two bumps into one, and drops the stamp
+from this process's cache. Other processes keep trusting their cached copy
+for at most VERSION_CACHE_TTL seconds, which bounds how long a revoked
+claim (deactivation, lost verification) can still be honoured there.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.db import transaction
+from django.db.models import F
+
+VERSION_CACHE_SIZE = 4096
+VERSION_CACHE_TTL = 5  # seconds another process may serve a stamp after the row changed
+
+
+class VersionCache:
+    """Small per-process LRU of user id -> (state, fetched_at)"""
+
+    def __init__(self, maxsize=VERSION_CACHE_SIZE, ttl=VERSION_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            state, fetched_at = entry
+            if time.monotonic() - fetched_at > self.ttl:
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return state
+
+    def set(self, user_id, state):
+        with self._lock:
+            self._data[user_id] = (state, time.monotonic())
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+version_cache = VersionCache()
+
+
+def forget_user_versions(user_ids):
+    """
+    Drop the cached stamps now and again on commit, so a read made by
+    another thread before the write commits is not kept either.
+    """
+    user_ids = list(user_ids)
+
+    def forget():
+        for user_id in user_ids:
+            version_cache.discard(user_id)
+
+    forget()
+    transaction.on_commit(forget)
+
+
+def bump_user_versions(users, **changes):
+    """
+    Apply `changes` to the users in the queryset and bump their versions
+    in the same UPDATE, then forget their cached stamps. The UPDATE keeps the
+    queryset's filters, so rows that stopped matching them (say a version
+    another writer bumped) are skipped. Returns the count.
+    """
+    user_ids = list(users.values_list('pk', flat=True))
+    if not user_ids:
+        return 0
+    count = users.filter(pk__in=user_ids).update(version=F('version') + 1, **changes)
+    forget_user_versions(user_ids)
+    return count
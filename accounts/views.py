@@ -1,7 +1,8 @@
 import random
 from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.shortcuts import render
-from django.core.mail import send_mail
+from django.db import transaction
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -16,10 +17,16 @@ from accounts.serializers import (
     ResetPasswordConfirmSerializer, 
     UserSerializer, 
     VerifyEmailSerializer,
-    CoachSerializer
+    CoachSerializer,
+    SubscriptionPlanSerializer
 )
-from .models import User, OTP, Coach
+from .models import User, OTP, Coach, SubscriptionPlan
 from .permissions import IsActiveUser
+from .emails import queue_email
+from .versions import bump_user_versions
+from GymGeniusAI.conditional import ConditionalViewMixin, PreconditionFailed
+from GymGeniusAI.versioning import get_versions
+from GymGeniusAI.refcache import reference_response
 
 class LoginView(APIView):
     def post(self, request):
@@ -31,21 +38,22 @@ class RegisterView(GenericAPIView):
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save(is_verified=False)
             otp = str(random.randint(1000, 9999))
-            OTP.objects.create(
-                user=user,
-                code=otp,
-                purpose='signup',
-                expires_at=timezone.now() + timezone.timedelta(minutes=10)
-            )
-            print(f"Sending OTP {otp} to email {user.email}")
-            send_mail(
-                'Verify your email',
-                f'Your OTP for email verification is: {otp}',
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-            )
+            # The email is delivered by the send_queued_emails worker, so the
+            # request never waits on SMTP and no OTP is mailed for a rolled back signup.
+            with transaction.atomic():
+                user = serializer.save(is_verified=False)
+                OTP.objects.create(
+                    user=user,
+                    code=otp,
+                    purpose='signup',
+                    expires_at=timezone.now() + timezone.timedelta(minutes=10)
+                )
+                queue_email(
+                    'Verify your email',
+                    f'Your OTP for email verification is: {otp}',
+                    user.email,
+                )
 
             return Response({"message": "Otp sent successfully"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -54,25 +62,21 @@ class VerifyEmailView(GenericAPIView):
     serializer_class = VerifyEmailSerializer
 
     def post(self, request):
-        email= request.data.get('email')
-        input_otp = request.data.get('otp')
-        user= User.objects.filter(email=email).first()
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        email = serializer.validated_data['email']
+        input_otp = serializer.validated_data['otp']
         purpose= "signup"
 
-        if OTP.objects.filter(user__email=email, code=input_otp, purpose=purpose).exists():
-            otp_record = OTP.objects.get(user__email=email, code=input_otp, purpose=purpose)
-            if otp_record.is_valid():
-                user = otp_record.user
-                user.is_verified = True
-                user.save()
-                otp_record.is_used = True
-                otp_record.save()
+        # Consume the OTP and flip the flag without loading either row.
+        with transaction.atomic():
+            if OTP.objects.consume(email, input_otp, purpose):
+                bump_user_versions(User.objects.filter(email=email), is_verified=True)
                 return Response({"message": f"Email {email} successfully verified"}, status=status.HTTP_200_OK)
-                
-            else:
-                return Response({"error": "OTP is expired or already used"}, status=status.HTTP_400_BAD_REQUEST)
 
-        
+        if OTP.objects.filter(user__email=email, code=input_otp, purpose=purpose).exists():
+            return Response({"error": "OTP is expired or already used"}, status=status.HTTP_400_BAD_REQUEST)
         return Response({"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
 
 class PasswordResetView(GenericAPIView):
@@ -90,20 +94,18 @@ class PasswordResetView(GenericAPIView):
             return Response({"error": "Old password is incorrect"}, status=status.HTTP_400_BAD_REQUEST)
 
         otp = str(random.randint(1000, 9999))
-        OTP.objects.create(
-            user=user,
-            code=otp,
-            purpose='password_reset',
-            expires_at=timezone.now() + timezone.timedelta(minutes=10)
-        )
-        print(f"Sending OTP {otp} to email {user.email}")
-        send_mail(
-            'Password Reset OTP',
-            f'Your OTP for password reset is: {otp}',
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-        )
-
+        with transaction.atomic():
+            OTP.objects.create(
+                user=user,
+                code=otp,
+                purpose='password_reset',
+                expires_at=timezone.now() + timezone.timedelta(minutes=10)
+            )
+            queue_email(
+                'Password Reset OTP',
+                f'Your OTP for password reset is: {otp}',
+                user.email,
+            )
 
         return Response({"message": "Password reset link sent"}, status=status.HTTP_200_OK)
     
@@ -111,29 +113,31 @@ class PasswordResetConfirmView(GenericAPIView):
     serializer_class = ResetPasswordConfirmSerializer
 
     def post(self, request):
-
-        email= request.data.get('email')
-        input_otp = request.data.get('otp')
-        new_password = request.data.get('new_password')
-        user= User.objects.filter(email=email).first()
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        email = serializer.validated_data['email']
+        input_otp = serializer.validated_data['otp']
+        new_password = serializer.validated_data['new_password']
         purpose= "password_reset"
 
+        # Consume the code in its own single UPDATE first, so a wrong code or unknown email never pays for
+        # PBKDF2, and hash outside any transaction so the write lock is not held during it.
+        if OTP.objects.consume(email, input_otp, purpose):
+            password_hash = make_password(new_password)
+            bump_user_versions(User.objects.filter(email=email), password=password_hash)
+            return Response({"message": f"Password successfully reset for {email}"}, status=status.HTTP_200_OK)
+
         if OTP.objects.filter(user__email=email, code=input_otp, purpose=purpose).exists():
-            otp_record = OTP.objects.get(user__email=email, code=input_otp, purpose=purpose)
-            if otp_record.is_valid():
-                user = otp_record.user
-                user.set_password(new_password)
-                user.save()
-                otp_record.is_used = True
-                otp_record.save()
-                return Response({"message": f"Password successfully reset for {email}"}, status=status.HTTP_200_OK)
-            else:
-                return Response({"error": "OTP is expired or already used"}, status=status.HTTP_400_BAD_REQUEST)
-
-        
+            return Response({"error": "OTP is expired or already used"}, status=status.HTTP_400_BAD_REQUEST)
         return Response({"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
 
-class ProfileView(GenericAPIView):
+class UserETagMixin(ConditionalViewMixin):
+    def get_etag(self, request):
+        # Reading version loads the user row the serializer needs anyway.
+        return f"user-{request.user.pk}-{request.user.version}"
+
+class ProfileView(UserETagMixin, GenericAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsActiveUser, IsAuthenticated]
     def get(self, request):
@@ -141,27 +145,51 @@ class ProfileView(GenericAPIView):
         serializer = self.serializer_class(user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-class UpdateProfileView(GenericAPIView):
+class UpdateProfileView(UserETagMixin, GenericAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsActiveUser, IsAuthenticated]
 
     def patch(self, request):
         user = request.user
         serializer = self.serializer_class(user, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if self.if_match:
+            # Another request with the same ETag may have written since the check; only write over the checked version.
+            if not bump_user_versions(User.objects.filter(pk=user.pk, version=user.version),
+                                      **serializer.validated_data):
+                raise PreconditionFailed()
+            user.refresh_from_db()
+            return Response(self.serializer_class(user).data, status=status.HTTP_200_OK)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
-class CoachListView(GenericAPIView):
+class CoachListView(ConditionalViewMixin, GenericAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = CoachSerializer
+
+    def get_etag(self, request):
+        return "coaches-%d" % get_versions(Coach)
     
     def get(self, request):
-        coaches = Coach.objects.all()
-        serializer = self.serializer_class(coaches, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return reference_response(
+            'coaches', (Coach,),
+            lambda: self.serializer_class(Coach.objects.all(), many=True).data,
+        )
+
+class SubscriptionPlanListView(ConditionalViewMixin, GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = SubscriptionPlanSerializer
+
+    def get_etag(self, request):
+        return "subscription-plans-%d" % get_versions(SubscriptionPlan)
+
+    def get(self, request):
+        return reference_response(
+            'subscription-plans', (SubscriptionPlan,),
+            lambda: self.serializer_class(SubscriptionPlan.objects.filter(is_active=True), many=True).data,
+        )
\ No newline at end of file
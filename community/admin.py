@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Community, Challenge, UserChallenge, Leaderboard
+from .models import Community, Challenge, UserChallenge, Leaderboard, XPEvent
 
 
 @admin.register(Community)
@@ -28,3 +28,11 @@ class LeaderboardAdmin(admin.ModelAdmin):
     list_display = ['rank', 'user', 'xp_points']
     ordering = ['rank']
     search_fields = ['user__email']
+
+
+@admin.register(XPEvent)
+class XPEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'amount', 'source', 'created_at']
+    list_filter = ['source']
+    search_fields = ['user__email']
+    ordering = ['-id']
@@ -0,0 +1,27 @@
+import time
+from .leaderboard import rerank
+from .ledger import compact
+
+
+def rerank_leaderboard():
+    """Recompute every leaderboard rank in one set-based UPDATE"""
+    started = time.monotonic()
+    moved = rerank()
+
+    elapsed = time.monotonic() - started
+    print(f"Re-ranked leaderboard, {moved} ranks changed, in {elapsed:.2f}s")
+    return moved
+
+
+def compact_xp_ledger():
+    """
+    Fold new XP events into the leaderboard. Ranks are left to
+    rerank_leaderboard: this runs every minute, and a full re-rank would hold
+    the write lock for seconds of each one.
+    """
+    started = time.monotonic()
+    applied, touched = compact()
+
+    elapsed = time.monotonic() - started
+    print(f"Compacted {applied} XP events into {touched} leaderboard entries in {elapsed:.2f}s")
+    return applied
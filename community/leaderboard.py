@@ -0,0 +1,259 @@
+"""
+Leaderboard ranking.
+
+Leaderboard.rank is materialized so ordered pages stay cheap. rerank()
+recomputes it for every row with one UPDATE driven by
+RANK() OVER (ORDER BY xp_points DESC) and only writes rows whose rank
+changed. Ties share a rank and the next rank skips, so XP of 100, 90, 90, 80
+ranks 1, 2, 2, 4. Within a tie, entries are listed by user id.
+
+Re-ranks run from cron (community/cron.py), never after each XP change:
+a full re-rank holds the SQLite write lock for seconds on a large table.
+Readers that need ranks by current XP use standing().
+
+standing() answers "my rank and the users around me" by current XP, the
+compacted xp_points plus the ledger tail (events not yet compacted, see
+ledger.py), without the stored rank: a rank is 1 + the number of users with
+more XP, and the neighbours are two bounded slices read off the
+(xp_points DESC, user) index, merged with the few users that have pending
+events. When settings.LEADERBOARD_XP_INDEX is on, each process also keeps a
+sorted list of every entry's XP (XPIndex) so those counts become bisections.
+The list is exact while the Leaderboard generation (see versioning.py)
+matches the one it was built or last updated at. Once compaction moves the
+generation on, the list is rebuilt on a background thread and the previous
+one is served meanwhile, marked as not exact. Before the first build the
+counts come from the database, which only reads the top MAX_COUNTED_RANK
+entries: a deeper standing falls back to the stored ranks, as of the last
+re-rank, and is marked as not exact.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from django.conf import settings
+from django.db import connection, transaction
+from accounts.models import User
+from GymGeniusAI.versioning import bump_version, get_versions
+from .ledger import pending_xp
+from .models import Leaderboard
+
+NEIGHBOUR_RADIUS = 10
+MAX_NEIGHBOUR_RADIUS = 50
+XP_INDEX_REBUILD_INTERVAL = 5.0  # minimum seconds between rebuilds of a stale XPIndex
+MAX_COUNTED_RANK = 10_000  # entries the database fallback reads before giving up on an exact rank
+ENTRY_FIELDS = ('user_id', 'user__first_name', 'xp_points', 'rank')
+
+
+def rerank():
+    """Recompute every rank in a single statement; returns the number of rows that moved"""
+    table = connection.ops.quote_name(Leaderboard._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET rank = ranked.position "
+            f"FROM (SELECT id, RANK() OVER (ORDER BY xp_points DESC) AS position FROM {table}) AS ranked "
+            f"WHERE {table}.id = ranked.id AND {table}.rank <> ranked.position"
+        )
+        return cursor.rowcount
+
+
+class XPIndex:
+    """Sorted XP of every leaderboard entry, for rank lookups by bisection"""
+
+    def __init__(self, background=True):
+        self.background = background  # rebuild on a thread of its own rather than in the caller
+        self._lock = threading.Lock()
+        self._xps = []
+        self._version = None
+        self._loaded_at = None
+        self._rebuild = None
+
+    def __len__(self):
+        return len(self._xps)
+
+    def rank(self, xp):
+        """1 + the number of entries with more XP than `xp`"""
+        return 1 + len(self._xps) - bisect_right(self._xps, xp)
+
+    def current(self):
+        """
+        (index, fresh): this index and whether it reflects the table, or
+        (None, False) before the first build. A stale index starts a rebuild
+        and is served meanwhile, so a request never waits for the full read.
+        """
+        version = get_versions(Leaderboard)[0]
+        if self._version == version:
+            return self, True
+        with self._lock:
+            start = (
+                self._version != version and self._rebuild is None
+                and (self._loaded_at is None or time.monotonic() - self._loaded_at >= XP_INDEX_REBUILD_INTERVAL)
+            )
+            if start:
+                self._rebuild = threading.Thread(target=self._rebuild_in_background, daemon=True)
+        if start:
+            if self.background:
+                self._rebuild.start()
+            else:
+                self._build()
+        if self._loaded_at is None:
+            return None, False
+        return self, self._version == version
+
+    def join(self, timeout=None):
+        """Wait for a running rebuild to finish"""
+        rebuild = self._rebuild
+        if rebuild is not None and rebuild.ident is not None:
+            rebuild.join(timeout)
+
+    def _build(self):
+        try:
+            # Read the generation first: a change committed during the read leaves the result stale, never wrong.
+            version = get_versions(Leaderboard)[0]
+            xps = list(Leaderboard.objects.order_by('xp_points').values_list('xp_points', flat=True))
+            with self._lock:
+                self._xps, self._version, self._loaded_at = xps, version, time.monotonic()
+        finally:
+            self._rebuild = None
+
+    def _rebuild_in_background(self):
+        try:
+            self._build()
+        finally:
+            # This thread opened its own connection; don't leave it behind.
+            connection.close()
+
+    def changed(self, old, new):
+        """Apply one entry's XP change (None for a created or deleted entry) and bump the generation"""
+        with self._lock:
+            if old is not None:
+                position = bisect_left(self._xps, old)
+                if position < len(self._xps) and self._xps[position] == old:
+                    del self._xps[position]
+            if new is not None:
+                insort(self._xps, new)
+            version = bump_version(Leaderboard)
+            # Another process changed the table in between: leave the index stale so it gets rebuilt.
+            self._version = version if self._version is not None and version == self._version + 1 else None
+
+
+xp_index = XPIndex()
+
+
+def xp_changed(old, new):
+    """Record a committed XP change of one entry"""
+    if settings.LEADERBOARD_XP_INDEX:
+        xp_index.changed(old, new)
+    else:
+        bump_version(Leaderboard)
+
+
+def _count_above(values):
+    """value -> the number of entries with more compacted XP, or None past MAX_COUNTED_RANK entries"""
+    top = list(
+        Leaderboard.objects.filter(xp_points__gt=min(values)).order_by('-xp_points')
+        .values_list('xp_points', flat=True)[:MAX_COUNTED_RANK + 1]
+    )
+    top.reverse()
+    counts = {}
+    for value in values:
+        count = len(top) - bisect_right(top, value)
+        counts[value] = None if count > MAX_COUNTED_RANK else count
+    return counts
+
+
+def _ranks(values, pending):
+    """
+    (ranks, fresh): ranks maps each XP value given to 1 + the number of users
+    with more current XP, or None where it could not be counted; fresh is
+    False when they were counted on an XP index still being rebuilt.
+    `pending` maps each user with uncompacted events to (compacted XP or
+    None, current XP).
+    """
+    index, fresh = xp_index.current() if settings.LEADERBOARD_XP_INDEX else (None, True)
+    if index is not None:
+        above = {value: index.rank(value) - 1 for value in values}
+    else:
+        above = _count_above(values)
+    ranks = {}
+    for value in values:
+        if above[value] is None:
+            ranks[value] = None
+            continue
+        # The counts are over compacted XP: move users with pending events to where their current XP puts them.
+        moved = sum((current > value) - (compacted is not None and compacted > value)
+                    for compacted, current in pending.values())
+        ranks[value] = 1 + above[value] + moved
+    return ranks, index is None or fresh
+
+
+def _order(row):
+    """Leaderboard order: XP descending, then user id"""
+    return -row['xp_points'], row['user_id']
+
+
+def _neighbours(me, radius, ahead, pending_rows, pending_ids):
+    """Up to `radius` entries next to `me` in leaderboard order, nearest first"""
+    xp, user_id = me['xp_points'], me['user_id']
+    # Users with pending events come from `pending_rows`, at their current XP, instead of their stale rows.
+    entries = Leaderboard.objects.exclude(user_id__in=pending_ids).values(*ENTRY_FIELDS)
+    if ahead:
+        ties = entries.filter(xp_points=xp, user_id__lt=user_id).order_by('-user_id')
+        beyond = entries.filter(xp_points__gt=xp).order_by('xp_points', '-user_id')
+        near = [row for row in pending_rows if _order(row) < _order(me)]
+    else:
+        ties = entries.filter(xp_points=xp, user_id__gt=user_id).order_by('user_id')
+        beyond = entries.filter(xp_points__lt=xp).order_by('-xp_points', 'user_id')
+        near = [row for row in pending_rows if _order(row) > _order(me)]
+    rows = list(ties[:radius])
+    if len(rows) < radius:
+        rows += list(beyond[:radius - len(rows)])
+    return sorted(rows + near, key=_order, reverse=ahead)[:radius]
+
+
+def standing(user_id, radius=NEIGHBOUR_RADIUS):
+    """
+    The user's entry and up to `radius` entries on either side, in leaderboard
+    order (current XP descending, then user id), each with its rank. Ranks are
+    exact unless they were counted on an XP index being rebuilt, or the
+    database fallback had to give up on one and used the stored rank instead
+    (see the module docstring); `exact` says which.
+    Returns None when the user has neither a leaderboard entry nor any XP event.
+    """
+    # One read transaction, so compaction cannot move events from the tail into the rows in between.
+    with transaction.atomic():
+        tail = pending_xp()
+        rows = {
+            row['user_id']: row
+            # No ORDER BY, or SQLite may walk the (rank, user) index instead of looking the users up.
+            for row in Leaderboard.objects.filter(user_id__in=[user_id, *tail]).order_by().values(*ENTRY_FIELDS)
+        }
+        compacted = {pk: rows[pk]['xp_points'] if pk in rows else None for pk in tail}
+        for pk, first_name in User.objects.filter(pk__in=set(tail) - set(rows)).values_list('pk', 'first_name'):
+            # Events from before the user's first compaction.
+            rows[pk] = {'user_id': pk, 'user__first_name': first_name, 'xp_points': 0, 'rank': 0}
+        pending = {}
+        for pk, amount in tail.items():
+            rows[pk] = {**rows[pk], 'xp_points': rows[pk]['xp_points'] + amount}
+            pending[pk] = (compacted[pk], rows[pk]['xp_points'])
+
+        me = rows.get(user_id)
+        if me is None:
+            return None
+        pending_rows = [rows[pk] for pk in pending if pk != user_id]
+        above = _neighbours(me, radius, True, pending_rows, list(pending))
+        below = _neighbours(me, radius, False, pending_rows, list(pending))
+        window = above[::-1] + [me] + below
+        ranks, fresh = _ranks([row['xp_points'] for row in window], pending)
+
+    def rank(row):
+        counted = ranks[row['xp_points']]
+        return row['rank'] if counted is None else counted
+
+    entries = [
+        {'user_id': row['user_id'], 'first_name': row['user__first_name'], 'xp_points': row['xp_points'],
+         'rank': rank(row), 'is_me': row is me}
+        for row in window
+    ]
+    return {
+        'rank': rank(me), 'xp_points': me['xp_points'], 'entries': entries,
+        'exact': fresh and None not in ranks.values(),
+    }
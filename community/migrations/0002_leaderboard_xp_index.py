@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['-xp_points', 'user'], name='leaderboard_xp_idx'),
+        ),
+    ]
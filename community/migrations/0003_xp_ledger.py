@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0002_leaderboard_xp_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPLedgerMark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('applied_through', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'XP Ledger Mark',
+                'verbose_name_plural': 'XP Ledger Mark',
+                'db_table': 'xp_ledger_mark',
+            },
+        ),
+        migrations.CreateModel(
+            name='XPEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(help_text='XP gained (negative for a reversal)')),
+                ('source', models.CharField(choices=[('challenge', 'Challenge'), ('adjustment', 'Adjustment')], default='challenge', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='xp_events', to=settings.AUTH_USER_MODEL)),
+                ('user_challenge', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='xp_events', to='community.userchallenge')),
+            ],
+            options={
+                'verbose_name': 'XP Event',
+                'verbose_name_plural': 'XP Events',
+                'db_table': 'xp_events',
+                'indexes': [models.Index(fields=['user', 'id'], name='xp_event_user_idx')],
+            },
+        ),
+    ]
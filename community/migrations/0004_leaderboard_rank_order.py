@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0003_xp_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='leaderboard',
+            options={'ordering': ['rank', 'user_id'], 'verbose_name': 'Leaderboard Entry', 'verbose_name_plural': 'Leaderboard'},
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['rank', 'user'], name='leaderboard_rank_idx'),
+        ),
+    ]
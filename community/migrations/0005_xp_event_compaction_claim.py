@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:12
+
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+# Stands in for the claims of every compaction that ran under the high-water mark.
+LEGACY_CLAIM = uuid.UUID(int=0)
+
+
+def claim_compacted_events(apps, schema_editor):
+    # Events at or below the old mark are already in Leaderboard.xp_points;
+    # without a claim the next compaction would add them a second time.
+    XPLedgerMark = apps.get_model('community', 'XPLedgerMark')
+    XPEvent = apps.get_model('community', 'XPEvent')
+    mark = XPLedgerMark.objects.order_by('pk').values_list('applied_through', flat=True).first()
+    if mark:
+        XPEvent.objects.filter(id__lte=mark).update(compaction_id=LEGACY_CLAIM)
+
+
+def restore_mark(apps, schema_editor):
+    # The mark can only cover a prefix of the ids: it stops below the oldest
+    # pending event, so claimed events past that would be folded in again.
+    XPLedgerMark = apps.get_model('community', 'XPLedgerMark')
+    XPEvent = apps.get_model('community', 'XPEvent')
+    events = XPEvent.objects.order_by()
+    oldest_pending = events.filter(compaction_id__isnull=True).order_by('id').values_list('id', flat=True).first()
+    if oldest_pending is not None:
+        mark = oldest_pending - 1
+    else:
+        mark = events.order_by('-id').values_list('id', flat=True).first() or 0
+    XPLedgerMark.objects.update_or_create(pk=1, defaults={'applied_through': mark})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0004_leaderboard_rank_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xpevent',
+            name='compaction_id',
+            field=models.UUIDField(blank=True, editable=False, help_text='Claim of the compaction batch that folded it in; empty while pending', null=True),
+        ),
+        migrations.RunPython(claim_compacted_events, restore_mark),
+        migrations.AddIndex(
+            model_name='xpevent',
+            index=models.Index(condition=models.Q(('compaction_id__isnull', True)), fields=['user'], name='xp_event_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='xpevent',
+            index=models.Index(condition=models.Q(('compaction_id__isnull', False)), fields=['compaction_id'], name='xp_event_compaction_idx'),
+        ),
+        migrations.DeleteModel(
+            name='XPLedgerMark',
+        ),
+    ]
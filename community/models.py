@@ -53,6 +53,23 @@ class UserChallenge(models.Model):
     def __str__(self):
         return f"{self.user.email} - {self.challenge.title}"
 
+    def save(self, *args, **kwargs):
+        # Completing a challenge earns its reward unless an amount was set explicitly.
+        if self.completed and not self.xp_earned:
+            reward = Challenge.objects.filter(pk=self.challenge_id).values_list('xp_reward', flat=True).first()
+            self.xp_earned = reward or 0
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What this row had credited to the XP ledger, so a save only appends the difference.
+        instance._loaded_xp = instance.credited_xp()
+        return instance
+
+    def credited_xp(self):
+        return (self.xp_earned or 0) if self.completed else 0
+
 
 class Leaderboard(models.Model):
     """User leaderboard rankings"""
@@ -64,7 +81,50 @@ class Leaderboard(models.Model):
         db_table = 'leaderboard'
         verbose_name = 'Leaderboard Entry'
         verbose_name_plural = 'Leaderboard'
-        ordering = ['rank']
+        # Ties share a rank, so the user id makes the order (and cursor pages) deterministic.
+        ordering = ['rank', 'user_id']
+        indexes = [
+            # Serves RANK() OVER (ORDER BY xp_points DESC) and ties listed by user.
+            models.Index(fields=['-xp_points', 'user'], name='leaderboard_xp_idx'),
+            # Serves the default ordering without a sort.
+            models.Index(fields=['rank', 'user'], name='leaderboard_rank_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - Rank: {self.rank}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the signal skip scheduling a re-rank when the XP did not change.
+        instance._loaded_xp = instance.__dict__.get('xp_points')
+        return instance
+
+
+class XPEvent(models.Model):
+    """Append-only XP ledger, folded into Leaderboard.xp_points by compaction"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='xp_events')
+    amount = models.IntegerField(help_text="XP gained (negative for a reversal)")
+    source = models.CharField(max_length=20, default='challenge',
+                              choices=[('challenge', 'Challenge'), ('adjustment', 'Adjustment')])
+    user_challenge = models.ForeignKey(UserChallenge, on_delete=models.SET_NULL, blank=True, null=True,
+                                       related_name='xp_events')
+    compaction_id = models.UUIDField(blank=True, null=True, editable=False,
+                                     help_text="Claim of the compaction batch that folded it in; empty while pending")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'xp_events'
+        verbose_name = 'XP Event'
+        verbose_name_plural = 'XP Events'
+        indexes = [
+            models.Index(fields=['user', 'id'], name='xp_event_user_idx'),
+            models.Index(fields=['user'], condition=models.Q(compaction_id__isnull=True),
+                         name='xp_event_pending_idx'),
+            models.Index(fields=['compaction_id'], condition=models.Q(compaction_id__isnull=False),
+                         name='xp_event_compaction_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.amount:+d} XP ({self.source})"
+
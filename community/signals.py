@@ -0,0 +1,33 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .leaderboard import xp_changed
+from .ledger import award_xp
+from .models import Leaderboard, UserChallenge
+
+
+@receiver(post_save, sender=Leaderboard)
+def track_xp_change(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_loaded_xp', None)
+    if created or previous != instance.xp_points:
+        transaction.on_commit(partial(xp_changed, previous, instance.xp_points))
+    instance._loaded_xp = instance.xp_points
+
+
+@receiver(post_delete, sender=Leaderboard)
+def track_xp_delete(sender, instance, **kwargs):
+    transaction.on_commit(partial(xp_changed, getattr(instance, '_loaded_xp', instance.xp_points), None))
+
+
+@receiver(post_save, sender=UserChallenge)
+def credit_challenge_xp(sender, instance, created, **kwargs):
+    credited = instance.credited_xp()
+    previous = 0 if created else getattr(instance, '_loaded_xp', 0)
+    award_xp(instance.user_id, credited - previous, user_challenge_id=instance.pk)
+    instance._loaded_xp = credited
+
+
+@receiver(post_delete, sender=UserChallenge)
+def reverse_challenge_xp(sender, instance, **kwargs):
+    award_xp(instance.user_id, -getattr(instance, '_loaded_xp', instance.credited_xp()))
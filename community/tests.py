@@ -1,3 +1,388 @@
-from django.test import TestCase
+import random
+import threading
+import uuid
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from accounts.models import User
+from accounts.serializers import CustomTokenObtainPairSerializer
+from GymGeniusAI.testing import FAST_PASSWORD_HASHERS, IsolatedStorageMixin, benchmark, scaled, timed
+from .cron import compact_xp_ledger, rerank_leaderboard
+from .leaderboard import XPIndex, rerank, standing
+from .ledger import award_xp, compact, current_xp
+from .models import Leaderboard, XPEvent
 
-# Create your tests here.
+
+def seed_leaderboard(count, max_xp=5000, seed=0):
+    """Bulk insert `count` users with leaderboard entries; a small XP range makes plenty of ties"""
+    rng = random.Random(seed)
+    user_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(count)]
+    for start in range(0, count, 50_000):
+        User.objects.bulk_create(
+            (User(id=pk, email=f'user{start + number}@example.com', password='!')
+             for number, pk in enumerate(user_ids[start:start + 50_000])),
+            batch_size=5000,
+        )
+        Leaderboard.objects.bulk_create(
+            (Leaderboard(user_id=pk, xp_points=rng.randrange(max_xp)) for pk in user_ids[start:start + 50_000]),
+            batch_size=5000,
+        )
+    return user_ids
+
+
+def _oracle_ranks():
+    """user id -> 1 + the number of entries with more XP, from a sorted list"""
+    entries = sorted(Leaderboard.objects.values_list('xp_points', 'user_id'), key=lambda entry: -entry[0])
+    ranks = {}
+    rank = previous = None
+    for position, (xp, user_id) in enumerate(entries, 1):
+        if xp != previous:
+            rank, previous = position, xp
+        ranks[user_id] = rank
+    return ranks
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class LeaderboardTestCase(IsolatedStorageMixin, TestCase):
+    def make_entries(self, *xps):
+        users = [User.objects.create_user(email=f'player{number}@example.com', password='x', first_name=f'P{number}',
+                                          is_verified=True)
+                 for number in range(len(xps))]
+        Leaderboard.objects.bulk_create(Leaderboard(user=user, xp_points=xp) for user, xp in zip(users, xps))
+        return users
+
+
+class LeaderboardRankTests(LeaderboardTestCase):
+    def test_ties_share_a_rank_and_the_next_rank_skips(self):
+        users = self.make_entries(90, 100, 80, 90, 70)
+        self.assertEqual(rerank(), 5)
+
+        ranks = dict(Leaderboard.objects.values_list('user_id', 'rank'))
+        self.assertEqual([ranks[user.pk] for user in users], [2, 1, 4, 2, 5])
+        self.assertEqual(rerank(), 0)  # nothing moved, nothing written
+
+    def test_default_ordering_lists_ties_by_user_id(self):
+        users = self.make_entries(*[50] * 6, 60)
+        rerank()
+
+        listed = list(Leaderboard.objects.values_list('rank', 'user_id'))
+        tied = sorted(user.pk for user in users[:6])
+        self.assertEqual(listed, [(1, users[6].pk)] + [(2, pk) for pk in tied])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + str(Leaderboard.objects.all().query))
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('leaderboard_rank_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_rerank_matches_a_sorted_list_after_random_changes(self):
+        seed_leaderboard(2000, max_xp=300, seed=23)
+        rng = random.Random(23)
+        rerank()
+        for _ in range(5):
+            changed = rng.sample(list(Leaderboard.objects.values_list('pk', flat=True)), 100)
+            for pk in changed:
+                Leaderboard.objects.filter(pk=pk).update(xp_points=rng.randrange(300))
+            rerank()
+            self.assertEqual(dict(Leaderboard.objects.values_list('user_id', 'rank')), _oracle_ranks())
+
+
+def _oracle_standing(user_id, radius):
+    """(rank, [(user id, XP, rank)]) by sorting every user's current XP"""
+    users = set(Leaderboard.objects.values_list('user_id', flat=True)) | set(
+        User.objects.filter(xp_events__isnull=False).values_list('pk', flat=True))
+    xps = current_xp(users)
+    order = sorted(xps, key=lambda pk: (-xps[pk], pk))
+    rank = {pk: 1 + sum(other > xps[pk] for other in xps.values()) for pk in order}
+    position = order.index(user_id)
+    window = order[max(0, position - radius):position + radius + 1]
+    return rank[user_id], [(pk, xps[pk], rank[pk]) for pk in window]
+
+
+class LeaderboardStandingTests(LeaderboardTestCase):
+    def setUp(self):
+        super().setUp()
+        # A fresh per-process index, so a rebuild throttled by an earlier test cannot hide the bisection path.
+        # It rebuilds in the caller: a thread's connection would not see this test's uncommitted rows.
+        patcher = mock.patch('community.leaderboard.xp_index', XPIndex(background=False))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertMatchesOracle(self, user_id, radius):
+        result = standing(user_id, radius)
+        rank, window = _oracle_standing(user_id, radius)
+        self.assertTrue(result['exact'])
+        self.assertEqual(result['rank'], rank)
+        self.assertEqual([(entry['user_id'], entry['xp_points'], entry['rank']) for entry in result['entries']],
+                         window)
+        self.assertEqual([entry['is_me'] for entry in result['entries']].count(True), 1)
+
+    def _random_history(self, seed):
+        rng = random.Random(seed)
+        user_ids = seed_leaderboard(150, max_xp=40, seed=seed)
+        newcomers = [User.objects.create_user(email=f'new{number}@example.com', password='x').pk
+                     for number in range(5)]
+        everyone = user_ids + newcomers
+        for step in range(6):
+            for _ in range(40):
+                award_xp(rng.choice(everyone), rng.choice([-15, -5, 5, 10, 25]))
+            if step % 2:
+                compact()
+            yield rng, everyone
+
+    @mock.patch('community.leaderboard.XP_INDEX_REBUILD_INTERVAL', 0)
+    def test_standing_matches_a_brute_force_sort_with_the_xp_index(self):
+        for rng, everyone in self._random_history(24):
+            for user_id in rng.sample(everyone, 8):
+                self.assertMatchesOracle(user_id, rng.choice([0, 1, 3, 10]))
+
+    @override_settings(LEADERBOARD_XP_INDEX=False)
+    def test_standing_matches_a_brute_force_sort_from_the_database(self):
+        for rng, everyone in self._random_history(25):
+            for user_id in rng.sample(everyone, 8):
+                self.assertMatchesOracle(user_id, rng.choice([0, 1, 3, 10]))
+
+    def test_events_before_the_first_compaction_count(self):
+        users = self.make_entries(100, 90)
+        newcomer = User.objects.create_user(email='new@example.com', password='x')
+        award_xp(newcomer.pk, 95)
+        award_xp(users[0].pk, -20)
+
+        result = standing(newcomer.pk, radius=1)
+        self.assertEqual((result['rank'], result['xp_points']), (1, 95))
+        self.assertEqual([(entry['user_id'], entry['rank']) for entry in result['entries']],
+                         [(newcomer.pk, 1), (users[1].pk, 2)])
+        self.assertMatchesOracle(users[0].pk, radius=2)
+
+    @override_settings(LEADERBOARD_XP_INDEX=False)
+    def test_deep_database_fallback_uses_the_stored_rank(self):
+        users = self.make_entries(*range(100, 0, -10))
+        rerank()
+        with mock.patch('community.leaderboard.MAX_COUNTED_RANK', 4):
+            deep = standing(users[7].pk, radius=1)
+            top = standing(users[1].pk, radius=1)
+
+        self.assertFalse(deep['exact'])
+        self.assertEqual([entry['rank'] for entry in deep['entries']], [7, 8, 9])
+        self.assertTrue(top['exact'])
+        self.assertEqual([entry['rank'] for entry in top['entries']], [1, 2, 3])
+
+    def test_endpoint_reports_the_current_xp(self):
+        users = self.make_entries(50, 40)
+        award_xp(users[1].pk, 20)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(users[1]).access_token}')
+
+        response = client.get('/api/community/leaderboard/me/', {'radius': 1})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.data['rank'], response.data['xp_points'], response.data['exact']), (1, 60, True))
+
+
+def _event_totals():
+    return dict(XPEvent.objects.order_by().values('user_id').annotate(total=Sum('amount'))
+                .values_list('user_id', 'total'))
+
+
+class LedgerCompactionTests(LeaderboardTestCase):
+    def test_an_event_committed_below_a_compacted_id_is_still_folded_in(self):
+        users = self.make_entries(10, 20)
+        award_xp(users[0].pk, 5)
+        XPEvent.objects.create(id=1000, user=users[1], amount=3)
+        self.assertEqual(compact(), (2, 2))
+
+        # Another database may commit a lower id after a higher one has been compacted.
+        XPEvent.objects.create(id=500, user=users[1], amount=7)
+        self.assertEqual(current_xp([users[1].pk]), {users[1].pk: 30})
+        self.assertEqual(compact(), (1, 1))
+        self.assertEqual(dict(Leaderboard.objects.values_list('user_id', 'xp_points')),
+                         {users[0].pk: 15, users[1].pk: 30})
+        self.assertEqual(compact(), (0, 0))
+
+    def test_the_minute_job_compacts_and_leaves_ranks_to_the_rerank_job(self):
+        users = self.make_entries(10, 20)
+        rerank()
+        award_xp(users[0].pk, 15)
+
+        with redirect_stdout(StringIO()):
+            self.assertEqual(compact_xp_ledger(), 1)
+            self.assertEqual(Leaderboard.objects.get(user=users[0]).rank, 2)
+            self.assertEqual(rerank_leaderboard(), 2)
+        self.assertEqual(Leaderboard.objects.get(user=users[0]).rank, 1)
+
+
+@benchmark
+class LeaderboardBenchmark(LeaderboardTestCase):
+    """
+    rerank() and standing() on a 1M-entry leaderboard. The entries are seeded
+    once per run into a fresh test database, so it can be re-run as is:
+
+        BENCHMARK_SCALE=1 python manage.py test community.tests.LeaderboardBenchmark
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rows = scaled(1_000_000, 5000)
+        with timed(f"seeding {cls.rows} entries", cls.rows):
+            cls.user_ids = seed_leaderboard(cls.rows)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_rerank(self):
+        with timed(f"full re-rank of {self.rows}", self.rows):
+            moved = rerank()
+        self.assertEqual(moved, self.rows)
+        with timed("no-op re-rank"):
+            self.assertEqual(rerank(), 0)
+
+        rng = random.Random(1)
+        for pk in rng.sample(range(1, self.rows + 1), min(1000, self.rows)):
+            Leaderboard.objects.filter(pk=pk).update(xp_points=rng.randrange(5000))
+        with timed("re-rank after 1k XP changes"):
+            moved = rerank()
+        print(f" ({moved} ranks moved)", end='')
+        self.assertEqual(dict(Leaderboard.objects.values_list('user_id', 'rank')), _oracle_ranks())
+
+    def test_standing(self):
+        rerank()
+        by_rank = list(Leaderboard.objects.values_list('user_id', flat=True))
+        users = {'top': by_rank[0], 'middle': by_rank[len(by_rank) // 2], 'bottom': by_rank[-1]}
+        rng = random.Random(2)
+        for pk in rng.sample(self.user_ids, 200):
+            award_xp(pk, rng.randrange(1, 500))  # an uncompacted tail
+
+        index = XPIndex(background=False)
+        with mock.patch('community.leaderboard.xp_index', index):
+            with timed(f"building the XP index of {self.rows}", self.rows):
+                index.current()
+            for label, user_id in users.items():
+                with timed(f"20 standings of the {label} user, XP index", 20):
+                    for _ in range(20):
+                        result = standing(user_id)
+                self.assertTrue(result['exact'])
+            with override_settings(LEADERBOARD_XP_INDEX=False):
+                for label, user_id in users.items():
+                    with timed(f"20 standings of the {label} user, database", 20):
+                        for _ in range(20):
+                            result = standing(user_id)
+                    print(f", exact: {result['exact']}", end='')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class LedgerConcurrencyTests(IsolatedStorageMixin, TransactionTestCase):
+    """
+    Writers, compactors and readers on their own threads, so each has its own
+    connection; that needs the file test database set in DATABASES['TEST'].
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user_ids = [User.objects.create_user(email=f'racer{number}@example.com', password='x').pk
+                         for number in range(12)]
+        self.writing = threading.Event()
+        self.writing.set()
+
+    def run_threads(self, writers, others):
+        errors = []
+
+        def run(target, *args):
+            try:
+                target(*args)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in others]
+        for thread in threads:
+            thread.start()
+        writing = [threading.Thread(target=run, args=(target,)) for target in writers]
+        for thread in writing:
+            thread.start()
+        for thread in writing:
+            thread.join()
+        self.writing.clear()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def writer(self, seed, amounts):
+        def run():
+            rng = random.Random(seed)
+            for _ in range(120):
+                award_xp(rng.choice(self.user_ids), rng.choice(amounts))
+        return run
+
+    def compactor(self, applied):
+        def run():
+            while self.writing.is_set():
+                applied.append(compact(batch_size=15)[0])
+        return run
+
+    def test_overlapping_compactions_apply_every_event_exactly_once(self):
+        applied = []
+        self.run_threads([self.writer(seed, [-10, -3, 4, 25]) for seed in range(4)],
+                         [self.compactor(applied) for _ in range(3)])
+        applied.append(compact()[0])
+
+        self.assertGreater(len([count for count in applied if count]), 3)  # the compactors really overlapped writes
+        self.assertEqual(sum(applied), XPEvent.objects.count())
+        self.assertFalse(XPEvent.objects.filter(compaction_id__isnull=True).exists())
+        self.assertEqual(dict(Leaderboard.objects.values_list('user_id', 'xp_points')), _event_totals())
+
+    def test_current_xp_never_goes_backwards_while_compacting(self):
+        seen = []
+
+        def reader():
+            previous = dict.fromkeys(self.user_ids, 0)
+            while self.writing.is_set():
+                totals = current_xp(self.user_ids)
+                seen.extend(pk for pk in self.user_ids if totals[pk] < previous[pk])
+                previous = totals
+
+        self.run_threads([self.writer(seed, [1, 5, 20]) for seed in range(3)],
+                         [self.compactor([]), self.compactor([]), reader])
+
+        self.assertEqual(seen, [])
+        self.assertEqual(current_xp(self.user_ids), {pk: _event_totals().get(pk, 0) for pk in self.user_ids})
+
+
+@mock.patch('community.leaderboard.XP_INDEX_REBUILD_INTERVAL', 0)
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class XPIndexRebuildTests(IsolatedStorageMixin, TransactionTestCase):
+    """The background rebuild reads committed rows on its own connection, so this commits them"""
+
+    def setUp(self):
+        super().setUp()
+        self.user_ids = seed_leaderboard(30, max_xp=100, seed=7)
+        self.index = XPIndex()
+        patcher = mock.patch('community.leaderboard.xp_index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_a_stale_index_is_served_while_it_rebuilds_in_the_background(self):
+        self.assertEqual(self.index.current(), (None, False))  # the first build has only started
+        self.index.join()
+        self.assertEqual(self.index.current(), (self.index, True))
+        self.assertTrue(standing(self.user_ids[0])['exact'])
+
+        award_xp(self.user_ids[0], 500)
+        compact()
+        release, build = threading.Event(), self.index._build
+
+        def slow_build():
+            release.wait(10)
+            build()
+
+        with mock.patch.object(self.index, '_build', slow_build):
+            self.assertEqual(self.index.current(), (self.index, False))
+            result = standing(self.user_ids[0])
+            release.set()
+            self.index.join()
+        self.assertFalse(result['exact'])
+        self.assertEqual(self.index.current(), (self.index, True))
+        result = standing(self.user_ids[0])
+        self.assertEqual((result['rank'], result['exact']), (1, True))
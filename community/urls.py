@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'community'
+
+urlpatterns = [
+    path('xp/', views.XPTotalView.as_view(), name='xp-total'),
+    path('leaderboard/me/', views.LeaderboardStandingView.as_view(), name='leaderboard-standing'),
+]
@@ -1,3 +1,32 @@
-from django.shortcuts import render
+from rest_framework import status
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+from accounts.permissions import IsActiveUser
+from .leaderboard import MAX_NEIGHBOUR_RADIUS, NEIGHBOUR_RADIUS, standing
+from .ledger import current_xp
 
-# Create your views here.
+
+class LeaderboardStandingView(GenericAPIView):
+    """The current user's rank by current XP plus ?radius= (default 10) entries above and below"""
+    permission_classes = [IsActiveUser]
+
+    def get(self, request):
+        try:
+            radius = int(request.query_params.get('radius', NEIGHBOUR_RADIUS))
+        except ValueError:
+            radius = -1
+        if not 0 <= radius <= MAX_NEIGHBOUR_RADIUS:
+            return Response({"error": f"radius must be an integer from 0 to {MAX_NEIGHBOUR_RADIUS}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        result = standing(request.user.pk, radius)
+        if result is None:
+            return Response({"error": "You are not on the leaderboard yet"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
+
+
+class XPTotalView(GenericAPIView):
+    """The current user's XP, including events not yet compacted into the leaderboard"""
+    permission_classes = [IsActiveUser]
+
+    def get(self, request):
+        return Response({'xp_points': current_xp([request.user.pk]).get(request.user.pk, 0)})
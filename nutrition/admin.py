@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import MealCategory, Meal, UserMealPlan, UserUploadedMeal
+from .models import (
+    MealCategory, Meal, UserMealPlan, UserUploadedMeal, UserNutritionDailyStat, Allergen, Ingredient
+)
 
 
 @admin.register(MealCategory)
@@ -10,7 +12,7 @@ class MealCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Meal)
 class MealAdmin(admin.ModelAdmin):
-    list_display = ['title', 'category', 'calories', 'cook_time_min', 'ai_rating']
+    list_display = ['title', 'category', 'calories', 'protein_g', 'carbs_g', 'fat_g', 'cook_time_min', 'ai_rating']
     list_filter = ['category']
     search_fields = ['title', 'ingredients']
 
@@ -25,6 +27,29 @@ class UserMealPlanAdmin(admin.ModelAdmin):
 
 @admin.register(UserUploadedMeal)
 class UserUploadedMealAdmin(admin.ModelAdmin):
-    list_display = ['user', 'created_at']
-    search_fields = ['user__email']
+    list_display = ['user', 'status', 'attempts', 'created_at', 'analyzed_at']
+    list_filter = ['status']
+    search_fields = ['user__email', 'image_hash']
     ordering = ['-created_at']
+
+
+@admin.register(UserNutritionDailyStat)
+class UserNutritionDailyStatAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'meals', 'calories', 'protein_g', 'carbs_g', 'fat_g']
+    list_filter = ['date']
+    search_fields = ['user__email']
+    ordering = ['-date']
+
+
+@admin.register(Allergen)
+class AllergenAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug']
+    search_fields = ['name', 'slug']
+
+
+@admin.register(Ingredient)
+class IngredientAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    list_filter = ['allergens']
+    search_fields = ['name']
+    filter_horizontal = ['allergens']
@@ -0,0 +1,42 @@
+"""
+Meal photo analyzers. settings.MEAL_PHOTO_ANALYZER names the class the upload
+worker uses; anything with an analyze(path) -> dict method will do.
+"""
+import hashlib
+from functools import lru_cache
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class MealAnalyzer:
+    """Interface: turn a stored meal photo into a nutrition estimate"""
+    name = 'base'
+
+    def analyze(self, path):
+        raise NotImplementedError
+
+
+class StubMealAnalyzer(MealAnalyzer):
+    """Deterministic stand-in for local development and tests: the estimate is derived from the file bytes"""
+    name = 'stub'
+
+    def analyze(self, path):
+        with open(path, 'rb') as handle:
+            digest = hashlib.sha256(handle.read()).digest()
+        calories = 200 + int.from_bytes(digest[:2], 'big') % 700
+        protein_share, fat_share = 0.15 + digest[2] / 255 * 0.2, 0.2 + digest[3] / 255 * 0.15
+        return {
+            'analyzer': self.name,
+            'calories': calories,
+            'macros': {
+                'protein': round(calories * protein_share / 4, 1),
+                'carbs': round(calories * (1 - protein_share - fat_share) / 4, 1),
+                'fats': round(calories * fat_share / 9, 1),
+            },
+            'confidence': round(0.5 + digest[4] / 255 * 0.5, 2),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_analyzer():
+    return import_string(settings.MEAL_PHOTO_ANALYZER)()
@@ -0,0 +1,69 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from .ingredients import filter_meals
+
+# query parameter suffix -> indexed Meal column
+RANGE_FILTERS = {
+    'protein': 'protein_g',
+    'carbs': 'carbs_g',
+    'fat': 'fat_g',
+    'calories': 'calories',
+}
+
+
+def _list_param(params, name):
+    return [value.strip() for value in params.get(name, '').split(',') if value.strip()]
+
+
+def _number_param(params, name, cast=float):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValidationError({name: "Must be a number."})
+
+
+class MealFilterBackend(BaseFilterBackend):
+    """
+    Meal catalog filters: ?category=, ?q= (title), ?max_cook_time=, and
+    ?min_<macro>=/max_<macro>= for protein, carbs, fat (grams) and calories.
+    Macro ranges run on the numeric columns denormalized from Meal.macros,
+    each of which is indexed. ?ingredients=, ?exclude_ingredients= and
+    ?exclude_allergens= take comma-separated lists and go through the
+    ingredient index.
+
+    With a macro range, pages are ordered by (that column, pk) instead of the
+    paginator's -pk, so the column's index serves both the range and the order
+    and a page reads only its own rows. The first of RANGE_FILTERS given wins.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params
+        for name, column in RANGE_FILTERS.items():
+            if any(params.get(f'{bound}_{name}') not in (None, '') for bound in ('min', 'max')):
+                return (column, 'pk')
+        return None
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        category = _number_param(params, 'category', int)
+        if category is not None:
+            queryset = queryset.filter(category_id=category)
+
+        query = params.get('q', '').strip()
+        if query:
+            queryset = queryset.filter(title__icontains=query)
+
+        lookups = {'cook_time_min__lte': _number_param(params, 'max_cook_time', int)}
+        for name, column in RANGE_FILTERS.items():
+            lookups[f'{column}__gte'] = _number_param(params, f'min_{name}')
+            lookups[f'{column}__lte'] = _number_param(params, f'max_{name}')
+        queryset = queryset.filter(**{lookup: value for lookup, value in lookups.items() if value is not None})
+        return filter_meals(
+            queryset,
+            include=_list_param(params, 'ingredients'),
+            exclude=_list_param(params, 'exclude_ingredients'),
+            exclude_allergens=_list_param(params, 'exclude_allergens'),
+        )
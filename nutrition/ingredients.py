@@ -0,0 +1,169 @@
+"""
+Ingredient inverted index over Meal.ingredients.
+
+parse_ingredients() turns the free-text list into normalized names
+("200g chicken breasts (diced)" -> "chicken breast"). Each distinct name is
+an Ingredient row, flagged with allergens by whole-word keyword match when
+it is first seen, and MealIngredient links meals to them. Include/exclude
+queries then match whole words against the small Ingredient vocabulary and
+join through meal_ingredients instead of scanning meal text with LIKE.
+"""
+import re
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from .models import Allergen, Ingredient, Meal, MealIngredient
+
+# Allergen slug -> whole words that flag an ingredient, and phrases that clear it again.
+ALLERGEN_KEYWORDS = {
+    'dairy': ({'milk', 'cheese', 'butter', 'cream', 'yogurt', 'yoghurt', 'whey', 'casein', 'ghee',
+               'mozzarella', 'parmesan', 'feta', 'ricotta', 'cheddar', 'kefir'},
+              ('peanut butter', 'almond butter', 'nut butter', 'cocoa butter', 'coconut milk', 'coconut cream',
+               'almond milk', 'soy milk', 'oat milk', 'rice milk', 'cashew milk')),
+    'eggs': ({'egg', 'mayonnaise', 'meringue'}, ()),
+    'peanuts': ({'peanut'}, ()),
+    'tree-nuts': ({'almond', 'walnut', 'cashew', 'pecan', 'hazelnut', 'pistachio', 'macadamia'}, ()),
+    'gluten': ({'wheat', 'flour', 'bread', 'pasta', 'barley', 'rye', 'couscous', 'bulgur', 'seitan',
+                'noodle', 'tortilla'}, ('rice flour', 'almond flour', 'coconut flour', 'rice noodle',
+                                        'corn tortilla')),
+    'soy': ({'soy', 'soya', 'tofu', 'edamame', 'tempeh', 'miso'}, ()),
+    'fish': ({'fish', 'salmon', 'tuna', 'cod', 'anchovy', 'sardine', 'mackerel', 'trout', 'tilapia'}, ()),
+    'shellfish': ({'shrimp', 'prawn', 'crab', 'lobster', 'mussel', 'clam', 'oyster', 'scallop'}, ()),
+    'sesame': ({'sesame', 'tahini'}, ()),
+}
+
+UNITS = (
+    'g', 'gr', 'gram', 'kg', 'mg', 'ml', 'l', 'cl', 'dl', 'cup', 'tbsp', 'tsp', 'tablespoon', 'teaspoon',
+    'oz', 'lb', 'pinch', 'dash', 'handful', 'slice', 'clove', 'can', 'piece', 'bunch', 'sprig', 'scoop',
+)
+_SPLIT = re.compile(r'[,;\n]+')
+_PARENTHESES = re.compile(r'\([^)]*\)')
+_QUANTITY = re.compile(r'^(?:an?\s+|[\d½¼¾⅓⅔/.\-\s]+(?:x\s*)?)')
+_UNIT = re.compile(r'^(?:%s)s?\b\.?\s*(?:of\s+)?' % '|'.join(UNITS))
+_UNIT_OF = re.compile(r'^(?:%s)s?\s+of\s+' % '|'.join(UNITS))
+_NON_WORD = re.compile(r'[^a-z\s-]+')
+_SPACES = re.compile(r'[\s-]+')
+MAX_NAME_LENGTH = 100
+
+INDEX_CHUNK_SIZE = 2000
+
+
+def _singular(word):
+    if len(word) <= 3 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize(text):
+    """Lowercase, drop quantities, units and notes, and singularize each word"""
+    text = _PARENTHESES.sub(' ', text.lower()).strip(' \t-*•')
+    quantity = _QUANTITY.match(text)
+    if quantity and quantity.group():
+        # A bare unit word is only dropped after a quantity ("2 cloves garlic", not "cloves").
+        text = _UNIT.sub('', text[quantity.end():], count=1)
+    else:
+        text = _UNIT_OF.sub('', text, count=1)
+    words = _SPACES.split(_NON_WORD.sub(' ', text).strip())
+    return ' '.join(_singular(word) for word in words if word)[:MAX_NAME_LENGTH].strip()
+
+
+def parse_ingredients(text):
+    """Distinct normalized ingredient names from a free-text ingredient list, in order"""
+    if not text:
+        return []
+    names = (normalize(part) for part in _SPLIT.split(text))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def allergens_for(name):
+    words = set(name.split())
+    return [
+        slug for slug, (keywords, cleared) in ALLERGEN_KEYWORDS.items()
+        if words & keywords and not any(phrase in name for phrase in cleared)
+    ]
+
+
+def _ingredient_ids(names):
+    """name -> Ingredient id, creating (and allergen-flagging) names not seen before"""
+    ids = dict(Ingredient.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in ids]
+    if missing:
+        Ingredient.objects.bulk_create([Ingredient(name=name) for name in missing], ignore_conflicts=True)
+        created = dict(Ingredient.objects.filter(name__in=missing).values_list('name', 'id'))
+        ids.update(created)
+        allergen_ids = dict(Allergen.objects.values_list('slug', 'id'))
+        Ingredient.allergens.through.objects.bulk_create(
+            [
+                Ingredient.allergens.through(ingredient_id=created[name], allergen_id=allergen_ids[slug])
+                for name in created
+                for slug in allergens_for(name) if slug in allergen_ids
+            ],
+            ignore_conflicts=True,
+        )
+    return ids
+
+
+def index_meals(meals):
+    """Replace the ingredient links of the given (id, ingredients text) pairs"""
+    meals = list(meals)
+    with transaction.atomic():
+        for start in range(0, len(meals), INDEX_CHUNK_SIZE):
+            chunk = meals[start:start + INDEX_CHUNK_SIZE]
+            parsed = [(pk, parse_ingredients(text)) for pk, text in chunk]
+            ids = _ingredient_ids(list({name for _, names in parsed for name in names}))
+            MealIngredient.objects.filter(meal_id__in=[pk for pk, _ in chunk]).delete()
+            MealIngredient.objects.bulk_create(
+                [MealIngredient(meal_id=pk, ingredient_id=ids[name]) for pk, names in parsed for name in names],
+                batch_size=5000,
+            )
+
+
+def rebuild_ingredient_index(chunk_size=INDEX_CHUNK_SIZE):
+    """Re-index every meal; returns the number of meals processed"""
+    total = 0
+    chunk = []
+    for row in Meal.objects.order_by('pk').values_list('id', 'ingredients').iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            index_meals(chunk)
+            total += len(chunk)
+            chunk = []
+    index_meals(chunk)
+    return total + len(chunk)
+
+
+def matching_ingredients(terms):
+    """Ingredients containing any of the terms as whole words, as a subquery"""
+    condition = Q()
+    for term in terms:
+        term = normalize(term)
+        if term:
+            condition |= (Q(name=term) | Q(name__startswith=term + ' ') | Q(name__endswith=' ' + term)
+                          | Q(name__contains=' ' + term + ' '))
+    if not condition:
+        return Ingredient.objects.none()
+    return Ingredient.objects.filter(condition).values('id')
+
+
+def filter_meals(queryset, include=(), exclude=(), exclude_allergens=()):
+    """Meals listing every `include` term and none of the `exclude` terms or allergens"""
+    for term in include:
+        # Driven from the (ingredient, meal) index: only meals listing the ingredient are visited.
+        queryset = queryset.filter(pk__in=MealIngredient.objects.filter(
+            ingredient_id__in=matching_ingredients([term])
+        ).values('meal_id'))
+    if exclude:
+        queryset = queryset.exclude(Exists(
+            MealIngredient.objects.filter(meal_id=OuterRef('pk'), ingredient_id__in=matching_ingredients(exclude))
+        ))
+    if exclude_allergens:
+        flagged = Ingredient.objects.filter(allergens__slug__in=exclude_allergens).values('id')
+        queryset = queryset.exclude(Exists(
+            MealIngredient.objects.filter(meal_id=OuterRef('pk'), ingredient_id__in=flagged)
+        ))
+    return queryset
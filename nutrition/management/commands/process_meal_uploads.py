@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from nutrition.analyzers import get_analyzer
+from nutrition.photos import RETRY_BACKOFF, analyze_upload, claim_uploads
+
+
+class Command(BaseCommand):
+    help = "Analyze queued meal photos with the configured analyzer on a pool of worker threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent analyzer calls")
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--backoff', type=float, default=RETRY_BACKOFF,
+                            help="Seconds before the first retry of a failed analysis; doubles with each attempt")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting once drained")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep between polls with --loop")
+
+    def handle(self, *args, **options):
+        analyzer = get_analyzer()
+
+        def run(upload_id):
+            try:
+                return analyze_upload(upload_id, analyzer, max_attempts=options['max_attempts'],
+                                      backoff_seconds=options['backoff'])
+            finally:
+                # Each pool thread has its own database connection.
+                connection.close()
+
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            try:
+                while True:
+                    claimed = claim_uploads(options['batch_size'])
+                    for ok in pool.map(run, claimed):
+                        if ok:
+                            done += 1
+                        else:
+                            failed += 1
+                    if claimed:
+                        continue
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(f"Analyzed {done} meal photos, {failed} failed attempts"))
@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from nutrition.ingredients import INDEX_CHUNK_SIZE, rebuild_ingredient_index
+
+
+class Command(BaseCommand):
+    help = "Re-parse every meal's ingredients into the Ingredient/MealIngredient index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=INDEX_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = rebuild_ingredient_index(chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed ingredients of {total} meals in {elapsed:.1f}s, {rate:.0f} meals/s"
+        ))
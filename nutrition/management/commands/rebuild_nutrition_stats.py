@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from nutrition.stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Backfill the per-user daily nutrition rollups from UserMealPlan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', help="Only rebuild this user id (repeatable)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transaction.atomic():
+            created = rebuild_daily_stats(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {created} daily nutrition stats in {time.monotonic() - started:.1f}s"
+        ))
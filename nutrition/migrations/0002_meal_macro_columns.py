@@ -0,0 +1,90 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:30
+
+import re
+from django.db import migrations, models
+
+MACRO_COLUMNS = {
+    'protein_g': ('protein', 'protein_g'),
+    'carbs_g': ('carbs', 'carbs_g', 'carbohydrates'),
+    'fat_g': ('fats', 'fat', 'fat_g'),
+}
+GRAMS = re.compile(r'\s*(\d+(?:\.\d+)?)')
+
+
+def _grams(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = GRAMS.match(value)
+        return float(match.group(1)) if match else None
+    return None
+
+
+def backfill_macro_columns(apps, schema_editor):
+    Meal = apps.get_model('nutrition', 'Meal')
+    # Plain per-row UPDATEs by primary key: bulk_update's CASE expressions
+    # get quadratic on a large catalog.
+    sql = 'UPDATE %s SET protein_g = %%s, carbs_g = %%s, fat_g = %%s WHERE id = %%s' % (
+        schema_editor.quote_name(Meal._meta.db_table),
+    )
+    pending = []
+    with schema_editor.connection.cursor() as cursor:
+        for pk, macros in Meal.objects.exclude(macros={}).values_list('id', 'macros').iterator(chunk_size=2000):
+            macros = macros if isinstance(macros, dict) else {}
+            values = [next((_grams(macros[key]) for key in keys if key in macros), None)
+                      for keys in MACRO_COLUMNS.values()]
+            pending.append((*values, pk))
+            if len(pending) >= 2000:
+                cursor.executemany(sql, pending)
+                pending = []
+        if pending:
+            cursor.executemany(sql, pending)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meal',
+            name='carbs_g',
+            field=models.FloatField(blank=True, editable=False, help_text='Copied from macros on save', null=True),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='fat_g',
+            field=models.FloatField(blank=True, editable=False, help_text='Copied from macros on save', null=True),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='protein_g',
+            field=models.FloatField(blank=True, editable=False, help_text='Copied from macros on save', null=True),
+        ),
+        # Backfill before the indexes exist so the updates don't maintain them row by row.
+        migrations.RunPython(backfill_macro_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['protein_g'], name='meal_protein_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['carbs_g'], name='meal_carbs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['fat_g'], name='meal_fat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['calories'], name='meal_calories_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['category', 'calories'], name='meal_cat_calories_idx'),
+        ),
+    ]
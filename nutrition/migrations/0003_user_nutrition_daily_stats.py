@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0002_meal_macro_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserNutritionDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('calories', models.FloatField(default=0)),
+                ('protein_g', models.FloatField(default=0)),
+                ('carbs_g', models.FloatField(default=0)),
+                ('fat_g', models.FloatField(default=0)),
+                ('meals', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'User Nutrition Daily Stat',
+                'verbose_name_plural': 'User Nutrition Daily Stats',
+                'db_table': 'user_nutrition_daily_stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='usermealplan',
+            index=models.Index(fields=['user', 'date'], name='meal_plan_user_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='usernutritiondailystat',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nutrition_daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='usernutritiondailystat',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_user_nutrition_day'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_done(apps, schema_editor):
+    # Uploads from before the pipeline have no stored file to analyze.
+    UserUploadedMeal = apps.get_model('nutrition', 'UserUploadedMeal')
+    UserUploadedMeal.objects.update(status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0003_user_nutrition_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='analyzed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='image_hash',
+            field=models.CharField(blank=True, help_text='64-bit perceptual (difference) hash of the image, hex', max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='image_path',
+            field=models.CharField(blank=True, help_text='Stored file, relative to MEDIA_ROOT', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='last_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='thumbnail_url',
+            field=models.URLField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='useruploadedmeal',
+            index=models.Index(fields=['status', 'created_at'], name='uploaded_meal_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useruploadedmeal',
+            index=models.Index(fields=['image_hash', 'status'], name='uploaded_meal_hash_idx'),
+        ),
+        migrations.RunPython(mark_existing_done, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+ALLERGENS = [
+    ('dairy', 'Dairy'),
+    ('eggs', 'Eggs'),
+    ('peanuts', 'Peanuts'),
+    ('tree-nuts', 'Tree nuts'),
+    ('gluten', 'Gluten'),
+    ('soy', 'Soy'),
+    ('fish', 'Fish'),
+    ('shellfish', 'Shellfish'),
+    ('sesame', 'Sesame'),
+]
+
+
+def seed_allergens(apps, schema_editor):
+    Allergen = apps.get_model('nutrition', 'Allergen')
+    Allergen.objects.bulk_create([Allergen(slug=slug, name=name) for slug, name in ALLERGENS], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0004_uploaded_meal_pipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Allergen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Allergen',
+                'verbose_name_plural': 'Allergens',
+                'db_table': 'allergens',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('allergens', models.ManyToManyField(blank=True, related_name='ingredients', to='nutrition.allergen')),
+            ],
+            options={
+                'verbose_name': 'Ingredient',
+                'verbose_name_plural': 'Ingredients',
+                'db_table': 'ingredients',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MealIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_links', to='nutrition.ingredient')),
+                ('meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_links', to='nutrition.meal')),
+            ],
+            options={
+                'verbose_name': 'Meal Ingredient',
+                'verbose_name_plural': 'Meal Ingredients',
+                'db_table': 'meal_ingredients',
+                'indexes': [models.Index(fields=['ingredient', 'meal'], name='meal_ingredient_reverse_idx')],
+                'constraints': [models.UniqueConstraint(fields=('meal', 'ingredient'), name='unique_meal_ingredient')],
+            },
+        ),
+        migrations.RunPython(seed_allergens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0005_ingredient_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meal',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Natural key used by import_catalog', max_length=100, null=True, unique=True),
+        ),
+    ]
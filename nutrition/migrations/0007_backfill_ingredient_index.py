@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:02
+
+from django.db import migrations
+
+CHUNK_SIZE = 2000
+
+
+def backfill_ingredient_index(apps, schema_editor):
+    # 0005 only created the tables, so meals that existed before it matched no
+    # ?ingredients= filter and slipped through every exclusion until re-saved.
+    # The parser is pure, so the current one is used with the historical models.
+    from nutrition.ingredients import allergens_for, parse_ingredients
+
+    Meal = apps.get_model('nutrition', 'Meal')
+    Ingredient = apps.get_model('nutrition', 'Ingredient')
+    MealIngredient = apps.get_model('nutrition', 'MealIngredient')
+    Allergen = apps.get_model('nutrition', 'Allergen')
+    IngredientAllergen = Ingredient.allergens.through
+    allergen_ids = dict(Allergen.objects.values_list('slug', 'id'))
+
+    def index(chunk):
+        parsed = [(pk, parse_ingredients(text)) for pk, text in chunk]
+        names = list({name for _, names in parsed for name in names})
+        ids = {}
+        for start in range(0, len(names), 500):
+            ids.update(Ingredient.objects.filter(name__in=names[start:start + 500]).values_list('name', 'id'))
+        missing = [name for name in names if name not in ids]
+        if missing:
+            created = Ingredient.objects.bulk_create([Ingredient(name=name) for name in missing])
+            ids.update((ingredient.name, ingredient.pk) for ingredient in created)
+            IngredientAllergen.objects.bulk_create([
+                IngredientAllergen(ingredient_id=ingredient.pk, allergen_id=allergen_ids[slug])
+                for ingredient in created
+                for slug in allergens_for(ingredient.name) if slug in allergen_ids
+            ])
+        MealIngredient.objects.filter(meal_id__in=[pk for pk, _ in chunk]).delete()
+        MealIngredient.objects.bulk_create(
+            [MealIngredient(meal_id=pk, ingredient_id=ids[name]) for pk, names in parsed for name in names],
+            batch_size=5000,
+        )
+
+    chunk = []
+    meals = Meal.objects.exclude(ingredients__isnull=True).exclude(ingredients='').order_by('pk')
+    for row in meals.values_list('id', 'ingredients').iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            index(chunk)
+            chunk = []
+    if chunk:
+        index(chunk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0006_meal_external_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ingredient_index, migrations.RunPython.noop),
+    ]
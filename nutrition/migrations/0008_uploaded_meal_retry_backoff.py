@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:34
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0007_backfill_ingredient_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='useruploadedmeal',
+            name='uploaded_meal_queue_idx',
+        ),
+        migrations.AddField(
+            model_name='useruploadedmeal',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='A pending upload is not claimed before'),
+        ),
+        migrations.AddIndex(
+            model_name='useruploadedmeal',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='uploaded_meal_due_idx'),
+        ),
+    ]
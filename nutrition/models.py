@@ -1,6 +1,37 @@
+import re
 from django.db import models
+from django.utils import timezone
 from accounts.models import User
 
+# Denormalized Meal column -> keys accepted for it in Meal.macros
+MACRO_COLUMNS = {
+    'protein_g': ('protein', 'protein_g'),
+    'carbs_g': ('carbs', 'carbs_g', 'carbohydrates'),
+    'fat_g': ('fats', 'fat', 'fat_g'),
+}
+
+_GRAMS = re.compile(r'\s*(\d+(?:\.\d+)?)')
+
+
+def _grams(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _GRAMS.match(value)
+        return float(match.group(1)) if match else None
+    return None
+
+
+def macro_columns(macros):
+    """Numeric grams for each denormalized macro column, read from a free-form macros dict ("30", 30 or "30g")"""
+    macros = macros if isinstance(macros, dict) else {}
+    values = {}
+    for column, keys in MACRO_COLUMNS.items():
+        values[column] = next((_grams(macros[key]) for key in keys if key in macros), None)
+    return values
+
 
 class MealCategory(models.Model):
     """Categories for meals"""
@@ -25,18 +56,101 @@ class Meal(models.Model):
     cook_time_min = models.IntegerField(blank=True, null=True, help_text="Cooking time in minutes")
     calories = models.FloatField(blank=True, null=True)
     macros = models.JSONField(default=dict, help_text="Macronutrients (protein, carbs, fats)")
+    protein_g = models.FloatField(blank=True, null=True, editable=False, help_text="Copied from macros on save")
+    carbs_g = models.FloatField(blank=True, null=True, editable=False, help_text="Copied from macros on save")
+    fat_g = models.FloatField(blank=True, null=True, editable=False, help_text="Copied from macros on save")
     micros = models.JSONField(default=dict, help_text="Micronutrients (vitamins, minerals)")
     ai_rating = models.FloatField(blank=True, null=True, help_text="AI health rating")
     health_notes = models.TextField(blank=True, null=True)
+    external_id = models.CharField(max_length=100, unique=True, blank=True, null=True,
+                                   help_text="Natural key used by import_catalog")
     
     class Meta:
         db_table = 'meals'
         verbose_name = 'Meal'
         verbose_name_plural = 'Meals'
+        indexes = [
+            models.Index(fields=['protein_g'], name='meal_protein_idx'),
+            models.Index(fields=['carbs_g'], name='meal_carbs_idx'),
+            models.Index(fields=['fat_g'], name='meal_fat_idx'),
+            models.Index(fields=['calories'], name='meal_calories_idx'),
+            models.Index(fields=['category', 'calories'], name='meal_cat_calories_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # macros stays the source of truth; the numeric columns only exist so range filters can use an index.
+        for column, value in macro_columns(self.macros).items():
+            setattr(self, column, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'macros' in update_fields:
+            kwargs['update_fields'] = {*update_fields, *MACRO_COLUMNS}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the rollup signal skip re-aggregation when an edit leaves the nutrition untouched.
+        instance._loaded_nutrition = instance.nutrition_key()
+        # Likewise for re-indexing ingredients.
+        instance._loaded_ingredients = instance.__dict__.get('ingredients')
+        return instance
+
+    def nutrition_key(self):
+        return tuple(self.__dict__.get(name) for name in ('calories', 'protein_g', 'carbs_g', 'fat_g'))
+
+
+class Allergen(models.Model):
+    """Allergen taxonomy used to flag ingredients"""
+    slug = models.SlugField(max_length=50, unique=True)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = 'allergens'
+        verbose_name = 'Allergen'
+        verbose_name_plural = 'Allergens'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class Ingredient(models.Model):
+    """Normalized ingredient name parsed from Meal.ingredients"""
+    name = models.CharField(max_length=100, unique=True)
+    allergens = models.ManyToManyField(Allergen, blank=True, related_name='ingredients')
+
+    class Meta:
+        db_table = 'ingredients'
+        verbose_name = 'Ingredient'
+        verbose_name_plural = 'Ingredients'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class MealIngredient(models.Model):
+    """Inverted index row: this meal lists this ingredient"""
+    meal = models.ForeignKey(Meal, on_delete=models.CASCADE, related_name='ingredient_links')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='meal_links')
+
+    class Meta:
+        db_table = 'meal_ingredients'
+        verbose_name = 'Meal Ingredient'
+        verbose_name_plural = 'Meal Ingredients'
+        constraints = [
+            models.UniqueConstraint(fields=['meal', 'ingredient'], name='unique_meal_ingredient'),
+        ]
+        indexes = [
+            models.Index(fields=['ingredient', 'meal'], name='meal_ingredient_reverse_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.meal_id} - {self.ingredient_id}"
+
 
 class UserMealPlan(models.Model):
     """User's meal planning schedule"""
@@ -56,16 +170,65 @@ class UserMealPlan(models.Model):
         verbose_name = 'User Meal Plan'
         verbose_name_plural = 'User Meal Plans'
         ordering = ['date', 'meal_type']
+        indexes = [
+            models.Index(fields=['user', 'date'], name='meal_plan_user_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.meal_type} - {self.date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rollup bucket the row was loaded in, so moving it to
+        # another date can also refresh the day it left.
+        instance._loaded_stat_key = (instance.__dict__.get('user_id'), instance.__dict__.get('date'))
+        return instance
+
+
+class UserNutritionDailyStat(models.Model):
+    """Per-user per-day rollup of planned meals' calories and macros, maintained by signals"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='nutrition_daily_stats')
+    date = models.DateField()
+    calories = models.FloatField(default=0)
+    protein_g = models.FloatField(default=0)
+    carbs_g = models.FloatField(default=0)
+    fat_g = models.FloatField(default=0)
+    meals = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'user_nutrition_daily_stats'
+        verbose_name = 'User Nutrition Daily Stat'
+        verbose_name_plural = 'User Nutrition Daily Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_user_nutrition_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.date} - {self.calories} kcal"
+
 
 class UserUploadedMeal(models.Model):
     """User uploaded meal images with AI analysis"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_meals')
     image_url = models.URLField(max_length=255)
+    image_path = models.CharField(max_length=255, blank=True, null=True, help_text="Stored file, relative to MEDIA_ROOT")
+    thumbnail_url = models.URLField(max_length=255, blank=True, null=True)
+    image_hash = models.CharField(max_length=16, blank=True, null=True,
+                                  help_text="64-bit perceptual (difference) hash of the image, hex")
     ai_analysis = models.JSONField(default=dict, help_text="AI nutrition analysis")
+    status = models.CharField(max_length=20, default='pending',
+                              choices=[
+                                  ('pending', 'Pending'),
+                                  ('processing', 'Processing'),
+                                  ('done', 'Done'),
+                                  ('failed', 'Failed'),
+                              ])
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="A pending upload is not claimed before")
+    started_at = models.DateTimeField(blank=True, null=True)
+    analyzed_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -73,6 +236,10 @@ class UserUploadedMeal(models.Model):
         verbose_name = 'User Uploaded Meal'
         verbose_name_plural = 'User Uploaded Meals'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='uploaded_meal_due_idx'),
+            models.Index(fields=['image_hash', 'status'], name='uploaded_meal_hash_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
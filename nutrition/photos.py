@@ -0,0 +1,168 @@
+"""
+Meal photo upload pipeline.
+
+The request only streams the file to MEDIA_ROOT, checks it is an image,
+writes a thumbnail and computes a perceptual hash; analysis happens later in
+the process_meal_uploads worker. A photo whose hash matches an already
+analyzed upload reuses that analysis instead of being queued again.
+"""
+import uuid
+from pathlib import Path
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from notifications.models import Notification
+from .models import UserUploadedMeal
+
+UPLOAD_DIR = 'meal_uploads'
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+THUMBNAIL_SIZE = (320, 320)
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+STALE_AFTER = 10 * 60  # seconds before a 'processing' row from a dead worker is claimed again
+RETRY_BACKOFF = 30  # seconds before the first retry of a failed analysis; doubles with each attempt
+
+
+class InvalidPhoto(Exception):
+    pass
+
+
+def difference_hash(image):
+    """64-bit dHash as 16 hex digits: 1 where a pixel is brighter than its right neighbour on a 9x8 grayscale"""
+    pixels = list(image.convert('L').resize((9, 8), Image.Resampling.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f'{bits:016x}'
+
+
+def _media_path(relative):
+    return Path(settings.MEDIA_ROOT) / relative
+
+
+def store_photo(upload):
+    """
+    Stream an uploaded file to disk and thumbnail it.
+    Returns (image path, thumbnail path, perceptual hash), paths relative to MEDIA_ROOT.
+    """
+    if upload.size > MAX_UPLOAD_BYTES:
+        raise InvalidPhoto(f"Images must be at most {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+
+    now = timezone.now()
+    folder = Path(UPLOAD_DIR) / f'{now:%Y}' / f'{now:%m}'
+    _media_path(folder).mkdir(parents=True, exist_ok=True)
+    stem = uuid.uuid4().hex
+    partial = _media_path(folder / f'{stem}.part')
+    with open(partial, 'wb') as handle:
+        for chunk in upload.chunks():
+            handle.write(chunk)
+
+    thumbnail = folder / f'{stem}_thumb.jpg'
+    stored = None
+    try:
+        try:
+            with Image.open(partial) as image:
+                extension = FORMATS.get(image.format)
+                if extension is None:
+                    raise InvalidPhoto("Images must be JPEG, PNG or WebP")
+                # Lets JPEG decode at a fraction of full size, which is all the hash and thumbnail need.
+                image.draft('RGB', THUMBNAIL_SIZE)
+                image.thumbnail(THUMBNAIL_SIZE)
+                image_hash = difference_hash(image)
+                image.convert('RGB').save(_media_path(thumbnail), 'JPEG', quality=85)
+        except Image.DecompressionBombError as exc:
+            raise InvalidPhoto("Image dimensions are too large") from exc
+        except (UnidentifiedImageError, OSError) as exc:
+            raise InvalidPhoto("File is not a readable image") from exc
+        destination = folder / f'{stem}.{extension}'
+        partial.rename(_media_path(destination))
+        stored = destination
+    finally:
+        # No .part file or orphan thumbnail is left behind, whatever the failure.
+        partial.unlink(missing_ok=True)
+        if stored is None:
+            _media_path(thumbnail).unlink(missing_ok=True)
+
+    return str(stored), str(thumbnail), image_hash
+
+
+def create_upload(user_id, upload, build_url):
+    """Store the photo and either reuse a matching analysis or queue it. build_url maps a media path to a URL."""
+    image_path, thumbnail_path, image_hash = store_photo(upload)
+    previous = (
+        UserUploadedMeal.objects.filter(image_hash=image_hash, status='done')
+        .exclude(ai_analysis={}).values_list('ai_analysis', flat=True).first()
+    )
+    fields = {'status': 'pending'}
+    if previous is not None:
+        fields = {'status': 'done', 'ai_analysis': previous, 'analyzed_at': timezone.now()}
+    return UserUploadedMeal.objects.create(
+        user_id=user_id,
+        image_url=build_url(image_path),
+        image_path=image_path,
+        thumbnail_url=build_url(thumbnail_path),
+        image_hash=image_hash,
+        **fields,
+    )
+
+
+def claim_uploads(batch_size):
+    """Mark up to batch_size due uploads as processing and return their ids; safe with several workers"""
+    now = timezone.now()
+    stale = now - timezone.timedelta(seconds=STALE_AFTER)
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(status='processing', started_at__lt=stale)
+    candidates = list(
+        UserUploadedMeal.objects.filter(due).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size]
+    )
+    claimed = []
+    for pk in candidates:
+        # Conditional update: only one worker wins a given row.
+        won = UserUploadedMeal.objects.filter(due, pk=pk).update(
+            status='processing', started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if won:
+            claimed.append(pk)
+    return claimed
+
+
+def analyze_upload(upload_id, analyzer, max_attempts=3, backoff_seconds=RETRY_BACKOFF):
+    """
+    Analyze one claimed upload. Returns True when it ends up done. A failed
+    attempt is retried with exponential backoff until max_attempts is reached.
+    """
+    upload = UserUploadedMeal.objects.get(pk=upload_id)
+    analysis = None
+    if upload.image_hash:
+        # Another worker may have analyzed the same photo since this one was queued.
+        analysis = (
+            UserUploadedMeal.objects.filter(image_hash=upload.image_hash, status='done')
+            .exclude(ai_analysis={}).values_list('ai_analysis', flat=True).first()
+        )
+    try:
+        if analysis is None:
+            if not upload.image_path:
+                raise InvalidPhoto("Upload has no stored image")
+            analysis = analyzer.analyze(_media_path(upload.image_path))
+    except Exception as exc:
+        upload.last_error = str(exc)
+        if upload.attempts >= max_attempts or isinstance(exc, InvalidPhoto):
+            upload.status = 'failed'
+        else:
+            upload.status = 'pending'
+            delay = backoff_seconds * 2 ** (upload.attempts - 1)
+            upload.next_attempt_at = timezone.now() + timezone.timedelta(seconds=delay)
+        upload.save(update_fields=['status', 'last_error', 'next_attempt_at'])
+        return False
+
+    upload.ai_analysis = analysis
+    upload.status = 'done'
+    upload.analyzed_at = timezone.now()
+    upload.last_error = None
+    upload.save(update_fields=['ai_analysis', 'status', 'analyzed_at', 'last_error'])
+    Notification.objects.create(
+        user_id=upload.user_id,
+        title="Meal analysis ready",
+        message=f"Your meal photo was analyzed: about {analysis.get('calories', '?')} kcal.",
+    )
+    return True
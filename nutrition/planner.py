@@ -0,0 +1,197 @@
+"""
+Weekly meal-plan generator.
+
+Daily calorie and macro targets come from the profile (Mifflin-St Jeor BMR,
+an activity multiplier and a goal adjustment). Each slot (breakfast, lunch,
+dinner, snack) aims at a fixed share of the day. Because a slot's target is
+the same every day, every eligible meal is scored against each slot once and
+only the best SHORTLIST_SIZE per slot are kept. Days are then filled greedily
+from those shortlists, against what the day still needs, and improved by
+single-meal swaps until no swap brings a day closer to its targets. No meal
+is used twice in a week.
+
+The eligible catalog is read once per Meal/MealCategory version and memoized
+per process, so a warm worker only scores it.
+"""
+import heapq
+from datetime import timedelta
+from django.db import transaction
+from accounts.models import User
+from GymGeniusAI.versioning import get_versions
+from .models import Meal, MealCategory, UserMealPlan
+from .stats import deferred_refresh, refresh_daily_stats
+
+SLOT_SHARES = {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.30, 'snack': 0.10}
+NUTRIENTS = ('calories', 'protein_g', 'carbs_g', 'fat_g')
+# How much a miss on each nutrient counts, relative to its daily target.
+NUTRIENT_WEIGHTS = (1.0, 0.7, 0.4, 0.4)
+
+ACTIVITY_FACTORS = {None: 1.2, 'beginner': 1.375, 'intermediate': 1.55, 'advanced': 1.725}
+GOAL_CALORIES = {'weight_loss': -500, 'gain_endurance': 200}
+PROTEIN_PER_KG = {'weight_loss': 2.0, 'gain_endurance': 1.6}
+FAT_SHARE = 0.25
+MIN_CALORIES = 1200
+
+# Stand-ins for profile fields the user has not filled in.
+DEFAULT_WEIGHT_KG = 70
+DEFAULT_HEIGHT_CM = 170
+DEFAULT_AGE = 30
+
+PLAN_DAYS = 7
+SHORTLIST_SIZE = 60
+MAX_IMPROVEMENT_PASSES = 4
+
+
+_catalog = {'version': None, 'rows': ()}
+
+
+class PlanError(Exception):
+    pass
+
+
+def daily_targets(profile):
+    """Calories and macro grams per day for a profile dict"""
+    weight = profile.get('weight_kg') or DEFAULT_WEIGHT_KG
+    height = profile.get('height_cm') or DEFAULT_HEIGHT_CM
+    age = profile.get('age') or DEFAULT_AGE
+    offset = {'male': 5, 'female': -161}.get(profile.get('gender'), -78)
+    bmr = 10 * weight + 6.25 * height - 5 * age + offset
+    goal = profile.get('goal')
+    calories = bmr * ACTIVITY_FACTORS.get(profile.get('activity_level'), 1.2) + GOAL_CALORIES.get(goal, 0)
+    calories = max(calories, MIN_CALORIES)
+    protein = weight * PROTEIN_PER_KG.get(goal, 1.6)
+    fat = calories * FAT_SHARE / 9
+    carbs = max(calories - protein * 4 - fat * 9, 0) / 4
+    return dict(zip(NUTRIENTS, (round(calories), round(protein), round(carbs), round(fat))))
+
+
+def _scorer(goal, scale):
+    """
+    Weighted squared miss of a nutrient tuple against `goal`. Unrolled over the
+    four NUTRIENTS because it runs once per meal per slot.
+    """
+    g0, g1, g2, g3 = goal
+    k0, k1, k2, k3 = (w / s ** 2 for w, s in zip(NUTRIENT_WEIGHTS, scale))
+
+    def score(nutrition):
+        n0, n1, n2, n3 = nutrition
+        return k0 * (n0 - g0) ** 2 + k1 * (n1 - g1) ** 2 + k2 * (n2 - g2) ** 2 + k3 * (n3 - g3) ** 2
+    return score
+
+
+def _totals(day):
+    return [sum(values) for values in zip(*(nutrition for _, nutrition in day.values()))]
+
+
+def plan_week(meals, targets, days=PLAN_DAYS):
+    """
+    Pick a meal per slot per day from `meals` (id -> (category name, nutrient tuple)).
+    Returns a list of {slot: (meal id, nutrient tuple)} dicts, one per day.
+    """
+    goal = tuple(targets[name] for name in NUTRIENTS)
+    scale = tuple(max(value, 1) for value in goal)
+    if len(meals) < days * len(SLOT_SHARES):
+        raise PlanError(f"Need at least {days * len(SLOT_SHARES)} eligible meals, found {len(meals)}")
+
+    shortlists = {}
+    for slot, share in SLOT_SHARES.items():
+        slot_goal = [value * share for value in goal]
+        # Meals filed under a category named after the slot are preferred when there are enough of them.
+        pool = [(pk, n) for pk, (category, n) in meals.items() if category == slot]
+        if len(pool) < days:
+            pool = [(pk, n) for pk, (_, n) in meals.items()]
+        score = _scorer(slot_goal, scale)
+        shortlists[slot] = heapq.nsmallest(SHORTLIST_SIZE + days, pool, key=lambda item: score(item[1]))
+
+    used = set()
+    plan = []
+    for _ in range(days):
+        day = {}
+        for slot in SLOT_SHARES:
+            # Aim at what the day still needs, assuming the remaining slots hit their shares.
+            remaining = sum(SLOT_SHARES[s] for s in SLOT_SHARES if s not in day and s != slot)
+            have = [sum(values) for values in zip(*(n for _, n in day.values()))] or [0] * len(NUTRIENTS)
+            score = _scorer([g * (1 - remaining) - h for g, h in zip(goal, have)], scale)
+            best = min(
+                (item for item in shortlists[slot] if item[0] not in used),
+                key=lambda item: score(item[1]),
+                default=None,
+            )
+            if best is None:
+                raise PlanError(f"Ran out of distinct {slot} meals")
+            day[slot] = best
+            used.add(best[0])
+        plan.append(day)
+
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
+        for day in plan:
+            for slot in SLOT_SHARES:
+                current = day[slot]
+                # The day's miss with a candidate in this slot is the candidate's miss against what the rest leaves.
+                rest = [t - n for t, n in zip(_totals(day), current[1])]
+                score = _scorer([g - r for g, r in zip(goal, rest)], scale)
+                best_error = score(current[1])
+                for candidate in shortlists[slot]:
+                    if candidate[0] in used:
+                        continue
+                    error = score(candidate[1])
+                    if error < best_error - 1e-9:
+                        used.discard(current[0])
+                        used.add(candidate[0])
+                        current, best_error, improved = candidate, error, True
+                day[slot] = current
+        if not improved:
+            break
+    return plan
+
+
+def _catalog_rows():
+    """(id, category name, cook time, nutrient tuple) for every meal with calories, per catalog version"""
+    version = get_versions(Meal, MealCategory)
+    if _catalog['version'] != version:
+        categories = {pk: (name or '').strip().lower() for pk, name in MealCategory.objects.values_list('id', 'name')}
+        rows = Meal.objects.filter(calories__isnull=False).order_by().values_list(
+            'id', 'category_id', 'cook_time_min', *NUTRIENTS
+        )
+        _catalog.update(version=version, rows=tuple(
+            (pk, categories.get(category_id, ''), cook_time, tuple(value or 0.0 for value in nutrition))
+            for pk, category_id, cook_time, *nutrition in rows
+        ))
+    return _catalog['rows']
+
+
+def eligible_meals(max_cook_time=None):
+    return {
+        pk: (category, nutrition)
+        for pk, category, cook_time, nutrition in _catalog_rows()
+        if max_cook_time is None or (cook_time is not None and cook_time <= max_cook_time)
+    }
+
+
+def generate_meal_plan(user_id, start, max_cook_time=None, days=PLAN_DAYS):
+    """
+    Build and store a plan for `days` days from `start`, replacing the user's
+    existing plan rows on those dates. Returns (targets, plan rows).
+    """
+    profile = User.objects.filter(pk=user_id).values(
+        'weight_kg', 'height_cm', 'age', 'gender', 'goal', 'activity_level'
+    ).first()
+    if profile is None:
+        raise PlanError("Unknown user")
+    targets = daily_targets(profile)
+    plan = plan_week(eligible_meals(max_cook_time), targets, days)
+
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    rows = [
+        UserMealPlan(user_id=user_id, meal_id=meal_id, date=date, meal_type=slot)
+        for date, day in zip(dates, plan)
+        for slot, (meal_id, _) in day.items()
+    ]
+    with transaction.atomic(), deferred_refresh():
+        # The delete refreshes a rollup per row through post_delete; deferred, they run once at the end of the block,
+        # together with the week's refresh below, which bulk_create needs as it skips post_save.
+        UserMealPlan.objects.filter(user_id=user_id, date__in=dates).delete()
+        UserMealPlan.objects.bulk_create(rows)
+        refresh_daily_stats((user_id, date) for date in dates)
+    return targets, rows
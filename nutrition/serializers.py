@@ -0,0 +1,32 @@
+from rest_framework import serializers
+from .models import Allergen, Meal, MealCategory, UserUploadedMeal
+
+class MealCategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MealCategory
+        fields = ['id', 'name']
+
+class AllergenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Allergen
+        fields = ['slug', 'name']
+
+class MealSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Meal
+        fields = ['id', 'title', 'image_url', 'category', 'ingredients', 'preparation', 'cook_time_min',
+                  'calories', 'macros', 'protein_g', 'carbs_g', 'fat_g', 'micros', 'ai_rating', 'health_notes']
+        read_only_fields = ['protein_g', 'carbs_g', 'fat_g']
+
+class MealPlanGenerateSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False, help_text="First planned day (default: today)")
+    max_cook_time = serializers.IntegerField(required=False, min_value=1, help_text="Only meals cooked within this many minutes")
+
+class UserUploadedMealSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserUploadedMeal
+        fields = ['id', 'image_url', 'thumbnail_url', 'status', 'ai_analysis', 'created_at', 'analyzed_at']
+        read_only_fields = fields
+
+class MealPhotoUploadSerializer(serializers.Serializer):
+    image = serializers.FileField()
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from GymGeniusAI.catalog import watch_catalog
+from GymGeniusAI.versioning import track_versions
+from .ingredients import index_meals
+from .models import Allergen, Meal, MealCategory, UserMealPlan
+from .stats import refresh_daily_stats, refresh_meal_days
+
+track_versions(MealCategory, Meal, Allergen)
+watch_catalog(MealCategory, Meal)
+
+
+@receiver(post_save, sender=UserMealPlan)
+@receiver(post_delete, sender=UserMealPlan)
+def refresh_meal_plan_rollup(sender, instance, **kwargs):
+    key = (instance.user_id, instance.date)
+    previous = getattr(instance, '_loaded_stat_key', None)
+    refresh_daily_stats({key, previous} if previous is not None else {key})
+    instance._loaded_stat_key = key
+
+
+@receiver(post_save, sender=Meal)
+def refresh_meal_rollups(sender, instance, created, **kwargs):
+    current = instance.nutrition_key()
+    if not created and getattr(instance, '_loaded_nutrition', None) != current:
+        refresh_meal_days([instance.pk])
+    instance._loaded_nutrition = current
+
+
+@receiver(post_save, sender=Meal)
+def reindex_meal_ingredients(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_loaded_ingredients', None) != instance.ingredients:
+        index_meals([(instance.pk, instance.ingredients)])
+    instance._loaded_ingredients = instance.ingredients
@@ -0,0 +1,90 @@
+import threading
+from contextlib import contextmanager
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import Coalesce
+from GymGeniusAI.rollups import daily_totals, rebuild_rollups, upsert_rollups
+from .models import UserMealPlan, UserNutritionDailyStat
+
+DAILY_TOTALS = {
+    'calories': Coalesce(Sum('meal__calories'), 0.0),
+    'protein_g': Coalesce(Sum('meal__protein_g'), 0.0),
+    'carbs_g': Coalesce(Sum('meal__carbs_g'), 0.0),
+    'fat_g': Coalesce(Sum('meal__fat_g'), 0.0),
+    'meals': Count('id'),
+}
+ROLLUP_FIELDS = list(DAILY_TOTALS)
+
+# Keeps the (user, date) OR-filters well under SQLite's expression depth limit.
+REFRESH_CHUNK_SIZE = 500
+
+_deferred = threading.local()
+
+
+def _key_filter(keys):
+    condition = Q()
+    for user_id, date in keys:
+        condition |= Q(user_id=user_id, date=date)
+    return condition
+
+
+def _normalize_key(key):
+    user_id, date = key
+    user_field = UserNutritionDailyStat._meta.get_field('user').target_field
+    date_field = UserNutritionDailyStat._meta.get_field('date')
+    return user_field.to_python(user_id), date_field.to_python(date)
+
+
+def refresh_daily_stats(keys):
+    """Recompute the given (user id, date) rollups: one grouped read and one upsert per chunk"""
+    # Keys are compared with the ones read back, so a string date or user id
+    # would otherwise look empty and have its fresh row deleted.
+    keys = {_normalize_key(key) for key in keys if None not in key}
+    if getattr(_deferred, 'keys', None) is not None:
+        _deferred.keys |= keys
+        return
+    keys = list(keys)
+    for start in range(0, len(keys), REFRESH_CHUNK_SIZE):
+        chunk = keys[start:start + REFRESH_CHUNK_SIZE]
+        rows = list(daily_totals(UserMealPlan.objects.filter(_key_filter(chunk)), DAILY_TOTALS))
+        upsert_rollups(UserNutritionDailyStat, rows, ROLLUP_FIELDS)
+        empty = set(chunk) - {(row['user_id'], row['date']) for row in rows}
+        if empty:
+            UserNutritionDailyStat.objects.filter(_key_filter(empty)).delete()
+
+
+@contextmanager
+def deferred_refresh():
+    """
+    Collect the refresh_daily_stats() calls made in the block, such as one per
+    row from the plan signals of a queryset delete, and run them as one at its end.
+    """
+    if getattr(_deferred, 'keys', None) is not None:
+        yield  # nested: the outermost block refreshes
+        return
+    _deferred.keys = keys = set()
+    try:
+        yield
+    finally:
+        _deferred.keys = None
+    refresh_daily_stats(keys)
+
+
+def refresh_meal_days(meal_ids, batch_size=1000):
+    """Re-aggregate every (user, day) that has one of these meals planned, after their nutrition changed"""
+    affected = UserMealPlan.objects.filter(
+        meal_id__in=list(meal_ids), user_id=OuterRef('user_id'), date=OuterRef('date')
+    )
+    rows = daily_totals(UserMealPlan.objects.filter(Exists(affected)), DAILY_TOTALS, batch_size)
+    batch = []
+    updated = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            updated += len(upsert_rollups(UserNutritionDailyStat, batch, ROLLUP_FIELDS, batch_size))
+            batch = []
+    return updated + len(upsert_rollups(UserNutritionDailyStat, batch, ROLLUP_FIELDS, batch_size))
+
+
+def rebuild_daily_stats(user_ids=None, batch_size=2000):
+    """Recreate the rollup table (or just some users' rows) with one grouped scan"""
+    return rebuild_rollups(UserNutritionDailyStat, UserMealPlan.objects.all(), DAILY_TOTALS, user_ids, batch_size)
@@ -1,3 +1,640 @@
-from django.test import TestCase
+import io
+import os
+import random
+import shutil
+import statistics
+import threading
+from datetime import date, timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from accounts.models import User
+from accounts.serializers import CustomTokenObtainPairSerializer
+from notifications.models import Notification
+from GymGeniusAI.rollups import daily_totals
+from GymGeniusAI.testing import FAST_PASSWORD_HASHERS, IsolatedStorageMixin, benchmark, scaled, timed
+from .analyzers import StubMealAnalyzer
+from .filters import RANGE_FILTERS
+from .ingredients import rebuild_ingredient_index
+from .models import (
+    Meal, MealCategory, MealIngredient, UserMealPlan, UserNutritionDailyStat, UserUploadedMeal, macro_columns
+)
+from .photos import STALE_AFTER, analyze_upload, claim_uploads
+from .planner import PLAN_DAYS, SLOT_SHARES, daily_targets
+from .stats import rebuild_daily_stats
 
-# Create your tests here.
+
+def seed_meals(count, categories=10, seed=0, atwater=False):
+    """
+    Bulk insert `count` meals with varied macros across `categories` categories
+    (a number, or a list of names); bulk_create skips save(), so the macro
+    columns are set here. With `atwater`, calories follow the macros (4/4/9
+    kcal per gram, give or take 10%) instead of being drawn on their own.
+    """
+    rng = random.Random(seed)
+    names = categories if isinstance(categories, list) else [f'Category {number}' for number in range(categories)]
+    category_ids = [category.pk for category in MealCategory.objects.bulk_create(
+        MealCategory(name=name) for name in names
+    )]
+
+    def meal(number):
+        macros = {'protein': f'{rng.randrange(0, 80)}g', 'carbs': rng.randrange(0, 150), 'fat': rng.randrange(0, 60)}
+        columns = macro_columns(macros)
+        if atwater:
+            energy = 4 * columns['protein_g'] + 4 * columns['carbs_g'] + 9 * columns['fat_g']
+            calories = round(energy * rng.uniform(0.9, 1.1))
+        else:
+            calories = rng.randrange(50, 1500)
+        return Meal(title=f'Meal {number}', category_id=rng.choice(category_ids), macros=macros,
+                    calories=float(calories), cook_time_min=rng.randrange(5, 120), **columns)
+
+    Meal.objects.bulk_create((meal(number) for number in range(count)), batch_size=5000)
+    return category_ids
+
+
+def _matches(meal, params):
+    for name, column in RANGE_FILTERS.items():
+        value = getattr(meal, column)
+        low, high = params.get(f'min_{name}'), params.get(f'max_{name}')
+        if (low is not None or high is not None) and value is None:
+            return False
+        if low is not None and value < low or high is not None and value > high:
+            return False
+    return True
+
+
+# A selective, a broad and a combined range, plus one narrowed to a category.
+MACRO_QUERIES = [
+    {'min_protein': 70},
+    {'max_carbs': 100},
+    {'min_protein': 30, 'max_carbs': 40},
+    {'min_fat': 10, 'max_fat': 20, 'max_calories': 600},
+]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class MealAPITestCase(IsolatedStorageMixin, TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='member@example.com', password='Secret-pass-1', is_verified=True)
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def walk(self, url, params=None):
+        """Every result of a cursor-paginated list, following `next` links"""
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.data['results']
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            results += response.data['results']
+        return results
+
+
+class MealFilterTests(MealAPITestCase):
+    url = '/api/nutrition/meals/'
+
+    def test_macros_are_copied_to_the_indexed_columns(self):
+        category = MealCategory.objects.create(name='Dinner')
+        meal = Meal.objects.create(title='Stew', category=category, macros={'protein': '31.5g', 'carbs': 40})
+        self.assertEqual((meal.protein_g, meal.carbs_g, meal.fat_g), (31.5, 40.0, None))
+
+        meal.macros = {'protein': 12, 'fats': '9 g'}
+        meal.save(update_fields=['macros'])
+        meal.refresh_from_db()
+        self.assertEqual((meal.protein_g, meal.carbs_g, meal.fat_g), (12.0, None, 9.0))
+
+    def test_ranges_match_a_python_filter_over_every_page(self):
+        seed_meals(300, seed=3)
+        meals = list(Meal.objects.all())
+        for params in MACRO_QUERIES:
+            expected = {meal.pk for meal in meals if _matches(meal, params)}
+            results = self.walk(self.url, {**params, 'page_size': 40})
+            self.assertEqual(len(results), len(expected), params)
+            self.assertEqual({meal['id'] for meal in results}, expected, params)
+
+    def test_range_pages_follow_the_filtered_column(self):
+        seed_meals(300, seed=5)
+        results = self.walk(self.url, {'min_protein': 40, 'max_calories': 900, 'page_size': 25})
+        keys = [(Meal.objects.get(pk=meal['id']).protein_g, meal['id']) for meal in results]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(self.url, {'min_protein': 40, 'max_calories': 900})
+        sql = next(query['sql'] for query in captured if 'FROM "meals"' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = '; '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('USING INDEX meal_protein_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_category_and_cook_time_narrow_the_ranges(self):
+        category_ids = seed_meals(200, seed=4)
+        params = {'category': category_ids[0], 'max_cook_time': 30, 'min_protein': 20}
+        expected = set(Meal.objects.filter(category_id=category_ids[0], cook_time_min__lte=30, protein_g__gte=20)
+                       .values_list('pk', flat=True))
+        self.assertEqual({meal['id'] for meal in self.walk(self.url, params)}, expected)
+
+    def test_non_numeric_bound_is_rejected(self):
+        response = self.client.get(self.url, {'min_protein': 'lots'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_protein', response.data)
+
+
+@benchmark
+class MealCatalogBenchmark(MealAPITestCase):
+    """Macro range filter latency on a 500k-meal catalog, first page and deep pages"""
+    url = '/api/nutrition/meals/'
+
+    def _latencies(self, label, run, repeats=20):
+        samples = []
+        for _ in range(repeats):
+            with timed(label) as result:
+                run()
+            samples.append(result['elapsed'] * 1000)
+        print(f"\n  {label}: p50 {statistics.median(samples):.1f} ms, max {max(samples):.1f} ms", end='')
+
+    def _plan(self, params):
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(self.url, params)
+        sql = next(query['sql'] for query in captured if 'FROM "meals"' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '; '.join(row[-1] for row in cursor.fetchall())
+
+    def _deep_page(self, params, pages=10):
+        response = self.client.get(self.url, params)
+        for _ in range(pages - 1):
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        return response
+
+    def test_macro_filter_latency(self):
+        rows = scaled(500_000, 5000)
+        with timed(f"seeding {rows} meals", rows):
+            category_ids = seed_meals(rows)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        queries = [*MACRO_QUERIES, {'category': category_ids[0], 'max_calories': 400}]
+        with mock.patch('GymGeniusAI.testing.BENCHMARK_SCALE', 0):  # only the percentiles are printed
+            for params in queries:
+                self._latencies(f"first page {urlencode(params)}", lambda: self.client.get(self.url, params))
+                print(f"\n    plan: {self._plan(params)}", end='')
+                self._latencies(f"10th page {urlencode(params)}", lambda: self._deep_page(params), repeats=5)
+
+
+def _raw_daily_totals():
+    rows = (UserMealPlan.objects.order_by().values('user_id', 'date')
+            .annotate(calories=Sum('meal__calories'), protein=Sum('meal__protein_g'),
+                      carbs=Sum('meal__carbs_g'), fat=Sum('meal__fat_g'), meals=Count('id')))
+    return {(row['user_id'], row['date']): (row['calories'] or 0.0, row['protein'] or 0.0, row['carbs'] or 0.0,
+                                            row['fat'] or 0.0, row['meals'])
+            for row in rows}
+
+
+def _rollup_totals():
+    return {(row.user_id, row.date): (row.calories, row.protein_g, row.carbs_g, row.fat_g, row.meals)
+            for row in UserNutritionDailyStat.objects.all()}
+
+
+class NutritionRollupTests(MealAPITestCase):
+    def assertRollupsMatch(self):
+        expected = _raw_daily_totals()
+        rollups = _rollup_totals()
+        self.assertEqual(rollups.keys(), expected.keys())
+        for key, totals in rollups.items():
+            for total, raw in zip(totals, expected[key]):
+                self.assertAlmostEqual(total, raw, places=6, msg=key)
+
+    def test_rollups_track_random_edits_to_plans_and_meals(self):
+        rng = random.Random(18)
+        seed_meals(20, categories=2, seed=18)
+        meals = list(Meal.objects.all())
+        other = User.objects.create_user(email='other@example.com', password='x')
+        users = [self.user, other]
+        start = date(2026, 10, 1)
+        plans = []
+
+        for step in range(300):
+            action = rng.random()
+            day = start + timedelta(days=rng.randrange(10))
+            if rng.random() < 0.3:
+                day = day.isoformat()  # as a form or JSON payload would set it
+            if action < 0.45 or not plans:
+                plans.append(UserMealPlan.objects.create(
+                    user=rng.choice(users), meal=rng.choice(meals), date=day, meal_type='lunch').pk)
+            elif action < 0.75:
+                plan = UserMealPlan.objects.get(pk=rng.choice(plans))
+                plan.date = day
+                plan.meal = rng.choice(meals)
+                plan.save()
+            elif action < 0.9:
+                meal = Meal.objects.get(pk=rng.choice(meals).pk)
+                meal.macros = {'protein': rng.randrange(0, 80), 'carbs': f'{rng.randrange(0, 150)}g'}
+                meal.calories = rng.choice([None, float(rng.randrange(50, 1500))])
+                meal.save()
+            else:
+                UserMealPlan.objects.get(pk=plans.pop(rng.randrange(len(plans)))).delete()
+
+        self.assertRollupsMatch()
+        rebuilt = _rollup_totals()
+        rebuild_daily_stats()
+        self.assertEqual(_rollup_totals(), rebuilt)
+
+    def test_totals_by_day_and_month_and_rejected_ranges(self):
+        seed_meals(10, categories=1, seed=23)
+        meals = list(Meal.objects.all())
+        for offset in range(12):
+            UserMealPlan.objects.create(user=self.user, meal=meals[offset % 10], meal_type='lunch',
+                                        date=date(2026, 9, 25) + timedelta(days=offset))
+        url = '/api/nutrition/totals/'
+
+        daily = self.client.get(url, {'start': '2026-09-28', 'end': '2026-10-02'}).json()
+        self.assertEqual([bucket['period_start'] for bucket in daily['buckets']],
+                         ['2026-09-28', '2026-09-29', '2026-09-30', '2026-10-01', '2026-10-02'])
+        monthly = self.client.get(url, {'start': '2026-09-01', 'end': '2026-10-31', 'period': 'month'}).json()
+        self.assertEqual([(bucket['period_start'], bucket['meals']) for bucket in monthly['buckets']],
+                         [('2026-09-01', 6), ('2026-10-01', 6)])
+        self.assertAlmostEqual(monthly['totals']['calories'], sum(
+            meals[offset % 10].calories for offset in range(12)), places=6)
+
+        for params in ({'start': '2026-10-02', 'end': '2026-10-01'}, {'end': 'soon'}, {'period': 'year'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+    def test_string_date_keeps_the_new_rollup(self):
+        meal = Meal.objects.create(title='Oats', category=MealCategory.objects.create(name='Breakfast'),
+                                   calories=400, macros={'protein': 20})
+        UserMealPlan.objects.create(user=self.user, meal=meal, date='2026-10-05', meal_type='breakfast')
+
+        self.assertEqual(_rollup_totals(), {(self.user.pk, date(2026, 10, 5)): (400.0, 20.0, 0.0, 0.0, 1)})
+        self.assertRollupsMatch()
+
+
+class MealPlanTests(MealAPITestCase):
+    url = '/api/nutrition/meal-plans/generate/'
+
+    def test_plan_fills_every_slot_with_distinct_meals(self):
+        seed_meals(400, categories=[slot.title() for slot in SLOT_SHARES], seed=19, atwater=True)
+        response = self.client.post(self.url, {'start': '2026-10-05'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        days = response.data['days']
+        self.assertEqual(len(days), PLAN_DAYS)
+        meal_ids = [meal['meal'] for day in days for meal in day['meals']]
+        self.assertEqual(len(meal_ids), len(set(meal_ids)))
+        self.assertEqual(UserMealPlan.objects.filter(user=self.user).count(), len(meal_ids))
+        for day in days:
+            self.assertEqual([meal['meal_type'] for meal in day['meals']], list(SLOT_SHARES))
+            # Greedy fill plus swaps lands within a few percent of the calorie target on a catalog this varied.
+            self.assertAlmostEqual(day['totals']['calories'], response.data['targets']['calories'],
+                                   delta=response.data['targets']['calories'] * 0.05)
+        self.assertEqual(_rollup_totals(), _raw_daily_totals())
+
+    def test_regenerating_replaces_the_week(self):
+        seed_meals(200, categories=[slot.title() for slot in SLOT_SHARES], seed=20, atwater=True)
+        UserMealPlan.objects.create(user=self.user, meal=Meal.objects.first(), date='2026-10-07', meal_type='snack')
+        for _ in range(2):
+            self.assertEqual(self.client.post(self.url, {'start': '2026-10-05'}, format='json').status_code, 201)
+
+        self.assertEqual(UserMealPlan.objects.filter(user=self.user).count(), PLAN_DAYS * len(SLOT_SHARES))
+        self.assertEqual(_rollup_totals(), _raw_daily_totals())
+
+    def test_regenerating_refreshes_the_week_once(self):
+        seed_meals(200, categories=[slot.title() for slot in SLOT_SHARES], seed=22, atwater=True)
+        self.client.post(self.url, {'start': '2026-10-05'}, format='json')
+        with mock.patch('nutrition.stats.daily_totals', wraps=daily_totals) as totals:
+            self.assertEqual(self.client.post(self.url, {'start': '2026-10-05'}, format='json').status_code, 201)
+        # One grouped read for the whole week, not one per deleted plan row through post_delete.
+        self.assertEqual(totals.call_count, 1)
+        self.assertEqual(_rollup_totals(), _raw_daily_totals())
+
+    def test_catalog_changes_reach_the_next_plan(self):
+        seed_meals(200, categories=[slot.title() for slot in SLOT_SHARES], seed=21, atwater=True)
+        self.client.post(self.url, {}, format='json')
+        Meal.objects.filter(calories__isnull=False).update(cook_time_min=90)
+        quick = Meal.objects.filter(pk__in=Meal.objects.values('pk')[:PLAN_DAYS * len(SLOT_SHARES)])
+        for meal in quick:
+            meal.cook_time_min = 10
+            meal.save()  # bumps the catalog version
+
+        response = self.client.post(self.url, {'max_cook_time': 15}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual({meal['meal'] for day in response.data['days'] for meal in day['meals']},
+                         {meal.pk for meal in quick})
+
+    def test_too_few_meals_is_a_400(self):
+        seed_meals(10)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+
+
+@benchmark
+class MealPlanBenchmark(MealAPITestCase):
+    """Generating a week's plan from a 20k-meal catalog, end to end through the API"""
+    url = '/api/nutrition/meal-plans/generate/'
+    budget_ms = 200
+
+    def test_generate_latency(self):
+        rows = scaled(20_000, 2000)
+        seed_meals(rows, categories=[slot.title() for slot in SLOT_SHARES] + ['Dessert'], seed=19, atwater=True)
+        targets = daily_targets({})
+
+        samples = []
+        for number in range(10):
+            start = date(2026, 10, 5) + timedelta(days=7 * (number % 2))
+            label = "plan from %d meals (%s catalog)" % (rows, 'cold' if number == 0 else 'memoized')
+            with timed(label) as result:
+                response = self.client.post(self.url, {'start': start.isoformat()}, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+            samples.append(result['elapsed'] * 1000)
+        print(f"\n  p50 {statistics.median(samples):.1f} ms, max {max(samples):.1f} ms "
+              f"(targets {targets['calories']} kcal)", end='')
+        self.assertLess(max(samples), self.budget_ms)
+
+
+def _image_file(size=(64, 48), image_format='PNG', name='meal.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class MealPhotoUploadTests(MealAPITestCase):
+    url = '/api/nutrition/photos/'
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def stored_files(self):
+        return sorted(name for _, _, names in os.walk(settings.MEDIA_ROOT) for name in names)
+
+    def test_photo_is_stored_with_a_thumbnail(self):
+        response = self.client.post(self.url, {'image': _image_file()}, format='multipart')
+        self.assertEqual(response.status_code, 202, response.content)
+        upload = UserUploadedMeal.objects.get()
+        self.assertEqual(len(upload.image_hash), 16)
+        self.assertEqual(len(self.stored_files()), 2)
+        self.assertFalse(any(name.endswith('.part') for name in self.stored_files()))
+
+    def test_decompression_bomb_is_rejected_and_cleaned_up(self):
+        # 64x48 is over twice the lowered pixel limit, which Pillow raises DecompressionBombError for.
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            response = self.client.post(self.url, {'image': _image_file()}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': "Image dimensions are too large"})
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(UserUploadedMeal.objects.exists())
+
+    def test_unreadable_and_unsupported_files_leave_nothing_behind(self):
+        files = [SimpleUploadedFile('meal.png', b'not an image'), _image_file(image_format='GIF', name='meal.gif')]
+        for upload in files:
+            response = self.client.post(self.url, {'image': upload}, format='multipart')
+            self.assertEqual(response.status_code, 400, upload.name)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_unexpected_failure_still_removes_the_partial_file(self):
+        with mock.patch('nutrition.photos.difference_hash', side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.client.post(self.url, {'image': _image_file()}, format='multipart')
+        self.assertEqual(self.stored_files(), [])
+
+    def test_identical_photo_reuses_the_finished_analysis(self):
+        first = self.client.post(self.url, {'image': _image_file()}, format='multipart')
+        analyze_upload(claim_uploads(10)[0], StubMealAnalyzer())
+        analysis = UserUploadedMeal.objects.get(pk=first.data['id']).ai_analysis
+        second = self.client.post(self.url, {'image': _image_file()}, format='multipart')
+        self.assertEqual(second.status_code, 201, second.content)
+        self.assertEqual(second.data['status'], 'done')
+        self.assertEqual(second.data['ai_analysis'], analysis)
+        self.assertEqual(claim_uploads(10), [])
+
+    def test_worker_reuses_an_analysis_finished_after_the_upload_was_queued(self):
+        for _ in range(2):
+            self.client.post(self.url, {'image': _image_file()}, format='multipart')
+        first, second = claim_uploads(10)
+        analyzer = StubMealAnalyzer()
+        self.assertTrue(analyze_upload(first, analyzer))
+        with mock.patch.object(StubMealAnalyzer, 'analyze') as analyze:
+            self.assertTrue(analyze_upload(second, analyzer))
+        analyze.assert_not_called()
+        self.assertEqual(UserUploadedMeal.objects.get(pk=second).ai_analysis,
+                         UserUploadedMeal.objects.get(pk=first).ai_analysis)
+
+    def test_poll_suggests_retry_after_until_the_analysis_is_done(self):
+        upload_id = self.client.post(self.url, {'image': _image_file()}, format='multipart').data['id']
+        url = f'{self.url}{upload_id}/'
+        self.assertEqual(self.client.get(url)['Retry-After'], '2')
+        claim_uploads(10)
+        self.assertEqual(self.client.get(url)['Retry-After'], '2')
+        with mock.patch.object(StubMealAnalyzer, 'analyze', side_effect=RuntimeError("analyzer down")):
+            analyze_upload(upload_id, StubMealAnalyzer(), backoff_seconds=30)
+        # A retry waiting out its backoff is not worth polling before it is due.
+        self.assertIn(self.client.get(url)['Retry-After'], ('29', '30'))
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=31)):
+            claim_uploads(10)
+        analyze_upload(upload_id, StubMealAnalyzer())
+        response = self.client.get(url)
+        self.assertEqual(response.data['status'], 'done')
+        self.assertNotIn('Retry-After', response)
+
+
+class MealUploadWorkerTests(MealAPITestCase):
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        response = self.client.post('/api/nutrition/photos/', {'image': _image_file()}, format='multipart')
+        self.upload = UserUploadedMeal.objects.get(pk=response.data['id'])
+
+    def later(self, seconds):
+        return mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=seconds))
+
+    def test_a_claimed_upload_is_not_claimed_again_until_it_goes_stale(self):
+        self.assertEqual(claim_uploads(10), [self.upload.pk])
+        self.assertEqual(claim_uploads(10), [])
+        with self.later(STALE_AFTER + 1):
+            self.assertEqual(claim_uploads(10), [self.upload.pk])
+        self.assertEqual(UserUploadedMeal.objects.get(pk=self.upload.pk).attempts, 2)
+
+    def test_successful_analysis_is_stored_and_notified(self):
+        analyze_upload(claim_uploads(10)[0], StubMealAnalyzer())
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, 'done')
+        self.assertEqual(self.upload.ai_analysis,
+                         StubMealAnalyzer().analyze(os.path.join(settings.MEDIA_ROOT, self.upload.image_path)))
+        self.assertIsNotNone(self.upload.analyzed_at)
+        self.assertTrue(Notification.objects.filter(user=self.user, title="Meal analysis ready").exists())
+
+    def test_failed_attempts_back_off_exponentially_then_fail(self):
+        analyzer = StubMealAnalyzer()
+        with mock.patch.object(StubMealAnalyzer, 'analyze', side_effect=RuntimeError("analyzer down")):
+            offset = 0
+            for attempt, delay in enumerate([30, 60], start=1):
+                with self.later(offset):
+                    self.assertEqual(claim_uploads(10), [self.upload.pk])
+                    self.assertFalse(analyze_upload(self.upload.pk, analyzer, max_attempts=3, backoff_seconds=30))
+                self.upload.refresh_from_db()
+                self.assertEqual((self.upload.status, self.upload.attempts), ('pending', attempt))
+                self.assertEqual(self.upload.last_error, "analyzer down")
+                with self.later(offset + delay - 1):
+                    self.assertEqual(claim_uploads(10), [])
+                offset += delay + 1
+            with self.later(offset):
+                self.assertEqual(claim_uploads(10), [self.upload.pk])
+                self.assertFalse(analyze_upload(self.upload.pk, analyzer, max_attempts=3, backoff_seconds=30))
+        self.upload.refresh_from_db()
+        self.assertEqual((self.upload.status, self.upload.attempts), ('failed', 3))
+        with self.later(offset + 3600):
+            self.assertEqual(claim_uploads(10), [])
+
+    def test_invalid_photo_fails_without_retrying(self):
+        UserUploadedMeal.objects.filter(pk=self.upload.pk).update(image_path='', image_hash='')
+        claim_uploads(10)
+        self.assertFalse(analyze_upload(self.upload.pk, StubMealAnalyzer()))
+        self.upload.refresh_from_db()
+        self.assertEqual((self.upload.status, self.upload.last_error), ('failed', "Upload has no stored image"))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class MealUploadClaimConcurrencyTests(IsolatedStorageMixin, TransactionTestCase):
+    """Several workers claiming on their own threads and connections (file test database)"""
+
+    def test_concurrent_workers_claim_every_upload_exactly_once(self):
+        user = User.objects.create_user(email='eater@example.com', password='x')
+        UserUploadedMeal.objects.bulk_create(
+            UserUploadedMeal(user=user, image_url=f'/media/{number}.png', image_path=f'{number}.png')
+            for number in range(40)
+        )
+        claims, errors = [], []
+
+        def work():
+            try:
+                while batch := claim_uploads(3):
+                    claims.extend(batch)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        self.assertEqual(sorted(claims), sorted(UserUploadedMeal.objects.values_list('pk', flat=True)))
+        self.assertEqual(set(UserUploadedMeal.objects.values_list('status', 'attempts')), {('processing', 1)})
+
+
+PANTRY = ['200g chicken breasts (diced)', '2 cloves garlic', '1 cup rice', '100ml coconut milk', 'peanut butter',
+          '2 eggs', 'spinach', '1 tbsp soy sauce', 'salmon fillet', 'whole wheat pasta', 'cheddar cheese',
+          'almond flour', 'tofu', 'broccoli florets', 'olive oil', 'sesame seeds', 'shrimp', 'greek yogurt',
+          'oats', 'banana', 'black beans', 'corn tortillas', 'feta', 'lentils', 'sweet potatoes']
+
+
+def seed_ingredient_meals(count, seed=0):
+    """Bulk insert `count` meals listing 3-8 pantry items each; bulk_create leaves them unindexed"""
+    rng = random.Random(seed)
+    category = MealCategory.objects.create(name='Mixed')
+    Meal.objects.bulk_create(
+        (Meal(title=f'Meal {number}', category=category, ingredients=', '.join(rng.sample(PANTRY, rng.randrange(3, 9))))
+         for number in range(count)),
+        batch_size=5000,
+    )
+
+
+def _links():
+    return set(MealIngredient.objects.values_list('meal_id', 'ingredient__name'))
+
+
+def _backfill():
+    """Run the 0007 data migration against the historical models"""
+    migration = import_module('nutrition.migrations.0007_backfill_ingredient_index')
+    state = MigrationExecutor(connection).loader.project_state(('nutrition', '0007_backfill_ingredient_index'))
+    migration.backfill_ingredient_index(state.apps, connection.schema_editor())
+
+
+class IngredientIndexTests(MealAPITestCase):
+    url = '/api/nutrition/meals/'
+
+    def test_backfill_indexes_meals_that_predate_the_index(self):
+        seed_ingredient_meals(300, seed=21)
+        self.assertFalse(MealIngredient.objects.exists())
+        _backfill()
+        backfilled = _links()
+
+        MealIngredient.objects.all().delete()
+        rebuild_ingredient_index(chunk_size=64)
+        self.assertEqual(backfilled, _links())
+        self.assertEqual(len(backfilled), sum(len(meal.ingredients.split(', ')) for meal in Meal.objects.all()))
+
+    def test_filters_answer_through_the_backfilled_index(self):
+        seed_ingredient_meals(200, seed=22)
+        _backfill()
+        meals = {meal.pk: meal.ingredients for meal in Meal.objects.all()}
+
+        with_chicken = {pk for pk, text in meals.items() if 'chicken' in text}
+        results = self.walk(self.url, {'ingredients': 'chicken', 'page_size': 200})
+        self.assertEqual({meal['id'] for meal in results}, with_chicken)
+
+        # Coconut milk and almond flour are cleared phrases; cheese, feta, yogurt and peanut butter are not.
+        dairy = ('cheddar', 'feta', 'yogurt')
+        no_dairy = {pk for pk, text in meals.items() if not any(word in text for word in dairy)}
+        results = self.walk(self.url, {'exclude_allergens': 'dairy', 'page_size': 200})
+        self.assertEqual({meal['id'] for meal in results}, no_dairy)
+
+    def test_saving_a_meal_reindexes_only_changed_ingredients(self):
+        meal = Meal.objects.create(title='Bowl', category=MealCategory.objects.create(name='Lunch'),
+                                   ingredients='1 cup rice, tofu')
+        self.assertEqual({name for _, name in _links()}, {'rice', 'tofu'})
+        meal.ingredients = 'rice, 2 eggs'
+        meal.save()
+        self.assertEqual({name for _, name in _links()}, {'rice', 'egg'})
+        with self.assertNumQueries(1):  # only the UPDATE; ingredients are untouched
+            meal.title = 'Egg bowl'
+            meal.save()
+
+
+@benchmark
+class IngredientIndexBenchmark(MealAPITestCase):
+    """Indexing ingredients on a 500k-meal catalog: the backfill, the rebuild command and saves"""
+
+    def test_index_throughput(self):
+        rows = scaled(500_000, 5000)
+        with timed(f"seeding {rows} meals", rows):
+            seed_ingredient_meals(rows)
+        with timed(f"0007 backfill of {rows} meals", rows):
+            _backfill()
+        with timed(f"rebuild_ingredient_index over {rows} meals", rows):
+            call_command('rebuild_ingredient_index', stdout=StringIO())
+        print(f"\n  {MealIngredient.objects.count()} links", end='')
+
+        saves = scaled(5000, 200)
+        meals = list(Meal.objects.order_by('?')[:saves])
+        rng = random.Random(1)
+        with timed(f"{saves} saves with new ingredients", saves):
+            for meal in meals:
+                meal.ingredients = ', '.join(rng.sample(PANTRY, 5))
+                meal.save()
+        with timed(f"{saves} saves with the same ingredients", saves):
+            for meal in meals:
+                meal.title += '!'
+                meal.save()
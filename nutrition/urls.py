@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+app_name = 'nutrition'
+
+urlpatterns = [
+    path('categories/', views.MealCategoryListView.as_view(), name='meal-category-list'),
+    path('allergens/', views.AllergenListView.as_view(), name='allergen-list'),
+    path('meals/', views.MealListView.as_view(), name='meal-list'),
+    path('meals/<int:pk>/', views.MealDetailView.as_view(), name='meal-detail'),
+    path('meal-plans/generate/', views.MealPlanGenerateView.as_view(), name='meal-plan-generate'),
+    path('photos/', views.MealPhotoListCreateView.as_view(), name='meal-photo-list'),
+    path('photos/<int:pk>/', views.MealPhotoDetailView.as_view(), name='meal-photo-detail'),
+    path('totals/', views.NutritionTotalsView.as_view(), name='nutrition-totals'),
+]
@@ -1,3 +1,162 @@
-from django.shortcuts import render
+import math
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.generics import GenericAPIView, ListAPIView, RetrieveAPIView
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from .filters import MealFilterBackend
+from .models import Allergen, Meal, MealCategory, UserNutritionDailyStat, UserUploadedMeal
+from .photos import InvalidPhoto, create_upload
+from .stats import ROLLUP_FIELDS
+from .planner import NUTRIENTS, PlanError, generate_meal_plan
+from .serializers import (
+    AllergenSerializer, MealCategorySerializer, MealPlanGenerateSerializer, MealSerializer,
+    MealPhotoUploadSerializer, UserUploadedMealSerializer
+)
+from accounts.permissions import IsActiveUser
+from GymGeniusAI.conditional import ConditionalViewMixin
+from GymGeniusAI.versioning import get_versions
+from GymGeniusAI.refcache import reference_response
+from GymGeniusAI.rollups import RollupRangeMixin
 
-# Create your views here.
+class MealCategoryListView(ConditionalViewMixin, GenericAPIView):
+    serializer_class = MealCategorySerializer
+    permission_classes = [IsActiveUser]
+
+    def get_etag(self, request):
+        return "meal-categories-%d" % get_versions(MealCategory)
+
+    def get(self, request):
+        return reference_response(
+            'meal-categories', (MealCategory,),
+            lambda: self.serializer_class(MealCategory.objects.all(), many=True).data,
+        )
+
+class AllergenListView(ConditionalViewMixin, GenericAPIView):
+    """Allergen slugs accepted by ?exclude_allergens= on the meal list"""
+    serializer_class = AllergenSerializer
+    permission_classes = [IsActiveUser]
+
+    def get_etag(self, request):
+        return "allergens-%d" % get_versions(Allergen)
+
+    def get(self, request):
+        return reference_response(
+            'allergens', (Allergen,),
+            lambda: self.serializer_class(Allergen.objects.all(), many=True).data,
+        )
+
+class MealETagMixin(ConditionalViewMixin):
+    def get_etag(self, request):
+        return "meals-%s-%d" % (self.kwargs.get('pk', 'all'), *get_versions(Meal))
+
+class MealListView(MealETagMixin, ListAPIView):
+    """Cursor-paginated meal catalog with indexed macro range filters (see MealFilterBackend)"""
+    queryset = Meal.objects.all()
+    serializer_class = MealSerializer
+    permission_classes = [IsActiveUser]
+    filter_backends = [MealFilterBackend]
+
+class MealDetailView(MealETagMixin, RetrieveAPIView):
+    queryset = Meal.objects.all()
+    serializer_class = MealSerializer
+    permission_classes = [IsActiveUser]
+
+class NutritionTotalsView(RollupRangeMixin, GenericAPIView):
+    """
+    Planned calories and macros for the current user. ?date= returns a single day;
+    otherwise ?start=/?end= (default: last 7 days) grouped by ?period=day|week|month.
+    Reads only the daily rollups.
+    """
+    permission_classes = [IsActiveUser]
+    rollup_fields = ROLLUP_FIELDS
+    default_days = 7
+
+    def get(self, request):
+        stats = UserNutritionDailyStat.objects.filter(user_id=request.user.pk)
+        day = request.query_params.get('date')
+        if day:
+            try:
+                day = parse_date(day)
+            except ValueError:
+                day = None
+            if day is None:
+                return Response({"error": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+            row = stats.filter(date=day).values(*ROLLUP_FIELDS).first()
+            return Response({'date': day, **(row or {field: 0 for field in ROLLUP_FIELDS})})
+        return self.range_response(request, stats)
+
+class MealPlanGenerateView(GenericAPIView):
+    """Generate the current user's 7-day meal plan from their profile targets, replacing plans on those days"""
+    serializer_class = MealPlanGenerateSerializer
+    permission_classes = [IsActiveUser]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        start = serializer.validated_data.get('start') or timezone.localdate()
+        try:
+            targets, rows = generate_meal_plan(
+                request.user.pk, start, max_cook_time=serializer.validated_data.get('max_cook_time')
+            )
+        except PlanError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        meals = {
+            meal['id']: meal
+            for meal in Meal.objects.filter(pk__in=[row.meal_id for row in rows]).values('id', 'title', *NUTRIENTS)
+        }
+        days = {}
+        for row in rows:
+            day = days.setdefault(row.date, {'date': row.date, 'meals': [], 'totals': dict.fromkeys(NUTRIENTS, 0.0)})
+            meal = meals[row.meal_id]
+            day['meals'].append({'meal_type': row.meal_type, 'meal': meal['id'], 'title': meal['title'],
+                                 **{name: meal[name] for name in NUTRIENTS}})
+            for name in NUTRIENTS:
+                day['totals'][name] += meal[name] or 0
+        return Response({'targets': targets, 'days': list(days.values())}, status=status.HTTP_201_CREATED)
+
+class MealPhotoListCreateView(ListAPIView):
+    """
+    GET lists the current user's meal photos. POST (multipart, field `image`) stores
+    a photo and returns 202 with its pending analysis, or 201 when an identical
+    photo was already analyzed; poll the detail URL until status is done.
+    """
+    serializer_class = UserUploadedMealSerializer
+    permission_classes = [IsActiveUser]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get_queryset(self):
+        return UserUploadedMeal.objects.filter(user_id=self.request.user.pk)
+
+    def post(self, request):
+        serializer = MealPhotoUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = create_upload(
+                request.user.pk, serializer.validated_data['image'],
+                lambda path: request.build_absolute_uri(settings.MEDIA_URL + path),
+            )
+        except InvalidPhoto as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        code = status.HTTP_201_CREATED if upload.status == 'done' else status.HTTP_202_ACCEPTED
+        return Response(self.get_serializer(upload).data, status=code)
+
+class MealPhotoDetailView(RetrieveAPIView):
+    serializer_class = UserUploadedMealSerializer
+    permission_classes = [IsActiveUser]
+    poll_interval = 2  # seconds suggested to clients via Retry-After while the analysis is queued
+
+    def get_queryset(self):
+        return UserUploadedMeal.objects.filter(user_id=self.request.user.pk)
+
+    def retrieve(self, request, *args, **kwargs):
+        upload = self.get_object()
+        response = Response(self.get_serializer(upload).data)
+        if upload.status in ('pending', 'processing'):
+            # A retry waiting out its backoff will not change before then.
+            wait = (upload.next_attempt_at - timezone.now()).total_seconds() if upload.status == 'pending' else 0
+            response['Retry-After'] = str(max(self.poll_interval, math.ceil(wait)))
+        return response
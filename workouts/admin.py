@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import WorkoutCategory, Workout, WorkoutRound, Exercise, UserWorkoutProgress
+from .models import WorkoutCategory, Workout, WorkoutRound, Exercise, UserWorkoutProgress, UserWorkoutDailyStat
 from unfold.admin import ModelAdmin
 
 
@@ -37,3 +37,11 @@ class UserWorkoutProgressAdmin(ModelAdmin):
     list_filter = ['date', 'workout']
     search_fields = ['user__email', 'workout__title']
     ordering = ['-date']
+
+
+@admin.register(UserWorkoutDailyStat)
+class UserWorkoutDailyStatAdmin(ModelAdmin):
+    list_display = ['user', 'date', 'sessions', 'calories_burned', 'duration_minutes']
+    list_filter = ['date']
+    search_fields = ['user__email']
+    ordering = ['-date']
@@ -0,0 +1,42 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+DIFFICULTIES = {'beginner', 'intermediate', 'advanced'}
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Must be an integer."})
+
+
+class WorkoutFilterBackend(BaseFilterBackend):
+    """
+    Catalog filters: ?difficulty=, ?category=, ?min_duration=/max_duration=,
+    ?min_calories=/max_calories=. Equality filters come first in the composite
+    indexes on Workout so each combination is a single index range scan.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        difficulty = params.get('difficulty')
+        if difficulty:
+            if difficulty not in DIFFICULTIES:
+                raise ValidationError({'difficulty': f"Must be one of {', '.join(sorted(DIFFICULTIES))}."})
+            queryset = queryset.filter(difficulty=difficulty)
+
+        category = _int_param(params, 'category')
+        if category is not None:
+            queryset = queryset.filter(category_id=category)
+
+        ranges = {
+            'duration_minutes__gte': _int_param(params, 'min_duration'),
+            'duration_minutes__lte': _int_param(params, 'max_duration'),
+            'calories_burn__gte': _int_param(params, 'min_calories'),
+            'calories_burn__lte': _int_param(params, 'max_calories'),
+        }
+        return queryset.filter(**{lookup: value for lookup, value in ranges.items() if value is not None})
@@ -0,0 +1,15 @@
+import time
+from django.core.management.base import BaseCommand
+from GymGeniusAI.catalog import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Render the public catalog into a compressed, content-hashed snapshot and make it current"
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        snapshot = build_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Built catalog snapshot {snapshot.hash} ({len(snapshot.content)} bytes) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
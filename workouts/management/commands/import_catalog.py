@@ -0,0 +1,257 @@
+import json
+import sys
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from GymGeniusAI.catalog import build_snapshot
+from GymGeniusAI.versioning import bump_version
+from nutrition.ingredients import index_meals
+from nutrition.models import Meal, MealCategory, macro_columns
+from nutrition.stats import refresh_meal_days
+from workouts.models import Exercise, Workout, WorkoutCategory, WorkoutRound
+from workouts.search import sync_workouts
+from workouts.stats import refresh_round_masks
+
+MEAL_FIELDS = ['title', 'image_url', 'ingredients', 'preparation', 'cook_time_min', 'calories', 'macros', 'micros',
+               'ai_rating', 'health_notes']
+WORKOUT_FIELDS = ['title', 'description', 'video_url', 'difficulty', 'calories_burn', 'duration_minutes']
+ROUND_FIELDS = ['name', 'round_order']
+EXERCISE_FIELDS = ['name', 'reps', 'sets', 'rest_seconds', 'video_url', 'tips']
+
+
+def _clean(model, names, row):
+    """Model-typed values for the given fields present in row; raises ValidationError"""
+    values = {}
+    for name in names:
+        if name not in row:
+            continue
+        field = model._meta.get_field(name)
+        value = row[name]
+        if value == '' or value is None:
+            value = field.get_default() if not field.null else None
+        elif not isinstance(field, models.JSONField):
+            value = field.to_python(value)
+        if field.choices and value is not None and value not in dict(field.choices):
+            raise ValidationError(f"{name}: {value!r} is not one of {', '.join(dict(field.choices))}")
+        values[name] = value
+    for name in names:
+        field = model._meta.get_field(name)
+        if values.get(name) is None and not field.null and not field.has_default():
+            raise ValidationError(f"{name} is required")
+    return values
+
+
+class CategoryMap:
+    """Category name -> id, loaded once; unknown names are created on first use (or just noted in a dry run)"""
+
+    def __init__(self, model, dry_run):
+        self.model = model
+        self.dry_run = dry_run
+        self.ids = {name.strip().lower(): pk for pk, name in model.objects.values_list('id', 'name')}
+        self.created = 0
+
+    def get(self, name):
+        name = (name or '').strip()
+        if not name:
+            raise ValidationError("category is required")
+        key = name.lower()
+        if key not in self.ids:
+            self.ids[key] = None if self.dry_run else self.model.objects.create(name=name).pk
+            self.created += 1
+        return self.ids[key]
+
+
+class Command(BaseCommand):
+    help = "Stream a JSONL pack of meals and workouts (with rounds and exercises) and upsert it by external key"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSONL file, or - for stdin")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Validate and count without writing anything")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        dry_run = options['dry_run']
+        chunk_size = options['chunk_size']
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+        self.meal_categories = CategoryMap(MealCategory, dry_run)
+        self.workout_categories = CategoryMap(WorkoutCategory, dry_run)
+        self.counts = {'created': 0, 'updated': 0, 'invalid': 0}
+
+        started = time.monotonic()
+        read = 0
+        pending = {'meal': {}, 'workout': {}}
+        flush = {'meal': self.import_meals, 'workout': self.import_workouts}
+        try:
+            for line_number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                read += 1
+                try:
+                    row = json.loads(line)
+                    kind, prepared = self.prepare(row)
+                except (ValueError, ValidationError) as exc:
+                    self.counts['invalid'] += 1
+                    message = '; '.join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+                    self.stderr.write(f"Line {line_number}: {message}")
+                    continue
+                # Keyed by external id, so a key repeated within a chunk keeps its last row.
+                pending[kind][prepared['external_id']] = prepared
+                if len(pending[kind]) >= chunk_size:
+                    flush[kind](list(pending[kind].values()), dry_run)
+                    pending[kind] = {}
+                    self.report(read, started)
+            for kind, rows in pending.items():
+                if rows:
+                    flush[kind](list(rows.values()), dry_run)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if not dry_run and (self.counts['created'] or self.counts['updated']):
+            # The debounced background rebuild would not outlive this process.
+            build_snapshot()
+        elapsed = time.monotonic() - started
+        rate = read / elapsed if elapsed else 0
+        prefix = "Dry run: would have imported" if dry_run else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {read} rows: {self.counts['created']} created, {self.counts['updated']} updated, "
+            f"{self.counts['invalid']} invalid, "
+            f"{self.meal_categories.created + self.workout_categories.created} new categories "
+            f"in {elapsed:.1f}s, {rate:.0f} rows/s"
+        ))
+
+    def report(self, read, started):
+        elapsed = time.monotonic() - started
+        rate = read / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{read} rows read, {self.counts['created']} created, {self.counts['updated']} updated, "
+            f"{self.counts['invalid']} invalid, {rate:.0f} rows/s"
+        )
+
+    def prepare(self, row):
+        if not isinstance(row, dict):
+            raise ValidationError("row must be a JSON object")
+        key = str(row.get('key') or '').strip()
+        if not key:
+            raise ValidationError("key is required")
+        kind = row.get('type')
+        if kind == 'meal':
+            values = _clean(Meal, MEAL_FIELDS, row)
+            values.update(macro_columns(values.get('macros')))
+            return kind, {'external_id': key, 'category': row.get('category'), **values}
+        if kind == 'workout':
+            rounds = []
+            for order, round_row in enumerate(row.get('rounds') or [], 1):
+                round_values = _clean(WorkoutRound, ROUND_FIELDS, {'round_order': order, **round_row})
+                round_values['exercises'] = [
+                    _clean(Exercise, EXERCISE_FIELDS, exercise) for exercise in round_row.get('exercises') or []
+                ]
+                rounds.append(round_values)
+            values = _clean(Workout, WORKOUT_FIELDS, row)
+            return kind, {'external_id': key, 'category': row.get('category'), 'rounds': rounds, **values}
+        raise ValidationError("type must be meal or workout")
+
+    def _resolve_categories(self, rows, categories):
+        resolved = []
+        for row in rows:
+            try:
+                category_id = categories.get(row.pop('category'))
+            except ValidationError as exc:
+                self.counts['invalid'] += 1
+                self.stderr.write(f"{row['external_id']}: {'; '.join(exc.messages)}")
+            else:
+                resolved.append({**row, 'category_id': category_id})
+        return resolved
+
+    def _split_existing(self, model, rows):
+        keys = [row['external_id'] for row in rows]
+        existing = set(model.objects.filter(external_id__in=keys).values_list('external_id', flat=True))
+        self.counts['updated'] += len(existing)
+        self.counts['created'] += len(rows) - len(existing)
+        return keys, existing
+
+    def import_meals(self, rows, dry_run):
+        rows = self._resolve_categories(rows, self.meal_categories)
+        keys, existing = self._split_existing(Meal, rows)
+        if dry_run or not rows:
+            return
+        update_fields = [*MEAL_FIELDS, 'category', 'protein_g', 'carbs_g', 'fat_g']
+        with transaction.atomic():
+            Meal.objects.bulk_create(
+                [Meal(**row) for row in rows],
+                update_conflicts=True, unique_fields=['external_id'], update_fields=update_fields,
+            )
+            ids = dict(Meal.objects.filter(external_id__in=keys).values_list('external_id', 'id'))
+            # Bulk writes skip Meal.save() and its signals, so do their work here.
+            index_meals((ids[row['external_id']], row.get('ingredients')) for row in rows)
+            if existing:
+                refresh_meal_days(ids[key] for key in existing)
+        bump_version(Meal)
+
+    def import_workouts(self, rows, dry_run):
+        rows = self._resolve_categories(rows, self.workout_categories)
+        keys, _ = self._split_existing(Workout, rows)
+        if dry_run or not rows:
+            return
+        with transaction.atomic():
+            Workout.objects.bulk_create(
+                [Workout(**{name: value for name, value in row.items() if name != 'rounds'}) for row in rows],
+                update_conflicts=True, unique_fields=['external_id'], update_fields=[*WORKOUT_FIELDS, 'category'],
+            )
+            ids = dict(Workout.objects.filter(external_id__in=keys).values_list('external_id', 'id'))
+            workout_ids = list(ids.values())
+
+            # Rounds keep their ids when (workout, round_order) still exists, since
+            # progress rows refer to them; exercises are simply replaced.
+            current = {}
+            stale = {}  # round id -> round_order
+            for pk, workout_id, order in (WorkoutRound.objects.filter(workout_id__in=workout_ids)
+                                          .order_by('id').values_list('id', 'workout_id', 'round_order')):
+                if (workout_id, order) in current:
+                    stale[pk] = order
+                else:
+                    current[(workout_id, order)] = pk
+            rounds, exercises = [], []
+            for row in rows:
+                workout_id = ids[row['external_id']]
+                for round_values in row['rounds']:
+                    key = (workout_id, round_values['round_order'])
+                    rounds.append(WorkoutRound(
+                        pk=current.pop(key, None), workout_id=workout_id,
+                        name=round_values['name'], round_order=round_values['round_order'],
+                    ))
+                    exercises.append(round_values['exercises'])
+            stale.update((pk, order) for (_, order), pk in current.items())
+
+            with connection.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(workout_ids))
+                cursor.execute(
+                    f"DELETE FROM {Exercise._meta.db_table} WHERE round_id IN "
+                    f"(SELECT id FROM {WorkoutRound._meta.db_table} WHERE workout_id IN ({placeholders}))",
+                    workout_ids,
+                )
+                if stale:
+                    cursor.execute(
+                        f"DELETE FROM {WorkoutRound._meta.db_table} WHERE id IN ({', '.join(['%s'] * len(stale))})",
+                        list(stale),
+                    )
+            WorkoutRound.objects.bulk_create(
+                rounds, update_conflicts=True, unique_fields=['id'], update_fields=ROUND_FIELDS,
+            )
+            Exercise.objects.bulk_create(
+                [Exercise(round_id=round_.pk, **values) for round_, items in zip(rounds, exercises) for values in items],
+                batch_size=2000,
+            )
+            if stale:
+                # The raw DELETE skipped the round signals, so drop the deleted
+                # rounds from progress rows and their masks here, in the same transaction.
+                refresh_round_masks(workout_ids, round_orders=set(stale.values()))
+            sync_workouts(workout_ids)
+        for model in (Workout, WorkoutRound, Exercise):
+            bump_version(model)
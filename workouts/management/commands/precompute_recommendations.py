@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from workouts.recommendations import RECOMMENDATION_LIMIT, precompute_recommendations
+
+
+class Command(BaseCommand):
+    help = "Rank workouts for every active user and store the results"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=RECOMMENDATION_LIMIT)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = precompute_recommendations(chunk_size=options['chunk_size'], limit=options['limit'])
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored recommendations for {total} users in {elapsed:.1f}s, {rate:.0f} users/s"
+        ))
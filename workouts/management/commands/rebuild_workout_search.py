@@ -0,0 +1,15 @@
+import time
+from django.core.management.base import BaseCommand
+from workouts.search import fts_enabled, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the workout full-text search index from the catalog"
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write("Full-text search needs SQLite FTS5; nothing to rebuild")
+            return
+        started = time.monotonic()
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt workout search index in {time.monotonic() - started:.1f}s"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutround',
+            index=models.Index(fields=['workout', 'round_order'], name='workout_round_order_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0002_workout_round_order_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['category', 'difficulty', 'duration_minutes'], name='workout_cat_diff_dur_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['difficulty', 'duration_minutes'], name='workout_diff_dur_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['difficulty', 'calories_burn'], name='workout_diff_cal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['calories_burn'], name='workout_cal_idx'),
+        ),
+    ]
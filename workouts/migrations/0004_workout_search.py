@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS workout_search "
+        "USING fts5(title, description, exercises, tokenize='porter unicode61')"
+    )
+    schema_editor.execute("""
+        INSERT INTO workout_search (rowid, title, description, exercises)
+        SELECT w.id, w.title, COALESCE(w.description, ''),
+               COALESCE((SELECT GROUP_CONCAT(e.name || ' ' || COALESCE(e.tips, ''), ' ')
+                         FROM exercises e JOIN workout_rounds r ON e.round_id = r.id
+                         WHERE r.workout_id = w.id), '')
+        FROM workouts w
+    """)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS workout_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0003_workout_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
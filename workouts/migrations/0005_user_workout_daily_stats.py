@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0004_workout_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserWorkoutDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('calories_burned', models.FloatField(default=0)),
+                ('duration_minutes', models.IntegerField(default=0)),
+                ('sessions', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'User Workout Daily Stat',
+                'verbose_name_plural': 'User Workout Daily Stats',
+                'db_table': 'user_workout_daily_stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userworkoutprogress',
+            index=models.Index(fields=['user', 'date'], name='progress_user_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='userworkoutdailystat',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workout_daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='userworkoutdailystat',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_user_workout_day'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def convert_completed_rounds(apps, schema_editor):
+    UserWorkoutProgress = apps.get_model('workouts', 'UserWorkoutProgress')
+    WorkoutRound = apps.get_model('workouts', 'WorkoutRound')
+    pending = []
+    rows = UserWorkoutProgress.objects.exclude(completed_rounds=[]).only('id', 'workout_id', 'completed_rounds')
+    for progress in rows.iterator(chunk_size=2000):
+        pending.append(progress)
+        if len(pending) >= 2000:
+            _apply_masks(WorkoutRound, UserWorkoutProgress, pending)
+            pending = []
+    _apply_masks(WorkoutRound, UserWorkoutProgress, pending)
+
+
+def _apply_masks(WorkoutRound, UserWorkoutProgress, rows):
+    round_ids = {pk for row in rows for pk in row.completed_rounds if isinstance(pk, int)}
+    rounds = {
+        pk: (workout_id, order)
+        for pk, workout_id, order in WorkoutRound.objects.filter(pk__in=round_ids)
+        .values_list('id', 'workout_id', 'round_order')
+    }
+    for row in rows:
+        mask = 0
+        for pk in row.completed_rounds:
+            workout_id, order = rounds.get(pk, (None, 0))
+            if workout_id == row.workout_id and 1 <= order <= 63:
+                mask |= 1 << (order - 1)
+        row.completed_rounds_mask = mask
+    UserWorkoutProgress.objects.bulk_update(rows, ['completed_rounds_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0005_user_workout_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userworkoutprogress',
+            name='completed_rounds_mask',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Bit (round_order - 1) set for each completed round'),
+        ),
+        migrations.AddIndex(
+            model_name='userworkoutprogress',
+            index=models.Index(fields=['workout', 'user', 'completed_rounds_mask'], name='progress_round_funnel_idx'),
+        ),
+        migrations.RunPython(convert_completed_rounds, migrations.RunPython.noop),
+    ]
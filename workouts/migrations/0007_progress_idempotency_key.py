@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0006_completed_rounds_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userworkoutprogress',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Client-generated key that makes offline sync replays safe', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='userworkoutprogress',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', False)), fields=('user', 'idempotency_key'), name='unique_progress_idempotency_key'),
+        ),
+    ]
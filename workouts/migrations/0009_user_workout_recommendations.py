@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_subscription_start_idx'),
+        ('workouts', '0008_workout_external_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserWorkoutRecommendations',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workout_recommendations', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('user_version', models.PositiveIntegerField(help_text='User.version the list was ranked for')),
+                ('catalog_version', models.BigIntegerField(help_text='Workout generation the list was ranked from')),
+                ('items', models.JSONField(default=list, help_text='[workout id, score] pairs, best first')),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'User Workout Recommendations',
+                'verbose_name_plural': 'User Workout Recommendations',
+                'db_table': 'user_workout_recommendations',
+            },
+        ),
+    ]
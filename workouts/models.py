@@ -2,6 +2,19 @@ from django.db import models
 from accounts.models import User
 
 
+class WorkoutQuerySet(models.QuerySet):
+    def with_tree(self):
+        """Category, rounds (by round_order) and exercises in three queries total"""
+        return self.select_related('category').prefetch_related(
+            models.Prefetch(
+                'rounds',
+                queryset=WorkoutRound.objects.order_by('round_order', 'id').prefetch_related(
+                    models.Prefetch('exercises', queryset=Exercise.objects.order_by('id'))
+                ),
+            )
+        )
+
+
 class WorkoutCategory(models.Model):
     """Categories for workouts"""
     name = models.CharField(max_length=100)
@@ -30,11 +43,21 @@ class Workout(models.Model):
     category = models.ForeignKey(WorkoutCategory, on_delete=models.CASCADE, related_name='workouts')
     calories_burn = models.IntegerField(help_text="Estimated calories burned")
     duration_minutes = models.IntegerField(help_text="Duration in minutes")
+    external_id = models.CharField(max_length=100, unique=True, blank=True, null=True,
+                                   help_text="Natural key used by import_catalog")
+
+    objects = WorkoutQuerySet.as_manager()
     
     class Meta:
         db_table = 'workouts'
         verbose_name = 'Workout'
         verbose_name_plural = 'Workouts'
+        indexes = [
+            models.Index(fields=['category', 'difficulty', 'duration_minutes'], name='workout_cat_diff_dur_idx'),
+            models.Index(fields=['difficulty', 'duration_minutes'], name='workout_diff_dur_idx'),
+            models.Index(fields=['difficulty', 'calories_burn'], name='workout_diff_cal_idx'),
+            models.Index(fields=['calories_burn'], name='workout_cal_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -51,10 +74,20 @@ class WorkoutRound(models.Model):
         verbose_name = 'Workout Round'
         verbose_name_plural = 'Workout Rounds'
         ordering = ['round_order']
+        indexes = [
+            models.Index(fields=['workout', 'round_order'], name='workout_round_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.workout.title} - {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Progress masks are keyed by round_order, so a reorder or move must rebuild them.
+        instance._loaded_position = (instance.__dict__.get('workout_id'), instance.__dict__.get('round_order'))
+        return instance
+
 
 class Exercise(models.Model):
     """Exercises within a workout round"""
@@ -75,20 +108,108 @@ class Exercise(models.Model):
         return self.name
 
 
+# Bit (round_order - 1) of completed_rounds_mask marks a finished round; the
+# sign bit is left alone so the mask stays a non-negative 64-bit integer.
+MAX_TRACKED_ROUNDS = 63
+
+
+def round_orders_to_mask(round_orders):
+    mask = 0
+    for order in round_orders:
+        if 1 <= order <= MAX_TRACKED_ROUNDS:
+            mask |= 1 << (order - 1)
+    return mask
+
+
+def mask_to_round_orders(mask):
+    return [bit + 1 for bit in range(MAX_TRACKED_ROUNDS) if mask >> bit & 1]
+
+
 class UserWorkoutProgress(models.Model):
     """Track user workout progress"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workout_progress')
     workout = models.ForeignKey(Workout, on_delete=models.CASCADE)
     completed_rounds = models.JSONField(default=list, help_text="List of completed round IDs")
+    completed_rounds_mask = models.BigIntegerField(default=0, editable=False,
+                                                   help_text="Bit (round_order - 1) set for each completed round")
     date = models.DateField()
     calories_burned = models.FloatField(blank=True, null=True)
     duration_minutes = models.IntegerField(blank=True, null=True)
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True,
+                                       help_text="Client-generated key that makes offline sync replays safe")
     
     class Meta:
         db_table = 'user_workout_progress'
         verbose_name = 'User Workout Progress'
         verbose_name_plural = 'User Workout Progress'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', 'date'], name='progress_user_date_idx'),
+            models.Index(fields=['workout', 'user', 'completed_rounds_mask'], name='progress_round_funnel_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_progress_idempotency_key',
+                                    condition=models.Q(idempotency_key__isnull=False)),
+        ]
+
+    def save(self, *args, **kwargs):
+        # completed_rounds stays the API-facing list of round ids; the mask is derived from it.
+        orders = []
+        if self.completed_rounds:
+            orders = WorkoutRound.objects.filter(
+                workout_id=self.workout_id, pk__in=self.completed_rounds
+            ).values_list('round_order', flat=True)
+        self.completed_rounds_mask = round_orders_to_mask(orders)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'completed_rounds' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'completed_rounds_mask'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.user.email} - {self.workout.title} - {self.date}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rollup bucket the row was loaded in, so moving it to
+        # another date can also refresh the day it left.
+        instance._loaded_stat_key = (instance.__dict__.get('user_id'), instance.__dict__.get('date'))
+        return instance
+
+
+class UserWorkoutDailyStat(models.Model):
+    """Per-user per-day rollup of UserWorkoutProgress, maintained by signals"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workout_daily_stats')
+    date = models.DateField()
+    calories_burned = models.FloatField(default=0)
+    duration_minutes = models.IntegerField(default=0)
+    sessions = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'user_workout_daily_stats'
+        verbose_name = 'User Workout Daily Stat'
+        verbose_name_plural = 'User Workout Daily Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_user_workout_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.date} - {self.sessions} sessions"
+
+
+class UserWorkoutRecommendations(models.Model):
+    """Per-user top workouts, written by workouts/recommendations.py and read until they expire"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='workout_recommendations')
+    user_version = models.PositiveIntegerField(help_text="User.version the list was ranked for")
+    catalog_version = models.BigIntegerField(help_text="Workout generation the list was ranked from")
+    items = models.JSONField(default=list, help_text="[workout id, score] pairs, best first")
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'user_workout_recommendations'
+        verbose_name = 'User Workout Recommendations'
+        verbose_name_plural = 'User Workout Recommendations'
+
+    def __str__(self):
+        return f"{self.user_id} - {len(self.items)} workouts"
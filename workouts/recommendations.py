@@ -0,0 +1,189 @@
+"""
+Workout recommendations from the user's goal and activity level.
+
+A workout's base score depends only on its own columns and on the user's
+(goal, activity_level) segment, so each segment's ranking of the whole
+catalog is computed once per catalog version and memoized per process.
+Ranking for one user is then a walk down that list: workouts the user did
+in the last RECENT_DAYS get a decaying penalty, and since a penalty can only
+lower a score, the first limit + len(recent) entries always hold the answer.
+Per-user results are kept for RECOMMENDATION_TTL in the
+user_workout_recommendations table, one row per user, rather than in the
+file cache, which culls at random once it is full and would both drop
+precomputed lists and evict the version counters.
+
+weight_kg would only scale calorie scores within a segment without changing
+their order, so it is not part of the segment key.
+"""
+from datetime import timedelta
+from django.utils import timezone
+from accounts.authentication import current_version
+from accounts.models import User
+from GymGeniusAI.versioning import get_versions
+from .models import UserWorkoutProgress, UserWorkoutRecommendations, Workout
+
+RECOMMENDATION_LIMIT = 20
+RECOMMENDATION_TTL = 60 * 15
+RECENT_DAYS = 14
+
+LEVELS = {'beginner': 0, 'intermediate': 1, 'advanced': 2}
+TARGET_MINUTES = {0: 20, 1: 35, 2: 50}
+
+DIFFICULTY_WEIGHT = 3.0
+GOAL_WEIGHT = 2.0
+DURATION_WEIGHT = 1.0
+REPEAT_PENALTY = 4.0
+
+# level distance -> difficulty score
+DIFFICULTY_FIT = {0: 1.0, 1: 0.4, 2: -0.5}
+
+_catalog = {'version': None, 'rows': (), 'segments': {}}
+
+
+def _store(entries, now):
+    """Upsert (user id, user version, catalog version, items) rows in one statement"""
+    expires_at = now + timedelta(seconds=RECOMMENDATION_TTL)
+    UserWorkoutRecommendations.objects.bulk_create(
+        [
+            UserWorkoutRecommendations(user_id=user_id, user_version=user_version,
+                                       catalog_version=catalog_version, items=items, expires_at=expires_at)
+            for user_id, user_version, catalog_version, items in entries
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['user_version', 'catalog_version', 'items', 'expires_at'],
+    )
+
+
+def _catalog_rows():
+    """(id, level, minutes, calorie rate, duration share) for every workout, per catalog version"""
+    version, = get_versions(Workout)
+    if _catalog['version'] != version:
+        raw = list(Workout.objects.order_by().values_list('id', 'difficulty', 'duration_minutes', 'calories_burn'))
+        rates = [calories / minutes if minutes else 0.0 for _, _, minutes, calories in raw]
+        max_rate = max(rates, default=0) or 1.0
+        max_minutes = max((minutes for _, _, minutes, _ in raw), default=0) or 1
+        _catalog.update(
+            version=version,
+            rows=tuple(
+                (pk, LEVELS.get(difficulty, 0), minutes, rate / max_rate, minutes / max_minutes)
+                for (pk, difficulty, minutes, _), rate in zip(raw, rates)
+            ),
+            segments={},
+        )
+    return _catalog['version'], _catalog['rows']
+
+
+def segment_ranking(goal, activity_level):
+    """The whole catalog as (score, workout id) pairs, best first, for one profile segment"""
+    version, rows = _catalog_rows()
+    segment = (goal, activity_level)
+    ranking = _catalog['segments'].get(segment)
+    if ranking is not None:
+        return version, ranking
+
+    level = LEVELS.get(activity_level, 0)
+    target = TARGET_MINUTES[level]
+    if goal == 'weight_loss':
+        goal_fit = lambda rate, share: rate
+    elif goal == 'gain_endurance':
+        goal_fit = lambda rate, share: share
+    else:
+        goal_fit = lambda rate, share: (rate + share) / 2
+
+    ranking = sorted(
+        (
+            (DIFFICULTY_WEIGHT * DIFFICULTY_FIT[abs(workout_level - level)]
+             + GOAL_WEIGHT * goal_fit(rate, share)
+             + DURATION_WEIGHT * (1 - min(abs(minutes - target) / target, 1)),
+             pk)
+            for pk, workout_level, minutes, rate, share in rows
+        ),
+        key=lambda item: (-item[0], item[1]),
+    )
+    _catalog['segments'][segment] = ranking
+    return version, ranking
+
+
+def rank_for_user(ranking, last_done, limit=RECOMMENDATION_LIMIT, today=None):
+    """Top `limit` (workout id, score) pairs after the recency penalty; last_done maps workout id -> date"""
+    today = today or timezone.localdate()
+    candidates = []
+    for score, pk in ranking[:limit + len(last_done)]:
+        done = last_done.get(pk)
+        if done is not None:
+            age = (today - done).days
+            score -= REPEAT_PENALTY * max(0.0, 1 - age / RECENT_DAYS)
+        candidates.append((score, pk))
+    candidates.sort(key=lambda item: (-item[0], item[1]))
+    return [(pk, round(score, 4)) for score, pk in candidates[:limit]]
+
+
+def recent_workouts(user_ids, today=None):
+    """user id -> {workout id: last date done} within RECENT_DAYS, in one query"""
+    today = today or timezone.localdate()
+    recent = {user_id: {} for user_id in user_ids}
+    rows = (
+        UserWorkoutProgress.objects
+        .filter(user_id__in=user_ids, date__gt=today - timedelta(days=RECENT_DAYS))
+        .order_by().values_list('user_id', 'workout_id', 'date')
+    )
+    for user_id, workout_id, date in rows:
+        done = recent[user_id]
+        if done.get(workout_id) is None or done[workout_id] < date:
+            done[workout_id] = date
+    return recent
+
+
+def recommend_for_user(user_id, limit=RECOMMENDATION_LIMIT):
+    """Cached top recommendations for a user as (workout id, score) pairs"""
+    user_version = current_version(user_id)
+    catalog_version, = get_versions(Workout)
+    now = timezone.now()
+    entry = (
+        UserWorkoutRecommendations.objects.filter(user_id=user_id, expires_at__gt=now)
+        .values_list('user_version', 'catalog_version', 'items').first()
+    )
+    if entry is not None and entry[:2] == (user_version, catalog_version) and len(entry[2]) >= limit:
+        return [(pk, score) for pk, score in entry[2][:limit]]
+
+    profile = User.objects.filter(pk=user_id).values('goal', 'activity_level', 'version').first()
+    if profile is None:
+        return []
+    catalog_version, ranking = segment_ranking(profile['goal'], profile['activity_level'])
+    items = rank_for_user(ranking, recent_workouts([user_id])[user_id], max(limit, RECOMMENDATION_LIMIT))
+    _store([(user_id, profile['version'], catalog_version, items)], now)
+    return items[:limit]
+
+
+def precompute_recommendations(chunk_size=500, limit=RECOMMENDATION_LIMIT):
+    """Store lists for every active user; one progress query and one upsert per chunk"""
+    users = User.objects.filter(is_active=True).order_by().values_list('id', 'goal', 'activity_level', 'version')
+    now = timezone.now()
+    today = timezone.localdate()
+    # Lists of users who went inactive would otherwise stay behind forever.
+    UserWorkoutRecommendations.objects.filter(expires_at__lte=now).delete()
+    chunk = []
+    total = 0
+
+    def flush():
+        recent = recent_workouts([user_id for user_id, *_ in chunk], today)
+        entries = []
+        for user_id, goal, activity_level, version in chunk:
+            catalog_version, ranking = segment_ranking(goal, activity_level)
+            entries.append((user_id, version, catalog_version, rank_for_user(ranking, recent[user_id], limit, today)))
+        _store(entries, now)
+        return len(entries)
+
+    for row in users.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            total += flush()
+            chunk = []
+    if chunk:
+        total += flush()
+    return total
+
+
+def forget_recommendations(user_id):
+    UserWorkoutRecommendations.objects.filter(user_id=user_id).delete()
@@ -0,0 +1,82 @@
+"""
+Full-text workout search backed by an SQLite FTS5 table.
+
+`workout_search` holds one row per workout (rowid = workout id) with the
+workout title, its description and the names/tips of all its exercises.
+Signals keep it in sync; rebuild_search_index() repopulates it from scratch.
+On other database backends search falls back to an unranked icontains scan.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from .models import Workout
+
+SEARCH_TABLE = 'workout_search'
+
+# bm25 column weights: title, description, exercises
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 3.0
+EXERCISE_WEIGHT = 1.0
+
+POPULATE_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, title, description, exercises)
+    SELECT w.id, w.title, COALESCE(w.description, ''),
+           COALESCE((SELECT GROUP_CONCAT(e.name || ' ' || COALESCE(e.tips, ''), ' ')
+                     FROM exercises e JOIN workout_rounds r ON e.round_id = r.id
+                     WHERE r.workout_id = w.id), '')
+    FROM workouts w
+"""
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    tokens = _TOKEN.findall(text.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def sync_workouts(workout_ids):
+    """Re-index the given workouts; ids that no longer exist are removed"""
+    workout_ids = [int(pk) for pk in set(workout_ids) if pk is not None]
+    if not workout_ids or not fts_enabled():
+        return
+    placeholders = ', '.join(['%s'] * len(workout_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", workout_ids)
+        cursor.execute(f"{POPULATE_SQL} WHERE w.id IN ({placeholders})", workout_ids)
+
+
+def rebuild_search_index():
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(POPULATE_SQL)
+
+
+def search_workouts(text, limit=20):
+    """Return (workout id, score) pairs, best match first"""
+    if not fts_enabled():
+        terms = Q()
+        for token in _TOKEN.findall(text):
+            terms &= (Q(title__icontains=token) | Q(description__icontains=token)
+                      | Q(rounds__exercises__name__icontains=token))
+        ids = Workout.objects.filter(terms).values_list('id', flat=True).distinct()[:limit]
+        return [(pk, 0.0) for pk in ids]
+
+    match = build_match_query(text)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, bm25({SEARCH_TABLE}, %s, %s, %s) AS score FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s ORDER BY score LIMIT %s",
+            [TITLE_WEIGHT, DESCRIPTION_WEIGHT, EXERCISE_WEIGHT, match, limit],
+        )
+        # bm25() is lower-is-better; flip it so callers see higher-is-better.
+        return [(pk, -score) for pk, score in cursor.fetchall()]
@@ -8,6 +8,7 @@ class WorkoutCategorySerializer(serializers.ModelSerializer):
 
 class WorkoutSerializer(serializers.ModelSerializer):
     category = WorkoutCategorySerializer()
+    select_related_fields = ('category',)
     
     class Meta:
         model = Workout
@@ -26,4 +27,35 @@ class ExerciseSerializer(serializers.ModelSerializer):
 class UserWorkoutProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserWorkoutProgress
-        fields = ['id', 'user', 'workout', 'date', 'calories_burned', 'duration_minutes']
+        fields = ['id', 'user', 'workout', 'completed_rounds', 'date', 'calories_burned', 'duration_minutes']
+
+class ProgressSyncItemSerializer(serializers.Serializer):
+    """One offline session; workout existence is checked for the whole batch at once"""
+    idempotency_key = serializers.CharField(max_length=64)
+    workout = serializers.IntegerField(min_value=1)
+    date = serializers.DateField()
+    completed_rounds = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+    calories_burned = serializers.FloatField(required=False, allow_null=True)
+    duration_minutes = serializers.IntegerField(required=False, allow_null=True)
+
+class ExerciseTreeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Exercise
+        fields = ['id', 'name', 'reps', 'sets', 'rest_seconds', 'video_url', 'tips']
+
+class WorkoutRoundTreeSerializer(serializers.ModelSerializer):
+    exercises = ExerciseTreeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = WorkoutRound
+        fields = ['id', 'name', 'round_order', 'exercises']
+
+class WorkoutTreeSerializer(serializers.ModelSerializer):
+    """Workout with its rounds and their exercises; expects the WorkoutQuerySet.with_tree() prefetches"""
+    category = WorkoutCategorySerializer(read_only=True)
+    rounds = WorkoutRoundTreeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Workout
+        fields = ['id', 'title', 'description', 'video_url', 'difficulty', 'category',
+                  'calories_burn', 'duration_minutes', 'rounds']
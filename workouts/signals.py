@@ -0,0 +1,66 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from GymGeniusAI.catalog import watch_catalog
+from GymGeniusAI.versioning import track_versions
+from .models import WorkoutCategory, Workout, WorkoutRound, Exercise, UserWorkoutProgress
+from .search import sync_workouts
+from .stats import refresh_daily_stat, refresh_round_masks
+from .recommendations import forget_recommendations
+
+track_versions(WorkoutCategory, Workout, WorkoutRound, Exercise)
+watch_catalog(WorkoutCategory, Workout, WorkoutRound, Exercise)
+
+
+@receiver(post_save, sender=Workout)
+@receiver(post_delete, sender=Workout)
+def index_workout(sender, instance, **kwargs):
+    sync_workouts([instance.pk])
+
+
+@receiver(post_save, sender=WorkoutRound)
+@receiver(post_delete, sender=WorkoutRound)
+def index_round_workout(sender, instance, **kwargs):
+    sync_workouts([instance.workout_id])
+
+
+@receiver(post_save, sender=WorkoutRound)
+def refresh_masks_after_reorder(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_position', None)
+    position = instance._loaded_position = (instance.workout_id, instance.round_order)
+    if created or previous == position:
+        return
+    if previous is not None and previous[0] == instance.workout_id and previous[1] is not None:
+        # Only rows holding this round can change, and they all carry its old bit.
+        refresh_round_masks([instance.workout_id], round_orders=[previous[1]])
+    else:
+        refresh_round_masks({instance.workout_id} | ({previous[0]} if previous else set()))
+
+
+@receiver(post_delete, sender=WorkoutRound)
+def refresh_masks_after_delete(sender, instance, **kwargs):
+    refresh_round_masks([instance.workout_id], round_orders=[instance.round_order])
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def index_exercise_workout(sender, instance, **kwargs):
+    workout_id = WorkoutRound.objects.filter(pk=instance.round_id).values_list('workout_id', flat=True).first()
+    sync_workouts([workout_id])
+
+
+@receiver(post_save, sender=UserWorkoutProgress)
+@receiver(post_delete, sender=UserWorkoutProgress)
+def refresh_progress_rollup(sender, instance, **kwargs):
+    key = (instance.user_id, instance.date)
+    refresh_daily_stat(*key)
+    previous = getattr(instance, '_loaded_stat_key', None)
+    if previous is not None and previous != key:
+        refresh_daily_stat(*previous)
+    instance._loaded_stat_key = key
+
+
+@receiver(post_save, sender=UserWorkoutProgress)
+@receiver(post_delete, sender=UserWorkoutProgress)
+def refresh_recommendations(sender, instance, **kwargs):
+    # Recency feeds the ranking, so a logged session invalidates the cached list.
+    forget_recommendations(instance.user_id)
@@ -0,0 +1,110 @@
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from GymGeniusAI.rollups import daily_totals, rebuild_rollups, upsert_rollups
+from .models import MAX_TRACKED_ROUNDS, UserWorkoutDailyStat, UserWorkoutProgress, WorkoutRound, round_orders_to_mask
+
+
+DAILY_TOTALS = {
+    'calories_burned': Coalesce(Sum('calories_burned'), 0.0),
+    'duration_minutes': Coalesce(Sum('duration_minutes'), 0),
+    'sessions': Count('id'),
+}
+ROLLUP_FIELDS = list(DAILY_TOTALS)
+
+
+def refresh_daily_stats(user_id, dates):
+    """Recompute one user's rollups for the given days: one grouped read, one upsert, one delete"""
+    date_field = UserWorkoutDailyStat._meta.get_field('date')
+    # Keys are compared with the dates read back, so strings must become dates first.
+    dates = {date_field.to_python(date) for date in dates if date is not None}
+    if user_id is None or not dates:
+        return
+    rows = list(daily_totals(UserWorkoutProgress.objects.filter(user_id=user_id, date__in=dates), DAILY_TOTALS))
+    upsert_rollups(UserWorkoutDailyStat, rows, ROLLUP_FIELDS)
+    empty = dates - {row['date'] for row in rows}
+    if empty:
+        UserWorkoutDailyStat.objects.filter(user_id=user_id, date__in=empty).delete()
+
+
+def refresh_daily_stat(user_id, date):
+    """Recompute one (user, day) rollup from that day's progress rows"""
+    refresh_daily_stats(user_id, [date])
+
+
+def rebuild_daily_stats(user_ids=None, batch_size=2000):
+    """Recreate the rollup table (or just some users' rows) with one grouped scan"""
+    return rebuild_rollups(UserWorkoutDailyStat, UserWorkoutProgress.objects.all(), DAILY_TOTALS, user_ids, batch_size)
+
+
+def refresh_round_masks(workout_ids, round_orders=None, batch_size=2000):
+    """
+    Re-derive completed_rounds_mask for progress rows on the given workouts
+    after their rounds were reordered, moved or deleted, dropping ids of rounds
+    that no longer belong to the workout from completed_rounds. Pass the
+    round_orders that changed to only visit rows with one of those bits set.
+    Rows are rewritten with UPDATEs, so no progress signals fire; returns how
+    many changed.
+    """
+    workout_ids = list(set(workout_ids))
+    orders = {
+        (workout_id, pk): order
+        for pk, workout_id, order in WorkoutRound.objects.filter(workout_id__in=workout_ids)
+        .values_list('id', 'workout_id', 'round_order')
+    }
+    rows = UserWorkoutProgress.objects.filter(workout_id__in=workout_ids).exclude(completed_rounds=[])
+    # Rows holding a round with an untracked order have no bit to be found by.
+    if round_orders is not None and all(1 <= order <= MAX_TRACKED_ROUNDS for order in round_orders):
+        bits = round_orders_to_mask(round_orders)
+        rows = rows.annotate(changed_bits=F('completed_rounds_mask').bitand(bits)).filter(changed_bits__gt=0)
+
+    by_mask = {}
+    pruned = []
+    updated = 0
+    progress_rows = rows.order_by('pk').values_list('id', 'workout_id', 'completed_rounds', 'completed_rounds_mask')
+    for pk, workout_id, completed, old_mask in progress_rows.iterator(chunk_size=batch_size):
+        kept = [round_id for round_id in completed if (workout_id, round_id) in orders]
+        mask = round_orders_to_mask(orders[(workout_id, round_id)] for round_id in kept)
+        if kept != completed:
+            pruned.append(UserWorkoutProgress(pk=pk, completed_rounds=kept, completed_rounds_mask=mask))
+        elif mask != old_mask:
+            # Masks take few distinct values, so group rows by mask rather than CASE per row.
+            by_mask.setdefault(mask, []).append(pk)
+    for mask, pks in by_mask.items():
+        for start in range(0, len(pks), batch_size):
+            updated += UserWorkoutProgress.objects.filter(pk__in=pks[start:start + batch_size]).update(
+                completed_rounds_mask=mask)
+    updated += UserWorkoutProgress.objects.bulk_update(
+        pruned, ['completed_rounds', 'completed_rounds_mask'], batch_size=500)
+    return updated
+
+
+def round_funnel(workout_id):
+    """
+    Per-round drop-off for a workout: how many distinct users completed each
+    round, out of everyone with progress on it. A single aggregate query tests
+    every round's bit in completed_rounds_mask.
+    """
+    orders = list(
+        WorkoutRound.objects
+        .filter(workout_id=workout_id, round_order__gte=1, round_order__lte=MAX_TRACKED_ROUNDS)
+        .order_by('round_order').values_list('round_order', flat=True).distinct()
+    )
+    progress = UserWorkoutProgress.objects.filter(workout_id=workout_id).order_by()
+    aggregates = {'users': Count('user', distinct=True)}
+    for order in orders:
+        progress = progress.annotate(**{f'bit_{order}': F('completed_rounds_mask').bitand(1 << (order - 1))})
+        aggregates[f'round_{order}'] = Count('user', distinct=True, filter=Q(**{f'bit_{order}__gt': 0}))
+    counts = progress.aggregate(**aggregates)
+
+    users = counts['users']
+    return {
+        'users': users,
+        'rounds': [
+            {
+                'round_order': order,
+                'completed_users': counts[f'round_{order}'],
+                'completion_rate': round(counts[f'round_{order}'] / users, 4) if users else 0.0,
+            }
+            for order in orders
+        ],
+    }
@@ -0,0 +1,110 @@
+"""
+Bulk replay of workout sessions recorded offline by the mobile app.
+
+Each item carries a client-generated idempotency key; replaying a batch (or
+part of one) after a dropped connection returns the rows stored the first
+time instead of inserting duplicates. A batch costs a fixed handful of
+queries however many items it holds.
+"""
+from django.db import IntegrityError, transaction
+from .models import UserWorkoutProgress, Workout, WorkoutRound, round_orders_to_mask
+from .recommendations import forget_recommendations
+from .stats import refresh_daily_stats
+
+MAX_SYNC_ITEMS = 500
+
+
+def sync_progress(user_id, items):
+    """
+    Store already-validated session dicts for one user. Returns one result
+    per item, in order: {'idempotency_key', 'status', 'id'} with status
+    'created', 'duplicate' or 'invalid' (plus 'errors').
+    """
+    results = [{'idempotency_key': item['idempotency_key'], 'status': None, 'id': None} for item in items]
+
+    workout_ids = {item['workout'] for item in items}
+    known_workouts = set(Workout.objects.filter(pk__in=workout_ids).values_list('id', flat=True))
+    round_ids = {pk for item in items for pk in item['completed_rounds']}
+    round_orders = {
+        pk: (workout_id, order)
+        for pk, workout_id, order in WorkoutRound.objects.filter(pk__in=round_ids)
+        .values_list('id', 'workout_id', 'round_order')
+    }
+
+    keys = [item['idempotency_key'] for item in items]
+    existing = dict(
+        UserWorkoutProgress.objects.filter(user_id=user_id, idempotency_key__in=keys)
+        .values_list('idempotency_key', 'id')
+    )
+
+    pending = {}
+    for result, item in zip(results, items):
+        key = item['idempotency_key']
+        if key in existing or key in pending:
+            result['status'] = 'duplicate'
+            continue
+        if item['workout'] not in known_workouts:
+            result['status'] = 'invalid'
+            result['errors'] = {'workout': [f"Workout {item['workout']} does not exist."]}
+            continue
+        # Same derivation as UserWorkoutProgress.save(), which bulk_create skips.
+        orders = [
+            round_orders[pk][1] for pk in item['completed_rounds']
+            if pk in round_orders and round_orders[pk][0] == item['workout']
+        ]
+        pending[key] = UserWorkoutProgress(
+            user_id=user_id,
+            workout_id=item['workout'],
+            date=item['date'],
+            completed_rounds=item['completed_rounds'],
+            completed_rounds_mask=round_orders_to_mask(orders),
+            calories_burned=item.get('calories_burned'),
+            duration_minutes=item.get('duration_minutes'),
+            idempotency_key=key,
+        )
+        result['status'] = 'created'
+
+    if pending:
+        with transaction.atomic():
+            stored = _insert_pending(user_id, pending)
+            # bulk_create does not send post_save, so refresh the touched rollups here.
+            refresh_daily_stats(user_id, [row.date for row in stored.values()])
+        forget_recommendations(user_id)
+        for result in results:
+            key = result['idempotency_key']
+            if result['status'] == 'created' and key not in stored:
+                result['status'] = 'duplicate'
+        existing.update(
+            UserWorkoutProgress.objects.filter(user_id=user_id, idempotency_key__in=list(pending))
+            .values_list('idempotency_key', 'id')
+        )
+
+    for result in results:
+        if result['status'] in ('created', 'duplicate'):
+            result['id'] = existing.get(result['idempotency_key'])
+    return results
+
+
+def _insert_pending(user_id, pending):
+    """
+    Insert the pending rows, keyed by idempotency key, and return the ones
+    this call stored. Keys that a concurrent replay stored since the lookup
+    make the insert fail; they are re-read, left out, and the rest retried.
+    """
+    pending = dict(pending)
+    while pending:
+        try:
+            with transaction.atomic():
+                UserWorkoutProgress.objects.bulk_create(pending.values())
+            return pending
+        except IntegrityError:
+            for row in pending.values():  # any batch that went in before the failure was rolled back
+                row.pk, row._state.adding = None, True
+            taken = set(
+                UserWorkoutProgress.objects.filter(user_id=user_id, idempotency_key__in=list(pending))
+                .values_list('idempotency_key', flat=True)
+            )
+            if not taken:
+                raise
+            pending = {key: row for key, row in pending.items() if key not in taken}
+    return pending
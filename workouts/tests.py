@@ -1,3 +1,692 @@
-from django.test import TestCase
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from base64 import b64encode
+from datetime import date, timedelta
+from io import StringIO
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncWeek
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from accounts.versions import version_cache
+from accounts.serializers import CustomTokenObtainPairSerializer
+from GymGeniusAI.testing import FAST_PASSWORD_HASHERS, IsolatedStorageMixin, benchmark, scaled, timed
+from GymGeniusAI.versioning import get_versions
+from .models import (
+    Exercise, UserWorkoutDailyStat, UserWorkoutProgress, UserWorkoutRecommendations, Workout, WorkoutCategory,
+    WorkoutRound, mask_to_round_orders, round_orders_to_mask,
+)
+from .search import rebuild_search_index, search_workouts
+from .recommendations import (
+    REPEAT_PENALTY, RECENT_DAYS, precompute_recommendations, recommend_for_user, segment_ranking,
+)
+from .stats import rebuild_daily_stats, round_funnel
+from . import sync as sync_module
+from .sync import MAX_SYNC_ITEMS, sync_progress
+from .serializers import ProgressSyncItemSerializer, WorkoutTreeSerializer
 
-# Create your tests here.
+
+def _in_another_process(code):
+    """Run `code` in a fresh Django process sharing this test's cache directory"""
+    script = (
+        "import django, os\n"
+        "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'GymGeniusAI.settings')\n"
+        "django.setup()\n"
+        "from django.test import override_settings\n"
+        f"with override_settings(CACHES={settings.CACHES!r}):\n"
+        + "".join(f"    {line}\n" for line in code.splitlines())
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True, timeout=60)
+
+
+def make_workout(rounds=3, exercises=2, category=None, title='Workout'):
+    category = category or WorkoutCategory.objects.create(name='Strength')
+    workout = Workout.objects.create(title=title, difficulty='beginner', category=category,
+                                     calories_burn=300, duration_minutes=30)
+    for order in range(1, rounds + 1):
+        round_ = WorkoutRound.objects.create(workout=workout, name=f'Round {order}', round_order=order)
+        Exercise.objects.bulk_create(
+            Exercise(round=round_, name=f'Exercise {order}.{number}', reps=10) for number in range(exercises)
+        )
+    return workout
+
+
+WORDS = ['burn', 'core', 'power', 'cardio', 'stretch', 'kettlebell', 'sprint', 'yoga', 'push', 'pull',
+         'squat', 'plank', 'mobility', 'endurance', 'interval', 'tempo', 'balance', 'boxing', 'rowing', 'hill']
+DIFFICULTIES = ['beginner', 'intermediate', 'advanced']
+
+
+def seed_workouts(count, categories=20, seed=0):
+    """Bulk insert `count` varied workouts (no rounds) across `categories` categories"""
+    rng = random.Random(seed)
+    category_ids = [category.pk for category in WorkoutCategory.objects.bulk_create(
+        WorkoutCategory(name=f'Category {number}') for number in range(categories)
+    )]
+    Workout.objects.bulk_create(
+        (Workout(title=' '.join(rng.sample(WORDS, 3)), description=' '.join(rng.sample(WORDS, 8)),
+                 difficulty=rng.choice(DIFFICULTIES), category_id=rng.choice(category_ids),
+                 calories_burn=rng.randrange(50, 1000), duration_minutes=rng.randrange(5, 120))
+         for _ in range(count)),
+        batch_size=5000,
+    )
+    return category_ids
+
+
+def cursor_at(position):
+    """A cursor query value for the page that starts just past `position` in -pk order"""
+    return b64encode(urlencode({'p': position}).encode()).decode()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class WorkoutAPITestCase(IsolatedStorageMixin, TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='member@example.com', password='Secret-pass-1', is_verified=True)
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+class WorkoutCategoryListTests(WorkoutAPITestCase):
+    url = '/api/workouts/categories/'
+
+    def setUp(self):
+        super().setUp()
+        WorkoutCategory.objects.bulk_create([WorkoutCategory(name=name) for name in ('Cardio', 'Core', 'Legs')])
+        self.client.get(self.url)  # version the table; bulk_create sends no signals
+
+    def test_cached_list_is_paginated(self):
+        first = self.client.get(self.url, {'page_size': 2}).json()
+        second = self.client.get(first['next']).json()
+
+        self.assertEqual(set(first), {'next', 'previous', 'results'})
+        self.assertEqual([item['name'] for item in first['results']], ['Legs', 'Core'])
+        self.assertEqual([item['name'] for item in second['results']], ['Cardio'])
+        self.assertIsNone(second['next'])
+
+    def test_warm_first_page_reads_no_tables(self):
+        self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertFalse([query for query in captured if 'workout_categories' in query['sql']])
+
+    def test_a_write_in_another_process_invalidates_the_cached_list(self):
+        self.assertEqual(len(self.client.get(self.url).json()['results']), 3)
+        # The row changes without signals here, as if another worker had written it ...
+        WorkoutCategory.objects.filter(name='Core').update(name='Abs')
+
+        # ... and that worker's post_save bumped the counter in the shared cache.
+        _in_another_process(
+            "from GymGeniusAI.versioning import bump_version\n"
+            "from workouts.models import WorkoutCategory\n"
+            "bump_version(WorkoutCategory)"
+        )
+
+        names = [item['name'] for item in self.client.get(self.url).json()['results']]
+        self.assertEqual(names, ['Legs', 'Abs', 'Cardio'])
+
+
+class WorkoutTreeTests(WorkoutAPITestCase):
+    def test_tree_is_three_queries_whatever_its_size(self):
+        for rounds, exercises in ((1, 1), (8, 6)):
+            workout = make_workout(rounds, exercises)
+            with self.assertNumQueries(3):
+                data = WorkoutTreeSerializer(Workout.objects.with_tree().get(pk=workout.pk)).data
+            self.assertEqual(len(data['rounds']), rounds)
+            self.assertEqual({len(round_['exercises']) for round_ in data['rounds']}, {exercises})
+
+    def test_endpoint_reads_the_tables_once_then_serves_from_cache(self):
+        workout = make_workout(4, 3)
+        url = f'/api/workouts/{workout.pk}/tree/'
+        tables = ('"workouts"', '"workout_categories"', '"workout_rounds"', '"exercises"')
+
+        def tree_queries():
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return [query['sql'] for query in captured if any(table in query['sql'] for table in tables)], response
+
+        cold, response = tree_queries()
+        warm, _ = tree_queries()
+
+        self.assertEqual(len(cold), 3, cold)
+        self.assertEqual(warm, [])
+        self.assertEqual([round_['round_order'] for round_ in response.json()['rounds']], [1, 2, 3, 4])
+
+
+class WorkoutListTests(WorkoutAPITestCase):
+    def test_pages_cost_one_query_whatever_the_page_size(self):
+        seed_workouts(120)
+
+        for page_size in (5, 100):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get('/api/workouts/', {'page_size': page_size})
+            workout_queries = [query for query in captured if '"workouts"' in query['sql']]
+            self.assertEqual(len(workout_queries), 1, workout_queries)
+            self.assertEqual(len(response.json()['results']), page_size)
+            self.assertIn('name', response.json()['results'][0]['category'])
+
+    def test_following_next_visits_every_workout_once(self):
+        seed_workouts(120)
+
+        seen, url = [], '/api/workouts/?page_size=50'
+        while url:
+            page = self.client.get(url).json()
+            seen.extend(item['id'] for item in page['results'])
+            url = page['next']
+
+        self.assertEqual(seen, list(Workout.objects.order_by('-pk').values_list('pk', flat=True)))
+
+
+@benchmark
+class WorkoutListBenchmark(WorkoutAPITestCase):
+    """Cursor pages of the workout list at 1M rows, shallow and deep, against OFFSET paging"""
+
+    def test_deep_cursor_pages_cost_the_same_as_the_first(self):
+        rows = scaled(1_000_000, 10_000)
+        with timed(f"seeding {rows} workouts", rows):
+            seed_workouts(rows)
+        top = Workout.objects.order_by('-pk').values_list('pk', flat=True).first()
+        requests = 50
+
+        for label, depth in (('first page', 0), ('middle page', rows // 2), ('last page', rows - 50)):
+            params = {'cursor': cursor_at(top - depth + 1)} if depth else {}
+            with CaptureQueriesContext(connection) as captured, timed(f"{label}, cursor", requests):
+                for _ in range(requests):
+                    response = self.client.get('/api/workouts/', params)
+            self.assertEqual(len(response.json()['results']), 50)
+            self.assertEqual(len(captured) // requests, 1)
+            with timed(f"{label}, OFFSET {depth}", requests):
+                for _ in range(requests):
+                    list(Workout.objects.select_related('category').order_by('-pk')[depth:depth + 50])
+
+
+FILTERS = [
+    {'difficulty': 'advanced'},
+    {'difficulty': 'beginner', 'min_duration': 20, 'max_duration': 40},
+    {'category': None, 'difficulty': 'intermediate', 'max_duration': 30},
+    {'min_calories': 400, 'max_calories': 450},
+    {'difficulty': 'advanced', 'min_calories': 900},
+]
+
+
+def _filter_params(category_ids):
+    return [{name: category_ids[0] if name == 'category' else value for name, value in params.items()}
+            for params in FILTERS]
+
+
+class WorkoutFilterTests(WorkoutAPITestCase):
+    def test_filters_match_the_rows_they_describe(self):
+        category_ids = seed_workouts(300, categories=3)
+        lookups = {'difficulty': 'difficulty', 'category': 'category_id', 'min_duration': 'duration_minutes__gte',
+                   'max_duration': 'duration_minutes__lte', 'min_calories': 'calories_burn__gte',
+                   'max_calories': 'calories_burn__lte'}
+
+        for params in _filter_params(category_ids):
+            ids = []
+            url = '/api/workouts/?' + urlencode({**params, 'page_size': 200})
+            while url:
+                page = self.client.get(url).json()
+                ids.extend(item['id'] for item in page['results'])
+                url = page['next']
+            expected = Workout.objects.filter(**{lookups[name]: value for name, value in params.items()})
+            self.assertEqual(sorted(ids), sorted(expected.values_list('pk', flat=True)), params)
+
+    def test_bad_values_are_rejected(self):
+        for params in ({'difficulty': 'extreme'}, {'min_duration': 'ten'}):
+            self.assertEqual(self.client.get('/api/workouts/', params).status_code, 400)
+
+
+class WorkoutSearchTests(WorkoutAPITestCase):
+    def _search(self, text):
+        return [item['title'] for item in self.client.get('/api/workouts/search/', {'q': text}).json()['results']]
+
+    def test_title_matches_rank_above_description_matches(self):
+        category = WorkoutCategory.objects.create(name='Strength')
+        for title, description in (('Rowing basics', 'Kettlebell finisher'), ('Kettlebell power', 'Swings')):
+            Workout.objects.create(title=title, description=description, difficulty='beginner',
+                                   category=category, calories_burn=200, duration_minutes=20)
+
+        self.assertEqual(self._search('kettle'), ['Kettlebell power', 'Rowing basics'])
+
+    def test_signals_keep_the_index_in_sync(self):
+        workout = make_workout(rounds=1, exercises=1, title='Morning flow')
+        Exercise.objects.filter(round__workout=workout).update(name='Turkish getup')
+        Exercise.objects.get(round__workout=workout).save()
+
+        self.assertEqual(self._search('getup'), ['Morning flow'])
+        workout.title = 'Evening flow'
+        workout.save()
+        self.assertEqual(self._search('morning'), [])
+        self.assertEqual(self._search('evening flow'), ['Evening flow'])
+        workout.delete()
+        self.assertEqual(self._search('evening'), [])
+
+    def test_query_syntax_is_treated_as_words(self):
+        make_workout(title='Core "blast" AND more')
+
+        self.assertEqual(self._search('blast" OR title:*'), [])
+        self.assertEqual(self._search('"blast'), ['Core "blast" AND more'])
+
+
+@benchmark
+class WorkoutCatalogBenchmark(WorkoutAPITestCase):
+    """Filter and full-text search latency against a 200k-workout catalog"""
+
+    def _latencies(self, label, run, repeats=20):
+        samples = []
+        for _ in range(repeats):
+            with timed(label) as result:
+                run()
+            samples.append(result['elapsed'] * 1000)
+        print(f"\n  {label}: p50 {statistics.median(samples):.1f} ms, max {max(samples):.1f} ms", end='')
+
+    def _plan(self, params):
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/api/workouts/', params)
+        sql = next(query['sql'] for query in captured if '"workouts"' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '; '.join(row[-1] for row in cursor.fetchall())
+
+    def test_filter_and_search_latency(self):
+        rows = scaled(200_000, 5000)
+        with timed(f"seeding {rows} workouts", rows):
+            category_ids = seed_workouts(rows)
+        with timed("rebuilding the search index", rows):
+            call_command('rebuild_workout_search', stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        with mock.patch('GymGeniusAI.testing.BENCHMARK_SCALE', 0):  # only the percentiles are printed
+            for params in _filter_params(category_ids):
+                self._latencies(f"filter {urlencode(params)}", lambda: self.client.get('/api/workouts/', params))
+                print(f"\n    plan: {self._plan(params)}", end='')
+            for text in ('kettlebell', 'core sprint', 'mob', 'plank yoga rowing'):
+                self._latencies(f"search {text!r}", lambda: search_workouts(text))
+                self._latencies(f"search endpoint {text!r}",
+                                lambda: self.client.get('/api/workouts/search/', {'q': text}))
+
+
+def _raw_daily_totals():
+    rows = (UserWorkoutProgress.objects.order_by().values('user_id', 'date')
+            .annotate(calories=Sum('calories_burned'), minutes=Sum('duration_minutes'), sessions=Count('id')))
+    return {(row['user_id'], row['date']): (row['calories'] or 0.0, row['minutes'] or 0, row['sessions'])
+            for row in rows}
+
+
+def _rollup_totals():
+    return {(row.user_id, row.date): (row.calories_burned, row.duration_minutes, row.sessions)
+            for row in UserWorkoutDailyStat.objects.all()}
+
+
+class WorkoutRollupTests(WorkoutAPITestCase):
+    def test_rollups_track_random_edits_to_progress(self):
+        rng = random.Random(12)
+        workout = make_workout(rounds=1, exercises=0)
+        other = User.objects.create_user(email='other@example.com', password='x')
+        users = [self.user, other]
+        start = date(2026, 9, 1)
+        rows = []
+
+        for step in range(300):
+            action = rng.random()
+            if action < 0.5 or not rows:
+                rows.append(UserWorkoutProgress.objects.create(
+                    user=rng.choice(users), workout=workout, date=start + timedelta(days=rng.randrange(20)),
+                    calories_burned=rng.choice([None, rng.uniform(50, 500)]), duration_minutes=rng.randrange(5, 90),
+                ))
+            elif action < 0.8:
+                row = UserWorkoutProgress.objects.get(pk=rng.choice(rows).pk)
+                row.date = start + timedelta(days=rng.randrange(20))
+                if rng.random() < 0.3:
+                    row.date = row.date.isoformat()  # as a form or JSON payload would set it
+                row.duration_minutes = rng.randrange(5, 90)
+                row.save()
+            else:
+                row = rows.pop(rng.randrange(len(rows)))
+                UserWorkoutProgress.objects.get(pk=row.pk).delete()
+
+        expected = _raw_daily_totals()
+        self.assertEqual(_rollup_totals().keys(), expected.keys())
+        for key, (calories, minutes, sessions) in _rollup_totals().items():
+            self.assertAlmostEqual(calories, expected[key][0], places=6)
+            self.assertEqual((minutes, sessions), expected[key][1:])
+
+        rebuild_daily_stats()
+        self.assertEqual(_rollup_totals().keys(), expected.keys())
+
+    def test_weekly_stats_match_the_raw_aggregate(self):
+        workout = make_workout(rounds=1, exercises=0)
+        for offset in range(40):
+            UserWorkoutProgress.objects.create(
+                user=self.user, workout=workout, date=date(2026, 9, 1) + timedelta(days=offset % 25),
+                calories_burned=100 + offset, duration_minutes=offset,
+            )
+
+        response = self.client.get('/api/workouts/stats/', {'start': '2026-09-01', 'end': '2026-09-30',
+                                                            'period': 'week'})
+
+        raw = (UserWorkoutProgress.objects.filter(user=self.user).order_by()
+               .annotate(week=TruncWeek('date')).values('week')
+               .annotate(calories=Sum('calories_burned'), minutes=Sum('duration_minutes'), sessions=Count('id'))
+               .order_by('week'))
+        buckets = response.json()['buckets']
+        self.assertEqual(
+            [(bucket['period_start'], bucket['calories_burned'], bucket['duration_minutes'], bucket['sessions'])
+             for bucket in buckets],
+            [(row['week'].isoformat(), row['calories'], row['minutes'], row['sessions']) for row in raw],
+        )
+
+
+class RoundMaskTests(WorkoutAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.workout = make_workout(rounds=3, exercises=0)
+        self.rounds = list(self.workout.rounds.order_by('round_order'))
+        self.progress = UserWorkoutProgress.objects.create(
+            user=self.user, workout=self.workout, date=date(2026, 9, 1),
+            completed_rounds=[self.rounds[0].pk, self.rounds[2].pk],
+        )
+
+    def _orders(self):
+        self.progress.refresh_from_db()
+        return mask_to_round_orders(self.progress.completed_rounds_mask)
+
+    def test_mask_follows_a_reorder(self):
+        self.assertEqual(self._orders(), [1, 3])
+
+        first, _, last = self.rounds
+        first.round_order, last.round_order = 2, 1
+        WorkoutRound.objects.filter(pk=self.rounds[1].pk).update(round_order=3)
+        first.save()
+        last.save()
+
+        self.assertEqual(self._orders(), [1, 2])
+        self.assertEqual([item['completed_users'] for item in round_funnel(self.workout.pk)['rounds']], [1, 1, 0])
+
+    def test_deleting_a_round_drops_its_bit_and_id(self):
+        self.rounds[2].delete()
+
+        self.assertEqual(self._orders(), [1])
+        self.assertEqual(self.progress.completed_rounds, [self.rounds[0].pk])
+
+    def test_moving_a_round_to_another_workout_clears_it_from_the_old_one(self):
+        other = make_workout(rounds=1, exercises=0, category=self.workout.category)
+        moved = WorkoutRound.objects.get(pk=self.rounds[0].pk)
+        moved.workout = other
+        moved.save()
+
+        self.assertEqual(self._orders(), [3])
+
+
+class ImportCatalogRoundTests(WorkoutAPITestCase):
+    def _import(self, rounds):
+        row = {'type': 'workout', 'key': 'hiit-1', 'title': 'HIIT', 'difficulty': 'beginner', 'category': 'Cardio',
+               'calories_burn': 300, 'duration_minutes': 30,
+               'rounds': [{'name': f'Round {order}', 'exercises': [{'name': 'Burpee', 'reps': 10}]}
+                          for order in range(1, rounds + 1)]}
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as pack:
+            pack.write(json.dumps(row) + '\n')
+        self.addCleanup(os.unlink, pack.name)
+        call_command('import_catalog', pack.name, stdout=StringIO(), stderr=StringIO())
+        return Workout.objects.get(external_id='hiit-1')
+
+    def test_dropped_rounds_are_pruned_from_progress(self):
+        workout = self._import(rounds=3)
+        first, second, third = workout.rounds.order_by('round_order')
+        progress = UserWorkoutProgress.objects.create(
+            user=self.user, workout=workout, date=date(2026, 9, 1), completed_rounds=[first.pk, third.pk])
+        untouched = UserWorkoutProgress.objects.create(
+            user=self.user, workout=workout, date=date(2026, 9, 2), completed_rounds=[second.pk])
+
+        self._import(rounds=2)
+
+        progress.refresh_from_db()
+        untouched.refresh_from_db()
+        self.assertEqual(list(workout.rounds.order_by('round_order').values_list('pk', flat=True)),
+                         [first.pk, second.pk])
+        self.assertEqual(progress.completed_rounds, [first.pk])
+        self.assertEqual(mask_to_round_orders(progress.completed_rounds_mask), [1])
+        self.assertEqual(untouched.completed_rounds, [second.pk])
+        self.assertEqual([item['completed_users'] for item in round_funnel(workout.pk)['rounds']], [1, 1])
+
+
+@benchmark
+class RoundFunnelBenchmark(WorkoutAPITestCase):
+    """round_funnel over 10M progress rows against counting the completed_rounds lists in Python"""
+
+    def test_funnel_in_sql_against_python(self):
+        rows = scaled(10_000_000, 20_000)
+        rounds = 8
+        rng = random.Random(3)
+        workout = make_workout(rounds=rounds, exercises=0)
+        round_ids = list(workout.rounds.order_by('round_order').values_list('pk', flat=True))
+        users = User.objects.bulk_create(User(email=f'funnel{number}@example.com') for number in range(1000))
+        with timed(f"seeding {rows} progress rows", rows):
+            for offset in range(0, rows, 50_000):
+                batch = []
+                for _ in range(min(50_000, rows - offset)):
+                    done = round_ids[:rng.randrange(rounds + 1)]
+                    batch.append(UserWorkoutProgress(
+                        user_id=rng.choice(users).pk, workout=workout, date=date(2026, 9, 1), completed_rounds=done,
+                        completed_rounds_mask=round_orders_to_mask(range(1, len(done) + 1)),
+                    ))
+                UserWorkoutProgress.objects.bulk_create(batch, batch_size=5000)
+
+        with timed(f"round_funnel, {rows} rows", rows):
+            funnel = round_funnel(workout.pk)
+        with timed(f"counting completed_rounds in Python, {rows} rows", rows):
+            completed = {pk: set() for pk in round_ids}
+            progress = UserWorkoutProgress.objects.filter(workout=workout).values_list('user_id', 'completed_rounds')
+            for user_id, done in progress.iterator(chunk_size=10_000):
+                for pk in done:
+                    completed[pk].add(user_id)
+        self.assertEqual([item['completed_users'] for item in funnel['rounds']],
+                         [len(completed[pk]) for pk in round_ids])
+
+        last = WorkoutRound.objects.get(pk=round_ids[-1])
+        last.round_order = rounds + 1
+        with timed(f"moving the last round to order {rounds + 1}, {rows} rows", rows):
+            last.save()
+        self.assertEqual(round_funnel(workout.pk)['rounds'][-1]['completed_users'], len(completed[round_ids[-1]]))
+
+
+class ProgressSyncTests(WorkoutAPITestCase):
+    url = '/api/workouts/user-progress/sync/'
+
+    def setUp(self):
+        super().setUp()
+        self.workout = make_workout(rounds=2, exercises=0)
+
+    def _sessions(self, count, days=1, prefix='session'):
+        return [{'idempotency_key': f'{prefix}-{number}', 'workout': self.workout.pk,
+                 'date': (date(2026, 9, 1) + timedelta(days=number % days)).isoformat(),
+                 'duration_minutes': 30, 'calories_burned': 200.0} for number in range(count)]
+
+    def test_a_replay_returns_the_stored_rows_as_duplicates(self):
+        first = self.client.post(self.url, {'sessions': self._sessions(3)}, format='json').json()
+        again = self.client.post(self.url, {'sessions': self._sessions(4)}, format='json').json()
+
+        self.assertEqual((first['created'], again['created'], again['duplicate']), (3, 1, 3))
+        self.assertEqual([result['id'] for result in first['results']],
+                         [result['id'] for result in again['results'][:3]])
+        self.assertEqual(UserWorkoutDailyStat.objects.get(user=self.user).sessions, 4)
+
+    def test_keys_stored_by_a_concurrent_replay_are_reported_as_duplicates(self):
+        sessions = self._sessions(3)
+        rival = {}
+        insert_pending = sync_module._insert_pending
+
+        def replay_lands_first(user_id, pending):
+            # Another request stores session-1 between our lookup and our insert.
+            rival['row'] = UserWorkoutProgress.objects.create(
+                user=self.user, workout=self.workout, date=date(2026, 9, 1), idempotency_key='session-1')
+            return insert_pending(user_id, pending)
+
+        with mock.patch.object(sync_module, '_insert_pending', side_effect=replay_lands_first):
+            results = sync_progress(self.user.pk, [ProgressSyncItemSerializer().run_validation(item)
+                                                   for item in sessions])
+
+        self.assertEqual([result['status'] for result in results], ['created', 'duplicate', 'created'])
+        self.assertEqual(results[1]['id'], rival['row'].pk)
+        self.assertEqual(UserWorkoutProgress.objects.count(), 3)
+        self.assertEqual(UserWorkoutDailyStat.objects.get(user=self.user).sessions, 3)
+
+    def test_query_count_does_not_grow_with_the_dates_in_a_batch(self):
+        counts = []
+        for days, prefix in ((1, 'one-day'), (30, 'many-days')):
+            items = [ProgressSyncItemSerializer().run_validation(item) for item in self._sessions(60, days, prefix)]
+            with CaptureQueriesContext(connection) as captured:
+                results = sync_progress(self.user.pk, items)
+            self.assertEqual({result['status'] for result in results}, {'created'})
+            counts.append(len(captured))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(UserWorkoutDailyStat.objects.filter(user=self.user).count(), 30)
+
+
+@benchmark
+class ProgressSyncBenchmark(WorkoutAPITestCase):
+    """Offline sessions replayed through the batched sync endpoint against one POST per session"""
+
+    def test_batched_sync_against_single_posts(self):
+        sessions = scaled(20_000, 1000)
+        workout = make_workout(rounds=4, exercises=0)
+        rounds = list(workout.rounds.values_list('pk', flat=True))
+
+        def session(number, prefix):
+            return {'idempotency_key': f'{prefix}-{number}', 'workout': workout.pk, 'user': str(self.user.pk),
+                    'date': (date(2026, 1, 1) + timedelta(days=number % 200)).isoformat(),
+                    'completed_rounds': rounds[:number % 5], 'duration_minutes': 30, 'calories_burned': 250.0}
+
+        single = max(1, sessions // 10)
+        with timed(f"{single} sessions, one POST each", single):
+            for number in range(single):
+                self.client.post('/api/workouts/user-progress/', session(number, 'single'), format='json')
+        with timed(f"{sessions} sessions, sync batches of {MAX_SYNC_ITEMS}", sessions):
+            for start in range(0, sessions, MAX_SYNC_ITEMS):
+                batch = [session(number, 'batch') for number in range(start, min(start + MAX_SYNC_ITEMS, sessions))]
+                self.client.post('/api/workouts/user-progress/sync/', {'sessions': batch}, format='json')
+        with timed(f"replaying all {sessions} sessions", sessions):
+            for start in range(0, sessions, MAX_SYNC_ITEMS):
+                batch = [session(number, 'batch') for number in range(start, min(start + MAX_SYNC_ITEMS, sessions))]
+                self.client.post('/api/workouts/user-progress/sync/', {'sessions': batch}, format='json')
+
+        self.assertEqual(UserWorkoutProgress.objects.count(), single + sessions)
+        self.assertEqual(sum(UserWorkoutDailyStat.objects.values_list('sessions', flat=True)), single + sessions)
+
+
+def _oracle_recommendations(user, limit, today):
+    """Penalize every workout in the segment ranking, not just the head of it, and take the top"""
+    _, ranking = segment_ranking(user.goal, user.activity_level)
+    last_done = {}
+    for workout_id, done in UserWorkoutProgress.objects.filter(
+            user=user, date__gt=today - timedelta(days=RECENT_DAYS)).values_list('workout_id', 'date'):
+        last_done[workout_id] = max(done, last_done.get(workout_id, done))
+    scored = [(score - REPEAT_PENALTY * max(0.0, 1 - (today - last_done[pk]).days / RECENT_DAYS)
+               if pk in last_done else score, pk) for score, pk in ranking]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(pk, round(score, 4)) for score, pk in scored[:limit]]
+
+
+class RecommendationTests(WorkoutAPITestCase):
+    def setUp(self):
+        super().setUp()
+        version_cache.clear()
+        seed_workouts(400, categories=4)
+        self.workouts = list(Workout.objects.values_list('pk', flat=True))
+
+    def test_matches_penalizing_the_whole_catalog(self):
+        rng = random.Random(5)
+        today = timezone.localdate()
+        for goal in ('weight_loss', 'gain_endurance', 'try_ai_coach'):
+            for level in ('beginner', 'advanced'):
+                user = User.objects.create_user(email=f'{goal}-{level}@example.com', goal=goal, activity_level=level)
+                head = [pk for _, pk in segment_ranking(goal, level)[1][:30]]
+                UserWorkoutProgress.objects.bulk_create(
+                    UserWorkoutProgress(user=user, workout_id=pk, date=today - timedelta(days=rng.randrange(20)))
+                    for pk in rng.sample(head, 15) + rng.sample(self.workouts, 10)
+                )
+                for limit in (1, 20):
+                    self.assertEqual(recommend_for_user(user.pk, limit=limit),
+                                     _oracle_recommendations(user, limit, today), (goal, level, limit))
+
+    def test_a_stored_list_costs_one_query_until_progress_is_logged(self):
+        self.user.goal, self.user.activity_level = 'weight_loss', 'intermediate'
+        self.user.save()
+        first = recommend_for_user(self.user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(recommend_for_user(self.user.pk), first)
+
+        UserWorkoutProgress.objects.create(user=self.user, workout_id=first[0][0], date=timezone.localdate())
+        self.assertNotEqual(recommend_for_user(self.user.pk)[0][0], first[0][0])
+
+    def test_precomputed_lists_for_more_users_than_the_file_cache_cap_are_all_served(self):
+        User.objects.bulk_create(User(email=f'bulk{number}@example.com', goal='weight_loss') for number in range(450))
+        catalog_version = get_versions(Workout)
+
+        self.assertEqual(precompute_recommendations(chunk_size=100), User.objects.count())
+        self.assertEqual(UserWorkoutRecommendations.objects.count(), User.objects.count())
+        with mock.patch('workouts.recommendations.segment_ranking', side_effect=AssertionError("not stored")):
+            for user_id in User.objects.values_list('pk', flat=True):
+                self.assertEqual(len(recommend_for_user(user_id)), 20)
+        self.assertEqual(get_versions(Workout), catalog_version)
+
+
+@benchmark
+class RecommendationBenchmark(WorkoutAPITestCase):
+    """Per-user recommendation latency on a 50k-workout catalog, and the precompute batch"""
+
+    def test_recommendation_latency(self):
+        workouts = scaled(50_000, 5000)
+        users = scaled(10_000, 500)
+        seed_workouts(workouts)
+        workout_ids = list(Workout.objects.values_list('pk', flat=True))
+        rng = random.Random(9)
+        goals = ['weight_loss', 'gain_endurance', 'try_ai_coach']
+        levels = ['beginner', 'intermediate', 'advanced']
+        User.objects.bulk_create(
+            User(email=f'rec{number}@example.com', goal=rng.choice(goals), activity_level=rng.choice(levels))
+            for number in range(users)
+        )
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        today = timezone.localdate()
+        UserWorkoutProgress.objects.bulk_create(
+            (UserWorkoutProgress(user_id=rng.choice(user_ids), workout_id=rng.choice(workout_ids),
+                                 date=today - timedelta(days=rng.randrange(30))) for _ in range(users * 5)),
+            batch_size=5000,
+        )
+
+        with timed(f"ranking all 9 segments of {workouts} workouts", 9):
+            for goal in goals:
+                for level in levels:
+                    segment_ranking(goal, level)
+        sample = user_ids[:200]
+        with timed(f"{len(sample)} users, cache miss", len(sample)) as misses:
+            for user_id in sample:
+                recommend_for_user(user_id)
+        with timed(f"{len(sample)} users, cache hit", len(sample)):
+            for user_id in sample:
+                recommend_for_user(user_id)
+        with timed(f"precompute_recommendations for {len(user_ids)} users", len(user_ids)):
+            call_command('precompute_recommendations', stdout=StringIO())
+
+        print(f"\n  per-user miss: {misses['elapsed'] / len(sample) * 1000:.2f} ms", end='')
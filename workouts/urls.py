@@ -5,9 +5,19 @@ app_name = 'workouts'
 
 urlpatterns = [
     path('', views.WorkoutListCreateView.as_view(), name='workout-list'),
+    path('search/', views.WorkoutSearchView.as_view(), name='workout-search'),
+    path('recommended/', views.RecommendedWorkoutsView.as_view(), name='workout-recommended'),
     path('<int:pk>/', views.WorkoutDetailView.as_view(), name='workout-detail'),
+    path('<int:pk>/tree/', views.WorkoutTreeView.as_view(), name='workout-tree'),
+    path('<int:pk>/funnel/', views.WorkoutRoundFunnelView.as_view(), name='workout-round-funnel'),
+    path('rounds/', views.WorkoutRoundListCreateView.as_view(), name='workout-round-list'),
+    path('rounds/<int:pk>/', views.WorkoutRoundDetailView.as_view(), name='workout-round-detail'),
+    path('exercises/', views.ExerciseListCreateView.as_view(), name='exercise-list'),
+    path('exercises/<int:pk>/', views.ExerciseDetailView.as_view(), name='exercise-detail'),
     path('categories/', views.WorkoutCategoryListCreateView.as_view(), name='workout-category-list'),
     path('categories/<int:pk>/', views.WorkoutCategoryDetailView.as_view(), name='workout-category-detail'),
     path('user-progress/', views.UserWorkoutProgressListCreateView.as_view(), name='user-workout-progress-list'),
+    path('user-progress/sync/', views.UserWorkoutProgressSyncView.as_view(), name='user-workout-progress-sync'),
+    path('stats/', views.WorkoutStatsView.as_view(), name='workout-stats'),
     path('user-progress/<int:pk>/', views.UserWorkoutProgressDetailView.as_view(), name='user-workout-progress-detail'),
 ]   
\ No newline at end of file
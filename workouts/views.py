@@ -1,32 +1,130 @@
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
-from .models import WorkoutCategory, Workout, WorkoutRound, Exercise, UserWorkoutProgress
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.generics import GenericAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.response import Response
+from .models import WorkoutCategory, Workout, WorkoutRound, Exercise, UserWorkoutProgress, UserWorkoutDailyStat
 from .serializers import (
     WorkoutCategorySerializer, WorkoutSerializer,
     WorkoutRoundSerializer, ExerciseSerializer,
-    UserWorkoutProgressSerializer
+    UserWorkoutProgressSerializer, WorkoutTreeSerializer, ProgressSyncItemSerializer
 )
 from accounts.permissions import IsActiveUser
+from GymGeniusAI.conditional import ConditionalViewMixin
+from GymGeniusAI.versioning import get_versions
+from GymGeniusAI.refcache import reference_response
+from GymGeniusAI.rollups import RollupRangeMixin
+from GymGeniusAI.eager_loading import EagerLoadingMixin
+from .filters import WorkoutFilterBackend
+from .search import search_workouts
+from .stats import ROLLUP_FIELDS, round_funnel
+from .sync import MAX_SYNC_ITEMS, sync_progress
+from .recommendations import RECOMMENDATION_LIMIT, recommend_for_user
 
-class WorkoutCategoryListCreateView(ListCreateAPIView):
+class CategoryETagMixin(ConditionalViewMixin):
+    def get_etag(self, request):
+        return "workout-categories-%s-%d" % (self.kwargs.get('pk', 'all'), *get_versions(WorkoutCategory))
+
+class WorkoutETagMixin(ConditionalViewMixin):
+    def get_etag(self, request):
+        # Workouts embed their category, so both tables feed the tag.
+        return "workouts-%s-%d-%d" % (self.kwargs.get('pk', 'all'), *get_versions(Workout, WorkoutCategory))
+
+class WorkoutCategoryListCreateView(CategoryETagMixin, ListCreateAPIView):
     queryset = WorkoutCategory.objects.all()
     serializer_class = WorkoutCategorySerializer
     permission_classes = [IsActiveUser]
 
-class WorkoutCategoryDetailView(RetrieveUpdateDestroyAPIView):
+    def list(self, request, *args, **kwargs):
+        def build():
+            page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+            return self.get_paginated_response(self.get_serializer(page, many=True).data).data
+
+        # One entry per page; only the first page is memoized, so cursors cannot grow the memo.
+        first_page = not request.query_params
+        return reference_response(
+            'workout-categories:%s' % request.build_absolute_uri(), (WorkoutCategory,), build, memo=first_page,
+        )
+
+class WorkoutCategoryDetailView(CategoryETagMixin, RetrieveUpdateDestroyAPIView):
     queryset = WorkoutCategory.objects.all()
     serializer_class = WorkoutCategorySerializer
     permission_classes = [IsActiveUser]
 
-class WorkoutListCreateView(ListCreateAPIView):
+class WorkoutListCreateView(WorkoutETagMixin, EagerLoadingMixin, ListCreateAPIView):
     queryset = Workout.objects.all()
     serializer_class = WorkoutSerializer
     permission_classes = [IsActiveUser]
+    filter_backends = [WorkoutFilterBackend]
+
+class WorkoutSearchView(GenericAPIView):
+    """Ranked full-text search over workout titles, descriptions and exercises"""
+    serializer_class = WorkoutSerializer
+    permission_classes = [IsActiveUser]
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.max_limit)
+        except ValueError:
+            limit = 20
+        if not query:
+            return Response({"results": []})
+
+        ranked = search_workouts(query, limit=max(limit, 1))
+        workouts = Workout.objects.select_related('category').in_bulk([pk for pk, _ in ranked])
+        results = []
+        for pk, score in ranked:
+            if pk in workouts:
+                item = self.get_serializer(workouts[pk]).data
+                item['score'] = round(score, 6)
+                results.append(item)
+        return Response({"results": results})
+
+class RecommendedWorkoutsView(GenericAPIView):
+    """Workouts ranked for the current user's goal and level, skipping recent repeats"""
+    serializer_class = WorkoutSerializer
+    permission_classes = [IsActiveUser]
+    max_limit = 50
 
-class WorkoutDetailView(RetrieveUpdateDestroyAPIView):
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', RECOMMENDATION_LIMIT)), self.max_limit))
+        except ValueError:
+            limit = RECOMMENDATION_LIMIT
+
+        ranked = recommend_for_user(request.user.pk, limit=limit)
+        workouts = Workout.objects.select_related('category').in_bulk([pk for pk, _ in ranked])
+        results = []
+        for pk, score in ranked:
+            if pk in workouts:
+                item = self.get_serializer(workouts[pk]).data
+                item['score'] = score
+                results.append(item)
+        return Response({"results": results})
+
+class WorkoutDetailView(WorkoutETagMixin, EagerLoadingMixin, RetrieveUpdateDestroyAPIView):
     queryset = Workout.objects.all()
     serializer_class = WorkoutSerializer
     permission_classes = [IsActiveUser]
 
+# Every table a serialized workout tree reads from.
+TREE_MODELS = (Workout, WorkoutCategory, WorkoutRound, Exercise)
+
+class WorkoutTreeView(ConditionalViewMixin, GenericAPIView):
+    """Workout -> rounds -> exercises in three queries, cached by catalog version"""
+    serializer_class = WorkoutTreeSerializer
+    permission_classes = [IsActiveUser]
+
+    def get_etag(self, request):
+        return "workout-tree-%s-%s" % (self.kwargs['pk'], "-".join(str(v) for v in get_versions(*TREE_MODELS)))
+
+    def get(self, request, pk):
+        def build():
+            workout = get_object_or_404(Workout.objects.with_tree(), pk=pk)
+            return self.get_serializer(workout).data
+        return reference_response(f'workout-tree:{pk}', TREE_MODELS, build, memo=False)
+
 class WorkoutRoundListCreateView(ListCreateAPIView):
     queryset = WorkoutRound.objects.all()
     serializer_class = WorkoutRoundSerializer
@@ -52,7 +150,64 @@ class UserWorkoutProgressListCreateView(ListCreateAPIView):
     serializer_class = UserWorkoutProgressSerializer
     permission_classes = [IsActiveUser]
 
+class UserWorkoutProgressSyncView(GenericAPIView):
+    """
+    Replay a batch of offline sessions: {"sessions": [...]} with up to MAX_SYNC_ITEMS
+    items, each keyed by a client idempotency_key. Returns one result per item, in order.
+    """
+    serializer_class = ProgressSyncItemSerializer
+    permission_classes = [IsActiveUser]
+
+    def post(self, request):
+        sessions = request.data.get('sessions') if isinstance(request.data, dict) else None
+        if not isinstance(sessions, list) or not sessions:
+            return Response({"error": "sessions must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(sessions) > MAX_SYNC_ITEMS:
+            return Response({"error": f"At most {MAX_SYNC_ITEMS} sessions per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        valid, errors = [], {}
+        for index, item in enumerate(sessions):
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors[index] = serializer.errors
+
+        results = [None] * len(sessions)
+        for index, item_errors in errors.items():
+            key = sessions[index].get('idempotency_key') if isinstance(sessions[index], dict) else None
+            results[index] = {'idempotency_key': key, 'status': 'invalid', 'id': None, 'errors': item_errors}
+        stored = sync_progress(request.user.pk, [item for _, item in valid])
+        for (index, _), result in zip(valid, stored):
+            results[index] = result
+
+        counts = {'created': 0, 'duplicate': 0, 'invalid': 0}
+        for result in results:
+            counts[result['status']] += 1
+        return Response({**counts, 'results': results}, status=status.HTTP_200_OK)
+
 class UserWorkoutProgressDetailView(RetrieveUpdateDestroyAPIView):
     queryset = UserWorkoutProgress.objects.all()
     serializer_class = UserWorkoutProgressSerializer
-    permission_classes = [IsActiveUser]
\ No newline at end of file
+    permission_classes = [IsActiveUser]
+
+class WorkoutStatsView(RollupRangeMixin, GenericAPIView):
+    """
+    Calories, minutes and session totals for the current user between ?start= and ?end=
+    (default: last 30 days), grouped by ?period=day|week|month. Reads only the daily rollups.
+    """
+    permission_classes = [IsActiveUser]
+    rollup_fields = ROLLUP_FIELDS
+    default_days = 30
+
+    def get(self, request):
+        return self.range_response(request, UserWorkoutDailyStat.objects.filter(user_id=request.user.pk))
+
+class WorkoutRoundFunnelView(GenericAPIView):
+    """Share of users completing each round of a workout, computed in SQL from the completion bitmasks"""
+    permission_classes = [IsActiveUser]
+
+    def get(self, request, pk):
+        get_object_or_404(Workout.objects.only('id'), pk=pk)
+        return Response({'workout': pk, **round_funnel(pk)})